@@ -0,0 +1,123 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+CACHE_HITS_KEY = 'catalog-cache:hits'
+CACHE_MISSES_KEY = 'catalog-cache:misses'
+
+
+def get_version(resource):
+    """Текущая версия ресурса; входит в ключ всех его ответов."""
+    key = f'catalog-version:{resource}'
+    version = cache.get(key)
+    if version is None:
+        # Начальное значение от времени, а не 1: если ключ версии
+        # вытеснен из кэша, старые ответы не должны снова стать видимыми.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def increment_version(resource):
+    key = f'catalog-version:{resource}'
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, None)
+        return version
+
+
+def bump_version(*resources):
+    for resource in resources:
+        increment_version(resource)
+
+
+def get_cache_key(resource, request):
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    )
+    digest = hashlib.sha1(
+        json.dumps([request.get_host(), request.path, params]).encode()
+    ).hexdigest()
+    return f'catalog:{resource}:{get_version(resource)}:{digest}'
+
+
+def cached_value(resource, request, name, compute):
+    """Значение, вычисленное для запроса и закэшированное по версии."""
+    key = f'{get_cache_key(resource, request)}:{name}'
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+def increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_stats():
+    hits = cache.get(CACHE_HITS_KEY, 0)
+    misses = cache.get(CACHE_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def cached_response(view, handler, request, *args, **kwargs):
+    """Ответ для анонимного GET-запроса из кэша по версии ресурса."""
+    if request.user.is_authenticated:
+        return handler(request, *args, **kwargs)
+    key = get_cache_key(view.cache_resource, request)
+    data = cache.get(key)
+    if data is not None:
+        increment(CACHE_HITS_KEY)
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+    increment(CACHE_MISSES_KEY)
+    response = handler(request, *args, **kwargs)
+    if response.status_code == 200:
+        cache.set(key, response.data, settings.CATALOG_CACHE_TIMEOUT)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+class CachedListMixin:
+    """Кэширует list для анонимных пользователей.
+
+    Ключ ответа включает версию ресурса ``cache_resource``, которую
+    сигналы увеличивают при каждом изменении связанных моделей.
+    """
+
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            self, super().list, request, *args, **kwargs
+        )
+
+
+class CachedRetrieveMixin:
+    """Кэширует retrieve для анонимных пользователей."""
+
+    cache_resource = None
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            self, super().retrieve, request, *args, **kwargs
+        )
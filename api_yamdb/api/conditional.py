@@ -0,0 +1,146 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import (get_conditional_response,
+                                patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import quote_etag
+from rest_framework.exceptions import NotFound
+
+from api.cache import cached_value, get_version
+from api.pagination import COUNT_EXACT
+
+
+def filter_object(view, queryset):
+    """Строка retrieve; пустая выборка, если ключ из URL некорректен.
+
+    Без валидаторов 404 вернет сам обработчик: get_object_or_404
+    из DRF превращает ValueError и TypeError в 404.
+    """
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    try:
+        return queryset.filter(
+            **{view.lookup_field: view.kwargs[lookup_url_kwarg]}
+        )
+    except (TypeError, ValueError, ValidationError):
+        return queryset.none()
+
+
+def get_validators(view, request):
+    """ETag ответа без рендеринга тела.
+
+    Для списка одним узким запросом выбираются id и даты изменения
+    строк текущей страницы (с одной следующей для ссылки ``next``),
+    для retrieve — одной строки. Если пагинатор считает ``count``
+    точно, к ним добавляется COUNT(*); пагинатор затем использует это
+    же число и не считает строки второй раз. Для ресурсов каталога в ETag
+    входит еще и версия ресурса: она меняется при правке связанных
+    категорий, жанров и отзывов.
+
+    Last-Modified не отдается: дата изменения строки не растет при
+    удалении строк списка или переименовании категории и жанра,
+    которые входят в ответ, и If-Modified-Since по ней давал бы
+    устаревший 304.
+    """
+    queryset = view.filter_queryset(view.get_queryset())
+    state = {}
+    if view.action == 'retrieve':
+        queryset = filter_object(view, queryset)
+    elif view.paginator is not None:
+        try:
+            window = view.paginator.get_page_window(queryset, request, view)
+        except NotFound:
+            return None
+        if view.paginator.mode == COUNT_EXACT:
+            # Пагинатор этого запроса возьмет число строк отсюда.
+            state['count'] = view.paginator.known_count = queryset.count()
+        queryset = window
+    fields = ['pk']
+    if view.last_modified_field:
+        fields.append(view.last_modified_field)
+    state['rows'] = list(queryset.values_list(*fields))
+    if view.action == 'retrieve' and not state['rows']:
+        return None
+    if view.cache_resource:
+        state['version'] = get_version(view.cache_resource)
+    return make_etag(request, state)
+
+
+def make_etag(request, state):
+    return hashlib.sha1(json.dumps(
+        [request.get_full_path(), request.accepted_media_type, state],
+        cls=DjangoJSONEncoder
+    ).encode()).hexdigest()
+
+
+def conditional_response(view, handler, request, *args, **kwargs):
+    """Отвечает 304, если клиент прислал актуальный ETag."""
+    if view.cache_resource and not request.user.is_authenticated:
+        etag = cached_value(
+            view.cache_resource,
+            request,
+            f'etag:{request.accepted_media_type}',
+            lambda: view.get_validators(request)
+        )
+    else:
+        etag = view.get_validators(request)
+    if etag is None:
+        return handler(request, *args, **kwargs)
+    etag = quote_etag(etag)
+
+    response = get_conditional_response(
+        request._request, etag=etag
+    )
+    if response is None:
+        response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=settings.CONDITIONAL_GET_MAX_AGE,
+            must_revalidate=True
+        )
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class ConditionalListMixin:
+    """Условные GET-запросы (If-None-Match) для list.
+
+    ``last_modified_field`` — поле с датой изменения строки; оно входит
+    в ETag, заголовка Last-Modified в ответе нет.
+    """
+
+    cache_resource = None
+    last_modified_field = None
+
+    def get_validators(self, request):
+        return get_validators(self, request)
+
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            self, super().list, request, *args, **kwargs
+        )
+
+
+class ConditionalRetrieveMixin:
+    """Условные GET-запросы для retrieve."""
+
+    cache_resource = None
+    last_modified_field = None
+
+    def get_validators(self, request):
+        return get_validators(self, request)
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            self, super().retrieve, request, *args, **kwargs
+        )
@@ -16,5 +16,29 @@ TEXT_CUTOFF_LENGTH = 30
 MIN_SCORE = 1
 MAX_SCORE = 10
 
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Вес средней оценки по всем отзывам в байесовском рейтинге: столько
+# «средних» отзывов добавляется к отзывам каждого произведения.
+LEADERBOARD_PRIOR_WEIGHT = 10
+LEADERBOARD_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 100
+
+# За сколько часов вклад отзыва в популярность произведения
+# уменьшается вдвое.
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_LIMIT = 10
+TRENDING_MAX_LIMIT = 100
+
+# Сколько соседей хранится для каждого произведения и сколько общих
+# авторов нужно паре произведений, чтобы считать их похожими.
+SIMILAR_TITLES_COUNT = 20
+SIMILAR_TITLES_MIN_COMMON = 2
+SIMILAR_TITLES_LIMIT = 10
+
+RECOMMENDATIONS_LIMIT = 10
+RECOMMENDATIONS_MAX_LIMIT = 100
+
 # Общие константы
 STATIC_PATH_CSV_FILES = 'static/data/'
@@ -0,0 +1,314 @@
+import re
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from rest_framework.test import APIClient
+
+from api import urls
+from reviews.models import (Category, Comment, Genre, Review, Title,
+                            TitleNeighbors)
+
+User = get_user_model()
+
+SEED_SIZE = 12
+
+# Дополнительные наборы параметров запроса по имени маршрута:
+# фильтры, поиск и курсор дают запросы, которых нет в простом GET.
+ROUTE_PARAMS = {
+    'category-list': ({'search': 'аудит'},),
+    'genre-list': ({'search': 'аудит'},),
+    'title-list': (
+        {'genre': 'audit-genre-0'},
+        {'category': 'audit-category-0'},
+        {'year': 2000},
+        {'name': 'Аудит 0'},
+        {'search': 'аудит'},
+        {'facets': 'genre,category,year'},
+        {'cursor': ''},
+    ),
+    'title-top': (
+        {'genre': 'audit-genre-0'},
+        {'category': 'audit-category-0'},
+        {'genre': 'audit-genre-0', 'category': 'audit-category-0'},
+    ),
+    'title-trending': ({'genre': 'audit-genre-0'},),
+    'title-timeseries': (
+        {'from': '2000-01-01', 'to': '2100-01-01', 'bucket': 'week'},
+    ),
+    'review-list': ({'cursor': ''},),
+    'comment-list': ({'cursor': ''},),
+    'users-list': ({'search': 'audit'}, {'cursor': ''}),
+    'moderation-review-list': ({'search': 'аудит'}, {'cursor': ''}),
+    'moderation-comment-list': ({'search': 'аудит'}, {'cursor': ''}),
+    'autocomplete': ({'q': 'ауд'},),
+}
+
+# Запросы, для которых сортировка неизбежна, и причина этого.
+ACCEPTED_PROBLEMS = (
+    (re.compile(r'_fts MATCH'),
+     'выдача поиска упорядочена по релевантности совпадений'),
+    (re.compile(r'AS "facet"'),
+     'фасеты группируют уже отфильтрованную выборку'),
+    (re.compile(r'"reviews_genre"\."slug" = \? ORDER BY'),
+     'сортируются только произведения одного жанра'),
+    (re.compile(r'"reviews_genretitle"\."title_id" (?:=|IN)'),
+     'сортируются только жанры выбранных произведений'),
+)
+
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST_PATTERN = re.compile(r'\(\?(?:, \?)+\)')
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def get_fingerprint(sql):
+    """SQL без литералов: запросы, отличающиеся лишь значениями, равны."""
+    sql = LITERAL_PATTERN.sub('?', sql)
+    sql = PLACEHOLDER_LIST_PATTERN.sub('(?)', sql)
+    return ' '.join(sql.split())
+
+
+def get_problems(plan):
+    """Шаги плана с полным сканированием таблицы или сортировкой."""
+    problems = []
+    for detail in plan:
+        if detail.startswith('SCAN ') and not any(
+            marker in detail
+            for marker in ('USING', 'VIRTUAL TABLE', 'CONSTANT ROW')
+        ) and not detail.startswith(('SCAN (', 'SCAN subquery')):
+            problems.append(detail)
+        elif 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+def get_accepted_reason(fingerprint):
+    for pattern, reason in ACCEPTED_PROBLEMS:
+        if pattern.search(fingerprint):
+            return reason
+    return None
+
+
+def iter_routes(patterns, namespace=''):
+    """Шаблон, имя и view каждого маршрута ``api/urls.py``."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}{pattern.namespace}:'
+            yield from iter_routes(pattern.url_patterns, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            if 'format' in pattern.pattern.regex.groupindex:
+                continue
+            yield pattern, f'{namespace}{pattern.name}', pattern.callback
+
+
+def supports_get(callback):
+    actions = getattr(callback, 'actions', None)
+    if actions is not None:
+        return 'get' in actions
+    view_class = getattr(callback, 'view_class', None)
+    return view_class is not None and hasattr(view_class, 'get')
+
+
+def get_view_model(view_class):
+    if getattr(view_class, 'queryset', None) is not None:
+        return view_class.queryset.model
+    serializer_class = getattr(view_class, 'serializer_class', None)
+    meta = getattr(serializer_class, 'Meta', None)
+    return getattr(meta, 'model', None)
+
+
+class Command(BaseCommand):
+    help = (
+        'Аудит планов запросов API: EXPLAIN QUERY PLAN для каждого '
+        'запроса, выполняемого маршрутами api/urls.py'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--report-only',
+            action='store_true',
+            help='Не завершаться с ошибкой при найденных проблемах.'
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Выводить планы всех запросов, а не только проблемных.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(
+                'Аудит планов поддерживается только для SQLite.'
+            )
+        with transaction.atomic():
+            objects = self.seed()
+            queries = self.drive_routes(objects)
+            plans = self.explain(queries)
+            # Тестовые данные не должны остаться в БД.
+            transaction.set_rollback(True)
+        problems = self.report(plans, options['verbose_plans'])
+        if problems and not options['report_only']:
+            raise CommandError(
+                f'Найдено запросов с полным сканированием или '
+                f'сортировкой: {problems}'
+            )
+
+    def seed(self):
+        admin = User.objects.create(
+            username='audit-admin',
+            email='audit-admin@yamdb.fake',
+            role=User.ADMIN
+        )
+        categories = [
+            Category.objects.create(
+                name=f'Аудит {index}', slug=f'audit-category-{index}'
+            )
+            for index in range(2)
+        ]
+        genres = [
+            Genre.objects.create(
+                name=f'Аудит {index}', slug=f'audit-genre-{index}'
+            )
+            for index in range(3)
+        ]
+        titles = []
+        for index in range(SEED_SIZE):
+            title = Title.objects.create(
+                name=f'Аудит {index}',
+                year=2000 + index % 3,
+                category=categories[index % 2]
+            )
+            title.genre.set(genres[:index % 3 + 1])
+            titles.append(title)
+        TitleNeighbors.objects.create(
+            title=titles[0],
+            neighbors=TitleNeighbors.pack(
+                (title.pk, 1.0) for title in titles[1:]
+            )
+        )
+        authors = [admin] + [
+            User.objects.create(
+                username=f'audit-user-{index}',
+                email=f'audit-user-{index}@yamdb.fake'
+            )
+            for index in range(SEED_SIZE - 1)
+        ]
+        reviews = [
+            Review.objects.create(
+                title=titles[0],
+                author=author,
+                text=f'Аудит отзыва {index}',
+                score=index % 10 + 1
+            )
+            for index, author in enumerate(authors)
+        ]
+        comments = [
+            Comment.objects.create(
+                review=reviews[0],
+                author=author,
+                text=f'Аудит комментария {index}'
+            )
+            for index, author in enumerate(authors)
+        ]
+        return {
+            User: admin,
+            Category: categories[0],
+            Genre: genres[0],
+            Title: titles[0],
+            Review: reviews[0],
+            Comment: comments[0],
+        }
+
+    def get_url(self, pattern, name, callback, objects):
+        kwargs = {}
+        for kwarg in pattern.pattern.regex.groupindex:
+            if kwarg == 'title_id':
+                kwargs[kwarg] = objects[Title].pk
+            elif kwarg == 'review_id':
+                kwargs[kwarg] = objects[Review].pk
+            else:
+                view_class = callback.cls
+                obj = objects[get_view_model(view_class)]
+                kwargs[kwarg] = getattr(obj, view_class.lookup_field)
+        return reverse(name, kwargs=kwargs)
+
+    def drive_routes(self, objects):
+        """Выполняет GET-запросы ко всем маршрутам, собирая SQL."""
+        client = APIClient()
+        client.force_authenticate(objects[User])
+        queries = OrderedDict()
+        for pattern, name, callback in iter_routes(urls.urlpatterns):
+            if not supports_get(callback):
+                self.stdout.write(f'{name}: пропущен, нет GET')
+                continue
+            url = self.get_url(pattern, name, callback, objects)
+            for params in ({},) + ROUTE_PARAMS.get(name, ()):
+                with CaptureQueriesContext(connection) as context:
+                    response = client.get(url, params)
+                    if response.streaming:
+                        # Потоковый ответ читает БД по мере отдачи.
+                        b''.join(response.streaming_content)
+                    data = getattr(response, 'data', None)
+                    next_url = (
+                        data.get('next') if isinstance(data, dict) else None
+                    )
+                    if next_url:
+                        client.get(next_url)
+                label = f'{name} {params}' if params else name
+                self.stdout.write(
+                    f'{label}: {response.status_code}, '
+                    f'запросов: {len(context.captured_queries)}'
+                )
+                for query in context.captured_queries:
+                    sql = query['sql']
+                    if not sql.lstrip().upper().startswith(
+                        EXPLAINED_STATEMENTS
+                    ):
+                        continue
+                    fingerprint = get_fingerprint(sql)
+                    queries.setdefault(fingerprint, (sql, set()))[1].add(
+                        name
+                    )
+        return queries
+
+    @staticmethod
+    def explain(queries):
+        plans = []
+        with connection.cursor() as cursor:
+            for fingerprint, (sql, routes) in queries.items():
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+                plans.append((fingerprint, sorted(routes), plan))
+        return plans
+
+    def report(self, plans, verbose):
+        problems = accepted = 0
+        for fingerprint, routes, plan in plans:
+            issues = get_problems(plan)
+            reason = get_accepted_reason(fingerprint) if issues else None
+            if reason:
+                accepted += 1
+            elif issues:
+                problems += 1
+            if not verbose and (not issues or reason):
+                continue
+            style = self.style.WARNING if issues else self.style.SUCCESS
+            self.stdout.write('')
+            self.stdout.write(style(fingerprint))
+            self.stdout.write(f'  маршруты: {", ".join(routes)}')
+            if reason:
+                self.stdout.write(f'  допустимо: {reason}')
+            for detail in plan:
+                marker = '!' if detail in issues else ' '
+                self.stdout.write(f'  {marker} {detail}')
+        self.stdout.write('')
+        self.stdout.write(
+            f'Уникальных запросов: {len(plans)}, проблемных: {problems}, '
+            f'допустимых сортировок: {accepted}'
+        )
+        return problems
@@ -0,0 +1,287 @@
+import base64
+import binascii
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATED = 'estimated'
+COUNT_NONE = 'none'
+CURSOR = 'cursor'
+
+
+class CountedPaginator(Paginator):
+    """Paginator с заранее известным числом строк, без COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+class PageNumberOrCursorPagination(PageNumberPagination):
+    """Постраничная пагинация с опциональным режимом курсора.
+
+    Если в запросе передан параметр ``cursor`` (в том числе пустой),
+    а у вьюсета задан ``cursor_ordering``, выдача строится по ключу
+    сортировки (keyset): очередная страница выбирается условием
+    ``WHERE (ключ) > (последний ключ)`` без OFFSET и COUNT(*),
+    поэтому ее стоимость не зависит от глубины.
+
+    В постраничном режиме способ подсчета ``count`` выбирается
+    для вьюсета по его ``basename`` в настройке
+    ``PAGINATION_COUNT_MODES``: ``exact`` — точный COUNT(*),
+    ``none`` — без ``count``, ``estimated`` — закэшированное значение
+    для пары (эндпоинт, фильтры), которое обновляется в фоне.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+    count_cache_prefix = 'pagination-count'
+    # Точное число строк, уже посчитанное для ETag этого же запроса.
+    known_count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.mode = self.get_mode(request, view)
+        if self.mode == CURSOR:
+            return self.paginate_by_cursor(
+                queryset, request, view.cursor_ordering
+            )
+        if self.mode == COUNT_EXACT:
+            if self.known_count is not None:
+                self.django_paginator_class = partial(
+                    CountedPaginator, count=self.known_count
+                )
+            return super().paginate_queryset(queryset, request, view)
+        rows = self.paginate_without_count(queryset, request)
+        if self.mode == COUNT_ESTIMATED:
+            self.count = self.get_estimated_count(queryset, request)
+        return rows
+
+    def get_mode(self, request, view):
+        if (getattr(view, 'cursor_ordering', None)
+                and self.cursor_query_param in request.query_params):
+            return CURSOR
+        modes = getattr(settings, 'PAGINATION_COUNT_MODES', {})
+        return modes.get(getattr(view, 'basename', None), COUNT_EXACT)
+
+    def get_paginated_response(self, data):
+        if self.mode == COUNT_EXACT:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.mode == COUNT_ESTIMATED:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_next_link(self):
+        if self.mode == COUNT_EXACT:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        if self.mode == CURSOR:
+            return self.encode_cursor(self.page[-1], reverse=False)
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.page_query_param,
+            self.page_number + 1
+        )
+
+    def get_previous_link(self):
+        if self.mode == COUNT_EXACT:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        if self.mode == CURSOR:
+            return self.encode_cursor(self.page[0], reverse=True)
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.page_query_param, self.page_number - 1
+        )
+
+    def get_page_window(self, queryset, request, view):
+        """Строки текущей страницы и одна следующая без их загрузки.
+
+        Используется для ETag списка: страница определяется так же,
+        как при пагинации, но без COUNT(*).
+        """
+        self.request = request
+        self.mode = self.get_mode(request, view)
+        page_size = self.get_page_size(request)
+        if self.mode == CURSOR:
+            self.ordering = view.cursor_ordering
+            self.model = queryset.model
+            return self.cursor_queryset(
+                queryset, request, view.cursor_ordering
+            )[:page_size + 1]
+        offset = self.get_offset(request, page_size)
+        return queryset[offset:offset + page_size + 1]
+
+    def get_offset(self, request, page_size):
+        try:
+            self.page_number = int(
+                request.query_params.get(self.page_query_param, 1)
+            )
+            if self.page_number < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_page_message)
+        return (self.page_number - 1) * page_size
+
+    def paginate_without_count(self, queryset, request):
+        """Страница через OFFSET с лишней строкой вместо COUNT(*)."""
+        page_size = self.get_page_size(request)
+        offset = self.get_offset(request, page_size)
+        rows = list(queryset[offset:offset + page_size + 1])
+        if not rows and self.page_number > 1:
+            raise NotFound(self.invalid_page_message)
+        self.has_next = len(rows) > page_size
+        self.has_previous = self.page_number > 1
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_count_cache_key(self, request):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            if key not in (self.page_query_param, self.cursor_query_param)
+            for value in values
+        )
+        digest = hashlib.sha1(
+            json.dumps([request.path, params]).encode()
+        ).hexdigest()
+        return f'{self.count_cache_prefix}:{digest}'
+
+    def get_estimated_count(self, queryset, request):
+        key = self.get_count_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            return self.store_count(key, queryset)
+        count, counted_at = cached
+        timeout = getattr(settings, 'PAGINATION_COUNT_TIMEOUT', 60)
+        if time.time() - counted_at > timeout:
+            self.refresh_count_in_background(key, queryset)
+        return count
+
+    @staticmethod
+    def store_count(key, queryset):
+        # Справочники отдают list из реестра в памяти, а не QuerySet.
+        if isinstance(queryset, QuerySet):
+            count = queryset.order_by().count()
+        else:
+            count = len(queryset)
+        cache.set(key, (count, time.time()), None)
+        return count
+
+    def refresh_count_in_background(self, key, queryset):
+        # Пока идет пересчет, остальные запросы отдают прежнее значение.
+        lock_key = f'{key}:refresh'
+        if not cache.add(lock_key, True, 60):
+            return
+
+        def refresh():
+            try:
+                self.store_count(key, queryset)
+            finally:
+                cache.delete(lock_key)
+                connections.close_all()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def cursor_queryset(self, queryset, request, ordering):
+        position, self.reverse = self.decode_cursor(request)
+        self.position = position
+        if self.reverse:
+            ordering = [self.invert(field) for field in ordering]
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        return queryset.order_by(*ordering)
+
+    def paginate_by_cursor(self, queryset, request, ordering):
+        self.ordering = ordering
+        self.model = queryset.model
+        page_size = self.get_page_size(request)
+        queryset = self.cursor_queryset(queryset, request, ordering)
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if self.reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        if not rows:
+            # Строки за сохраненной ссылкой удалены или курсор указывает
+            # за край выдачи: ссылки строить не от чего.
+            self.has_next = self.has_previous = False
+        self.page = rows
+        return rows
+
+    def after(self, ordering, position):
+        # Нестрогая граница по первому полю позволяет SQLite искать
+        # по индексу диапазоном, а не сканировать его с начала.
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        bound = Q(**{f'{first.lstrip("-")}__{lookup}': position[0]})
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_field, value in zip(ordering[:index], position):
+                step &= Q(**{prev_field.lstrip('-'): value})
+            condition |= step
+        return bound & condition
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def encode_cursor(self, obj, reverse):
+        position = [
+            self.model._meta.get_field(field.lstrip('-')).value_to_string(obj)
+            for field in self.ordering
+        ]
+        payload = json.dumps({'p': position, 'r': int(reverse)})
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position = [
+                self.model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, payload['p'])
+            ]
+            if len(position) != len(self.ordering):
+                raise ValueError
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
@@ -1,12 +1,17 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from reviews.views import (CategoryViewSet,
+from reviews.views import (Autocomplete,
+                           CategoryViewSet,
+                           Recommendations,
                            GenreViewSet,
                            TitleViewSet,
                            ReviewViewSet,
-                           CommentViewSet)
+                           CommentViewSet,
+                           ReviewSearchViewSet,
+                           CommentSearchViewSet)
 from user.views import SignUp, Token, UserViewSet
+from .views import CacheStats
 
 router_v1 = DefaultRouter()
 # Маршруты приложения user
@@ -29,8 +34,22 @@ router_v1.register(
     CommentViewSet,
     basename='comment'
 )
+router_v1.register(
+    'moderation/reviews', ReviewSearchViewSet, basename='moderation-review'
+)
+router_v1.register(
+    'moderation/comments', CommentSearchViewSet, basename='moderation-comment'
+)
 
 urlpatterns = [
+    path('v1/cache/stats/', CacheStats.as_view(), name='cache-stats'),
+    path(
+        'v1/autocomplete/', Autocomplete.as_view(), name='autocomplete'
+    ),
+    path(
+        'v1/users/me/recommendations/', Recommendations.as_view(),
+        name='recommendations'
+    ),
     path('v1/', include(router_v1.urls)),
     path('v1/auth/', include((auth_urlpatterns, 'auth'), namespace='auth'))
 ]
@@ -0,0 +1,14 @@
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.cache import get_stats
+from user.permissions import IsAdminRole
+
+
+class CacheStats(APIView):
+    """Счетчики попаданий и промахов кэша каталога."""
+
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        return Response(get_stats())
@@ -119,10 +119,42 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageNumberOrCursorPagination',
     'PAGE_SIZE': 10
 }
 
+# Для нескольких процессов нужен общий бэкенд (Redis, Memcached):
+# версии ресурсов каталога и счетчики хранятся в кэше.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Время жизни закэшированных ответов каталога для анонимных запросов;
+# после изменения данных ответы устаревают сразу за счет версии ресурса.
+CATALOG_CACHE_TIMEOUT = 300
+
+# max-age для публичных ответов с ETag: 0 означает,
+# что клиент каждый раз переспрашивает сервер условным запросом.
+CONDITIONAL_GET_MAX_AGE = 0
+
+# Подсчет `count` в постраничной выдаче по basename вьюсета:
+# 'exact' (по умолчанию) — точный COUNT(*) на каждый запрос,
+# 'estimated' — закэшированное значение, обновляемое в фоне не чаще
+# раза в PAGINATION_COUNT_TIMEOUT секунд, 'none' — без поля `count`.
+PAGINATION_COUNT_MODES = {}
+PAGINATION_COUNT_TIMEOUT = 60
+
+# Не реже чем раз в столько секунд процесс перечитывает справочники
+# категорий и жанров, даже если версия в кэше не изменилась: с локальным
+# кэшем изменения из других процессов иначе не дошли бы до него.
+REFERENCE_REGISTRY_TIMEOUT = 60
+
+# Как часто процесс перечитывает рейтинги в подсказках автодополнения,
+# если отзывы писали другие процессы; названия обновляются сразу.
+AUTOCOMPLETE_RATING_TIMEOUT = 60
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SIMPLE_JWT = {
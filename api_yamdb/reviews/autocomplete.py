@@ -0,0 +1,226 @@
+"""Префиксный индекс названий для автодополнения.
+
+Индекс живет в памяти процесса: для каждого вида объектов хранится
+отсортированный список ключей (нормализованное название, начиная
+с каждого слова) и словарь объектов. Поиск по префиксу — бинарный
+поиск по списку, без обращения к БД.
+
+Сигналы обновляют индекс точечно. Чтобы другие процессы узнали
+об изменении названий, каждое такое обновление увеличивает общий
+счетчик в кэше: если счетчик ушел дальше, чем ожидал процесс, его
+индекс перестраивается из БД при следующем запросе.
+
+Рейтинг меняется с каждым отзывом, и полная перестройка индекса
+во всех процессах на каждый отзыв обходилась бы дороже самих
+подсказок. Поэтому отзыв увеличивает отдельный счетчик рейтингов,
+а остальные процессы перечитывают одни рейтинги — без названий
+и ключей — не чаще раза в AUTOCOMPLETE_RATING_TIMEOUT секунд.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from api.cache import get_version, increment_version
+from .models import Category, Genre, Title
+from .search import WORD_PATTERN, normalize
+
+VERSION_RESOURCE = 'autocomplete'
+RATING_RESOURCE = 'autocomplete-rating'
+
+
+class PrefixIndex:
+
+    def __init__(self):
+        self.keys = []
+        self.items = {}
+
+    @staticmethod
+    def get_keys(name):
+        words = WORD_PATTERN.findall(normalize(name))
+        return {' '.join(words[start:]) for start in range(len(words))}
+
+    def load(self, rows):
+        """Заполняет пустой индекс строками (pk, name, payload)."""
+        for pk, name, payload in rows:
+            self.items[pk] = dict(payload, name=name)
+            self.keys.extend((key, pk) for key in self.get_keys(name))
+        self.keys.sort()
+
+    def add(self, pk, name, **payload):
+        self.remove(pk)
+        self.items[pk] = dict(payload, name=name)
+        for key in self.get_keys(name):
+            insort(self.keys, (key, pk))
+
+    def remove(self, pk):
+        item = self.items.pop(pk, None)
+        if item is None:
+            return
+        for key in self.get_keys(item['name']):
+            position = bisect_left(self.keys, (key, pk))
+            if (position < len(self.keys)
+                    and self.keys[position] == (key, pk)):
+                del self.keys[position]
+
+    def find(self, prefix):
+        start = bisect_left(self.keys, (prefix,))
+        end = bisect_left(self.keys, (prefix + '\uffff',))
+        return {pk for _, pk in self.keys[start:end]}
+
+
+class AutocompleteIndex:
+    """Индексы произведений, жанров и категорий одного процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.rating_version = None
+        self.rated_at = None
+        self.indexes = {}
+
+    def build(self):
+        version = get_version(VERSION_RESOURCE)
+        rating_version = get_version(RATING_RESOURCE)
+        indexes = {Title: PrefixIndex(), Genre: PrefixIndex(),
+                   Category: PrefixIndex()}
+        indexes[Title].load(
+            (pk, name, {'rating': self.get_rating(rating_sum, count)})
+            for pk, name, rating_sum, count in Title.objects.values_list(
+                'pk', 'name', 'rating_sum', 'review_count'
+            ).iterator()
+        )
+        for model in (Genre, Category):
+            indexes[model].load(
+                (pk, name, {'slug': slug})
+                for pk, name, slug in model.objects.values_list(
+                    'pk', 'name', 'slug'
+                ).iterator()
+            )
+        self.indexes = indexes
+        self.version = version
+        self.rating_version = rating_version
+        self.rated_at = time.monotonic()
+
+    def load_ratings(self):
+        """Перечитывает рейтинги, если их меняли другие процессы."""
+        rating_version = get_version(RATING_RESOURCE)
+        timeout = getattr(settings, 'AUTOCOMPLETE_RATING_TIMEOUT', 60)
+        if (rating_version == self.rating_version
+                or time.monotonic() - self.rated_at < timeout):
+            return
+        items = self.indexes[Title].items
+        for pk, rating_sum, count in Title.objects.values_list(
+            'pk', 'rating_sum', 'review_count'
+        ).iterator():
+            if pk in items:
+                items[pk]['rating'] = self.get_rating(rating_sum, count)
+        self.rating_version = rating_version
+        self.rated_at = time.monotonic()
+
+    @staticmethod
+    def get_rating(rating_sum, review_count):
+        return rating_sum / review_count if review_count else None
+
+    def suggest(self, query, limit):
+        prefix = normalize(' '.join(WORD_PATTERN.findall(query)))
+        with self.lock:
+            if (self.version is None
+                    or get_version(VERSION_RESOURCE) != self.version):
+                self.build()
+            else:
+                self.load_ratings()
+            if not prefix:
+                return {'titles': [], 'genres': [], 'categories': []}
+            titles = self.indexes[Title]
+            top_titles = heapq.nlargest(
+                limit,
+                titles.find(prefix),
+                key=lambda pk: (
+                    titles.items[pk]['rating'] is not None,
+                    titles.items[pk]['rating'] or 0,
+                    -pk
+                )
+            )
+            return {
+                'titles': [
+                    {
+                        'id': pk,
+                        'name': titles.items[pk]['name'],
+                        'rating': titles.items[pk]['rating'],
+                    }
+                    for pk in top_titles
+                ],
+                'genres': self.get_named(Genre, prefix, limit),
+                'categories': self.get_named(Category, prefix, limit),
+            }
+
+    def get_named(self, model, prefix, limit):
+        index = self.indexes[model]
+        items = sorted(
+            (index.items[pk] for pk in index.find(prefix)),
+            key=lambda item: item['name']
+        )
+        return [
+            {'name': item['name'], 'slug': item['slug']}
+            for item in items[:limit]
+        ]
+
+    def apply(self, change):
+        """Применяет изменение и отмечает его в общем счетчике."""
+        new_version = increment_version(VERSION_RESOURCE)
+        with self.lock:
+            if self.version is None:
+                return
+            if new_version != self.version + 1:
+                # Счетчик увеличил другой процесс: индекс отстал целиком.
+                self.version = None
+                return
+            change()
+            self.version = new_version
+
+    def refresh_title(self, pk):
+        """Перечитывает название и рейтинг произведения из БД."""
+        def change():
+            title = Title.objects.filter(pk=pk).values_list(
+                'name', 'rating_sum', 'review_count'
+            ).first()
+            if title is None:
+                self.indexes[Title].remove(pk)
+                return
+            name, rating_sum, review_count = title
+            self.indexes[Title].add(
+                pk, name, rating=self.get_rating(rating_sum, review_count)
+            )
+        self.apply(change)
+
+    def refresh_rating(self, pk):
+        """Обновляет рейтинг произведения после записи отзыва.
+
+        Названия не меняются, поэтому общий счетчик индекса остается
+        прежним; процесс, в котором записан отзыв, обновляет рейтинг
+        сразу, остальные — при следующем чтении рейтингов.
+        """
+        new_version = increment_version(RATING_RESOURCE)
+        with self.lock:
+            if self.version is None or pk not in self.indexes[Title].items:
+                return
+            rating_sum, review_count = Title.objects.filter(
+                pk=pk
+            ).values_list('rating_sum', 'review_count').first() or (0, 0)
+            self.indexes[Title].items[pk]['rating'] = self.get_rating(
+                rating_sum, review_count
+            )
+            if new_version == self.rating_version + 1:
+                self.rating_version = new_version
+
+    def update_named(self, model, pk, name, slug):
+        self.apply(lambda: self.indexes[model].add(pk, name, slug=slug))
+
+    def remove(self, model, pk):
+        self.apply(lambda: self.indexes[model].remove(pk))
+
+
+autocomplete = AutocompleteIndex()
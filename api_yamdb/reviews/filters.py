@@ -1,6 +1,10 @@
 import django_filters
+from django.db.models import CharField, Count, Value
+from django.db.models.functions import Cast
+from rest_framework.filters import BaseFilterBackend
 
 from .models import Title
+from .search import search
 
 
 class TitleFilter(django_filters.FilterSet):
@@ -11,3 +15,51 @@ class TitleFilter(django_filters.FilterSet):
     class Meta:
         model = Title
         fields = ['genre__slug', 'category__slug', 'year', 'name']
+
+
+# Фасет -> поле, по значениям которого считаются произведения.
+TITLE_FACETS = {
+    'genre': 'genre__slug',
+    'category': 'category__slug',
+    'year': 'year',
+}
+
+
+def get_title_facets(queryset, names):
+    """Число произведений выборки по значениям фасетов одним запросом.
+
+    Группировки по каждому фасету объединяются через UNION ALL.
+    Выборка подставляется подзапросом по id, поэтому фильтр по жанру
+    не сужает сам фасет жанров: для найденных произведений считаются
+    все их жанры.
+    """
+    base = Title.objects.filter(pk__in=queryset.values('pk')).order_by()
+    queries = [
+        base.values(value=Cast(TITLE_FACETS[name], CharField())).annotate(
+            facet=Value(name, output_field=CharField()),
+            count=Count('pk', distinct=True)
+        ).values_list('facet', 'value', 'count')
+        for name in names
+    ]
+    facets = {name: [] for name in names}
+    for name, value, count in queries[0].union(*queries[1:], all=True):
+        if value is None:
+            continue
+        if name == 'year':
+            value = int(value)
+        facets[name].append({'value': value, 'count': count})
+    for values in facets.values():
+        values.sort(key=lambda item: (-item['count'], item['value']))
+    return facets
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """Полнотекстовый поиск по параметру ``search`` с ранжированием."""
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search(queryset, query)
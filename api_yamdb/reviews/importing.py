@@ -0,0 +1,977 @@
+"""Массовый импорт CSV-выгрузок в БД.
+
+Файл делится на пакеты — диапазоны байтов примерно по ``batch_size``,
+границы которых совпадают с концами записей CSV. Пакеты разбираются
+и проверяются в пуле процессов: внешние ключи — по заранее
+загруженным множествам id, а не запросом на строку. Записывает их
+единственный писатель в исходном порядке: один ``executemany``
+с ``INSERT ... ON CONFLICT (id) DO UPDATE`` в транзакции на пакет.
+После каждого пакета в контрольную точку сохраняется смещение в файле,
+и прерванный импорт продолжается с него.
+
+Сигналы моделей при этом не срабатывают, поэтому рейтинги,
+полнотекстовый индекс и версии кэша обновляются один раз после
+импорта.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from hashlib import blake2b
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DateTimeField, ProtectedError
+from django.utils import timezone
+
+from api.cache import bump_version
+from api.constants import MAX_SCORE, MIN_SCORE
+from . import activity, histograms, leaderboard, search, trending
+from .models import (Category, Comment, Genre, GenreTitle, ImportFingerprint,
+                     Review, Title)
+from .signals import recount_ratings
+
+User = get_user_model()
+
+DEFAULT_BATCH_SIZE = 4 * 1024 * 1024
+# Сколько id передается в одном запросе с IN.
+ID_CHUNK_SIZE = 500
+# Как найти произведения, от которых зависят строки таблицы: их
+# рейтинги, распределения оценок, сводки и популярность
+# пересчитываются после импорта.
+TITLE_LOOKUPS = {
+    Title: 'pk',
+    GenreTitle: 'title_id',
+    Review: 'title_id',
+    Comment: 'review__title_id',
+}
+
+
+def parse_date(value):
+    # fromisoformat заметно быстрее parse_datetime, а на миллионе строк
+    # разбор дат становится заметной частью импорта.
+    date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def parse_score(value):
+    score = int(value)
+    if not MIN_SCORE <= score <= MAX_SCORE:
+        raise ValueError(
+            f'Оценка должна быть от {MIN_SCORE} до {MAX_SCORE}: {score}'
+        )
+    return score
+
+
+class ImportTable:
+    """Описание одного CSV-файла и таблицы, в которую он загружается.
+
+    ``columns`` — тройки (колонка CSV, поле модели, преобразование),
+    первой идет id;
+    ``references`` — поле внешнего ключа -> имя таблицы импорта,
+    ``insert_defaults`` — значения полей, которых нет в CSV, только
+    для новых строк; ``touch`` — поля, которые получают текущее время
+    и при вставке, и при обновлении; ``unique`` — наборы полей,
+    значения которых не могут повторяться у разных строк.
+    """
+
+    def __init__(self, name, model, columns, references=None,
+                 insert_defaults=None, touch=(), unique=()):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.references = references or {}
+        self.insert_defaults = insert_defaults or {}
+        self.touch = touch
+        self.unique = unique
+
+    @property
+    def filename(self):
+        return f'{self.name}.csv'
+
+    def get_field_names(self):
+        return (
+            [field for _, field, _ in self.columns]
+            + list(self.touch)
+            + list(self.insert_defaults)
+        )
+
+    def get_upsert_sql(self):
+        quote = connection.ops.quote_name
+        meta = self.model._meta
+        columns = [
+            meta.get_field(name).column for name in self.get_field_names()
+        ]
+        updated = [
+            meta.get_field(name).column
+            for name in [field for _, field, _ in self.columns] + list(
+                self.touch
+            )
+            if name != meta.pk.name
+        ]
+        return (
+            f'INSERT INTO {quote(meta.db_table)} '
+            f'({", ".join(quote(column) for column in columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(columns))}) '
+            f'ON CONFLICT ({quote(meta.pk.column)}) DO UPDATE SET '
+            + ', '.join(
+                f'{quote(column)} = excluded.{quote(column)}'
+                for column in updated
+            )
+        )
+
+
+TABLES = (
+    ImportTable(
+        'users', User,
+        (
+            ('id', 'id', int),
+            ('username', 'username', str),
+            ('email', 'email', str),
+            ('role', 'role', str),
+            ('bio', 'bio', str),
+            ('first_name', 'first_name', str),
+            ('last_name', 'last_name', str),
+        ),
+        insert_defaults={
+            'password': '',
+            'is_superuser': False,
+            'is_staff': False,
+            'is_active': True,
+            'date_joined': timezone.now,
+        },
+        unique=(('username',), ('email',)),
+    ),
+    ImportTable(
+        'category', Category,
+        (('id', 'id', int), ('name', 'name', str), ('slug', 'slug', str)),
+        unique=(('slug',),),
+    ),
+    ImportTable(
+        'genre', Genre,
+        (('id', 'id', int), ('name', 'name', str), ('slug', 'slug', str)),
+        unique=(('slug',),),
+    ),
+    ImportTable(
+        'titles', Title,
+        (
+            ('id', 'id', int),
+            ('name', 'name', str),
+            ('year', 'year', int),
+            ('category', 'category_id', int),
+        ),
+        references={'category_id': 'category'},
+        insert_defaults={'rating_sum': 0, 'review_count': 0},
+        touch=('updated_at',),
+    ),
+    ImportTable(
+        'genre_title', GenreTitle,
+        (
+            ('id', 'id', int),
+            ('title_id', 'title_id', int),
+            ('genre_id', 'genre_id', int),
+        ),
+        references={'title_id': 'titles', 'genre_id': 'genre'},
+    ),
+    ImportTable(
+        'review', Review,
+        (
+            ('id', 'id', int),
+            ('title_id', 'title_id', int),
+            ('text', 'text', str),
+            ('author', 'author_id', int),
+            ('score', 'score', parse_score),
+            ('pub_date', 'pub_date', parse_date),
+        ),
+        references={'title_id': 'titles', 'author_id': 'users'},
+        touch=('updated_at',),
+        unique=(('author_id', 'title_id'),),
+    ),
+    ImportTable(
+        'comments', Comment,
+        (
+            ('id', 'id', int),
+            ('review_id', 'review_id', int),
+            ('text', 'text', str),
+            ('author', 'author_id', int),
+            ('pub_date', 'pub_date', parse_date),
+        ),
+        references={'review_id': 'review', 'author_id': 'users'},
+        touch=('updated_at',),
+    ),
+)
+TABLES_BY_NAME = {table.name: table for table in TABLES}
+
+
+def get_positions(table, header):
+    """Позиции колонок описания таблицы в заголовке CSV."""
+    for column, _, _ in table.columns:
+        if column not in header:
+            raise ValueError(f'{table.filename}: нет колонки {column!r}')
+    return [header.index(column) for column, _, _ in table.columns]
+
+
+def iter_ranges(file, start, line, size):
+    """Диапазоны (начало, конец, номер первой строки) целых записей CSV.
+
+    Текст в кавычках может содержать переводы строк, поэтому запись
+    заканчивается только на переводе строки, перед которым четное
+    число кавычек (экранированная кавычка удваивается и четность не
+    меняет). Кавычки и переводы строк считаются ``bytes.count``,
+    без разбора CSV.
+    """
+    file.seek(start)
+    range_start = position = start
+    range_line = line
+    quoted = False
+    lines = 0
+    while True:
+        block = file.read(size)
+        if not block:
+            break
+        cursor = 0
+        while True:
+            wanted = range_start + size - position
+            if wanted >= len(block):
+                wanted = len(block)
+            if wanted > cursor:
+                quoted ^= block.count(b'"', cursor, wanted) % 2 == 1
+                lines += block.count(b'\n', cursor, wanted)
+                cursor = wanted
+            if cursor == len(block):
+                break
+            newline = block.find(b'\n', cursor)
+            if newline == -1:
+                quoted ^= block.count(b'"', cursor) % 2 == 1
+                cursor = len(block)
+                break
+            quoted ^= block.count(b'"', cursor, newline) % 2 == 1
+            lines += 1
+            cursor = newline + 1
+            if not quoted:
+                end = position + cursor
+                yield range_start, end, range_line
+                range_start, range_line, lines = end, range_line + lines, 0
+        position += len(block)
+    if range_start < position:
+        yield range_start, position, range_line
+
+
+def convert_row(table, checks, line, values, errors):
+    """Значения колонок строки или None, если строка некорректна.
+
+    Ошибка — тройка (номер строки, колонка или None, сообщение).
+    """
+    if values is None:
+        errors.append((line, None, 'не хватает колонок'))
+        return None
+    try:
+        converted = [
+            convert(value)
+            for (_, _, convert), value in zip(table.columns, values)
+        ]
+    except ValueError:
+        for (column, _, convert), value in zip(table.columns, values):
+            try:
+                convert(value)
+            except ValueError as error:
+                errors.append((line, column, str(error)))
+                return None
+    for position, field, reference, ids in checks:
+        if converted[position] not in ids:
+            errors.append((
+                line,
+                table.columns[position][0],
+                f'{field}={converted[position]} не найден в {reference}'
+            ))
+            return None
+    return converted
+
+
+def get_adapter(field):
+    # get_db_prep_save на каждое значение обходится дороже самой
+    # вставки; числа и строки драйвер принимает как есть.
+    if not isinstance(field, DateTimeField):
+        return None
+    if connection.vendor == 'sqlite' and settings.USE_TZ:
+        # То же, что adapt_datetimefield_value для дат с часовым
+        # поясом (других parse_date не возвращает), без проверок
+        # на каждое значение.
+        db_timezone = connection.timezone
+        return lambda value: str(
+            value.astimezone(db_timezone).replace(tzinfo=None)
+        )
+    return connection.ops.adapt_datetimefield_value
+
+
+def prepare(table, rows):
+    """Параметры INSERT для проверенных строк пакета."""
+    meta = table.model._meta
+    adapters = [
+        (position, adapter)
+        for position, adapter in enumerate(
+            get_adapter(meta.get_field(field))
+            for _, field, _ in table.columns
+        )
+        if adapter
+    ]
+    names = list(table.touch) + list(table.insert_defaults)
+    values = [timezone.now()] * len(table.touch) + [
+        value() if callable(value) else value
+        for value in table.insert_defaults.values()
+    ]
+    extra = [
+        meta.get_field(name).get_db_prep_save(value, connection)
+        for name, value in zip(names, values)
+    ]
+    params = []
+    for row in rows:
+        for position, adapter in adapters:
+            row[position] = adapter(row[position])
+        params.append(row + extra)
+    return params
+
+
+# Проверки внешних ключей таблицы, которую разбирает процесс пула:
+# множества id передаются один раз при запуске процесса, а не с
+# каждым пакетом.
+worker_checks = []
+
+
+def init_worker(checks):
+    if not apps.ready:
+        # Процесс запущен не через fork и не унаследовал настройку.
+        django.setup()
+    worker_checks[:] = checks
+
+
+def get_digest(values):
+    """Хэш значений строки: 64 бита со знаком, как BIGINT в БД."""
+    return int.from_bytes(
+        blake2b('\x1f'.join(values).encode(), digest_size=8).digest(),
+        'big',
+        signed=True
+    )
+
+
+def get_record_id(record, positions):
+    """id записи CSV или None, если его не удается прочитать."""
+    try:
+        return int(record[positions[0]])
+    except (IndexError, ValueError):
+        return None
+
+
+def parse_range(table_name, filename, positions, start, end, line):
+    """Разбирает диапазон файла.
+
+    Возвращает параметры INSERT корректных строк, их номера в файле
+    и хэши содержимого, ошибки, номер строки после диапазона и id всех
+    записей, включая некорректные: они не считаются пропавшими
+    из выгрузки.
+    """
+    table = TABLES_BY_NAME[table_name]
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    reader = csv.reader(io.StringIO(data.decode('utf-8'), newline=''))
+    rows, lines, digests, errors, seen = [], [], [], [], []
+    for record in reader:
+        if not record:
+            continue
+        row_line = line - 1 + reader.line_num
+        record_id = get_record_id(record, positions)
+        if record_id is not None:
+            seen.append(record_id)
+        try:
+            values = [record[index] for index in positions]
+        except IndexError:
+            values = None
+        row = convert_row(table, worker_checks, row_line, values, errors)
+        if row is not None:
+            rows.append(row)
+            lines.append(row_line)
+            digests.append(get_digest(values))
+    return (
+        prepare(table, rows), lines, digests, errors,
+        line + data.count(b'\n'), seen
+    )
+
+
+def read_ids(filename, positions, start, end):
+    """id записей диапазона файла без разбора остальных колонок."""
+    with open(filename, 'rb') as file:
+        file.seek(start)
+
+        def lines():
+            # Диапазон кончается на границе записи, а значит и строки.
+            while file.tell() < end:
+                yield file.readline().decode('utf-8')
+
+        for record in csv.reader(lines()):
+            record_id = get_record_id(record, positions)
+            if record_id is not None:
+                yield record_id
+
+
+def get_fingerprint(filename):
+    """Размер и время изменения: новая выгрузка не продолжает старую."""
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def get_checkpoint_filename(path):
+    """Файл контрольной точки по умолчанию для каталога ``path``.
+
+    Состояние импорта пишется во временный каталог, а не рядом
+    с выгрузкой: каталог с CSV может лежать в репозитории или быть
+    доступным только для чтения. Имя зависит от каталога, чтобы
+    импорты разных выгрузок не мешали друг другу.
+    """
+    digest = blake2b(
+        os.path.abspath(path).encode(), digest_size=8
+    ).hexdigest()
+    return os.path.join(
+        tempfile.gettempdir(), f'import_all.{digest}.checkpoint.json'
+    )
+
+
+class Checkpoint:
+    """Контрольная точка импорта в JSON-файле.
+
+    Для каждой таблицы хранит отпечаток файла, смещение после
+    последнего записанного пакета, номер этой строки файла и номер
+    пакета, а также индексы, снятые на время загрузки.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.state = {}
+        if os.path.exists(filename):
+            with open(filename, encoding='utf-8') as file:
+                self.state = json.load(file)
+
+    def get(self, table, fingerprint):
+        """Состояние таблицы; для другой выгрузки — начальное."""
+        state = self.state.get(table.name)
+        if state is None or state['fingerprint'] != fingerprint:
+            state = self.state[table.name] = {
+                'fingerprint': fingerprint, 'batch': 0
+            }
+        return state
+
+    def save(self):
+        # Запись во временный файл и замена: прерывание на середине
+        # записи не должно испортить предыдущую контрольную точку.
+        temporary = f'{self.filename}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file)
+        os.replace(temporary, self.filename)
+
+    def clear(self):
+        self.state = {}
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+class TableResult:
+
+    def __init__(self, table):
+        self.table = table
+        self.written = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.errors = []
+        self.delete_errors = []
+        self.elapsed = 0.0
+        self.resumed_from = None
+        self.skipped = False
+
+    @property
+    def rate(self):
+        return self.written / self.elapsed if self.elapsed else 0.0
+
+
+class Importer:
+    """Загрузка таблиц из каталога с CSV-файлами.
+
+    Для каждой загруженной строки в ``ImportFingerprint`` хранится хэш
+    ее содержимого в CSV, и повторный импорт записывает только строки,
+    хэш которых изменился. Отпечатки обновляются в одной транзакции
+    с данными, поэтому не расходятся с ними и при прерванном импорте.
+    С ``full`` записываются все строки, с ``delete_missing`` удаляются
+    загруженные прежде строки, которых нет в выгрузке; строки,
+    созданные через API, не удаляются.
+    """
+
+    def __init__(self, path, checkpoint, batch_size=DEFAULT_BATCH_SIZE,
+                 workers=1, full=False, delete_missing=False):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.workers = workers
+        self.full = full
+        self.id_sets = {}
+        self.seen = defaultdict(set) if delete_missing else None
+        self.changed = defaultdict(set)
+        self.changed_titles = set()
+        self.track_changes = True
+        self.rebuild_search = False
+        self.recount_all = False
+        self.written = 0
+
+    def get_ids(self, name):
+        """Множество id таблицы; грузится один раз и пополняется."""
+        if name not in self.id_sets:
+            self.id_sets[name] = set(
+                TABLES_BY_NAME[name].model.objects.values_list(
+                    'pk', flat=True
+                ).iterator()
+            )
+        return self.id_sets[name]
+
+    def get_checks(self, table):
+        """Позиции внешних ключей и множества допустимых для них id."""
+        return [
+            (position, field, table.references[field],
+             self.get_ids(table.references[field]))
+            for position, (_, field, _) in enumerate(table.columns)
+            if field in table.references
+        ]
+
+    def parse(self, table, filename, positions, ranges):
+        """Разобранные пакеты в порядке следования в файле.
+
+        В работе одновременно не больше двух пакетов на процесс:
+        память не растет, даже если писатель отстает от пула.
+        """
+        checks = self.get_checks(table)
+        if self.workers == 1:
+            init_worker(checks)
+            for start, end, line in ranges:
+                yield end, parse_range(
+                    table.name, filename, positions, start, end, line
+                )
+            return
+        with ProcessPoolExecutor(
+            self.workers, initializer=init_worker, initargs=(checks,)
+        ) as executor:
+            pending = deque()
+            for start, end, line in ranges:
+                pending.append((end, executor.submit(
+                    parse_range,
+                    table.name, filename, positions, start, end, line
+                )))
+                if len(pending) >= self.workers * 2:
+                    end, future = pending.popleft()
+                    yield end, future.result()
+            while pending:
+                end, future = pending.popleft()
+                yield end, future.result()
+
+    @staticmethod
+    def get_stored_digests(table, ids):
+        """Сохраненные хэши строк пакета, которые еще есть в таблице.
+
+        Выгрузки обычно упорядочены по id, и тогда хватает одного
+        запроса по диапазону. Отпечаток строки, удаленной через API,
+        не учитывается: такая строка будет записана заново.
+        """
+        quote = connection.ops.quote_name
+        meta = table.model._meta
+        sql = (
+            f'SELECT f.row_id, f.digest '
+            f'FROM {quote(ImportFingerprint._meta.db_table)} f '
+            f'JOIN {quote(meta.db_table)} t '
+            f'ON t.{quote(meta.pk.column)} = f.row_id '
+            f'WHERE f.table_name = %s AND f.row_id '
+        )
+        low, high = min(ids), max(ids)
+        if high - low < 2 * len(ids):
+            queries = [(f'{sql} BETWEEN %s AND %s', [table.name, low, high])]
+        else:
+            queries = [
+                (f'{sql} IN ({", ".join(["%s"] * len(chunk))})',
+                 [table.name, *chunk])
+                for chunk in (
+                    ids[start:start + ID_CHUNK_SIZE]
+                    for start in range(0, len(ids), ID_CHUNK_SIZE)
+                )
+            ]
+        stored = {}
+        with connection.cursor() as cursor:
+            for query, params in queries:
+                cursor.execute(query, params)
+                stored.update(cursor.fetchall())
+        return stored
+
+    def write(self, table, params, lines, digests, result):
+        """Записывает строки и их отпечатки в одной транзакции."""
+        sql = table.get_upsert_sql()
+        quote = connection.ops.quote_name
+        fingerprint_sql = (
+            f'INSERT INTO {quote(ImportFingerprint._meta.db_table)} '
+            f'(table_name, row_id, digest) VALUES (%s, %s, %s) '
+            f'ON CONFLICT (table_name, row_id) '
+            f'DO UPDATE SET digest = excluded.digest'
+        )
+        fingerprints = [
+            (table.name, row[0], digest)
+            for row, digest in zip(params, digests)
+        ]
+        written = []
+        # Прежние произведения обновляемых строк: отзыв мог перейти
+        # к другому произведению.
+        self.track_titles(table, [row[0] for row in params])
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+                cursor.executemany(fingerprint_sql, fingerprints)
+            written = fingerprints
+        except IntegrityError:
+            pass
+        if not written:
+            # Пакет нарушил ограничение БД (например, уникальность):
+            # пишем его построчно, чтобы найти и пропустить плохие
+            # строки.
+            with transaction.atomic(), connection.cursor() as cursor:
+                for line, row_params, fingerprint in zip(
+                    lines, params, fingerprints
+                ):
+                    try:
+                        with transaction.atomic():
+                            cursor.execute(sql, row_params)
+                            cursor.execute(fingerprint_sql, fingerprint)
+                        written.append(fingerprint)
+                    except IntegrityError as error:
+                        result.errors.append((line, None, str(error)))
+        if self.track_changes and table.model in search.SEARCH_INDEXES:
+            self.changed[table.model].update(
+                row_id for _, row_id, _ in written
+            )
+        self.track_titles(table, [row_id for _, row_id, _ in written])
+        self.written += len(written)
+        return len(written)
+
+    def track_titles(self, table, ids):
+        """Запоминает произведения, от которых зависят строки ``ids``."""
+        field = TITLE_LOOKUPS.get(table.model)
+        if field is None or not self.track_changes:
+            return
+        for start in range(0, len(ids), ID_CHUNK_SIZE):
+            self.changed_titles.update(table.model.objects.filter(
+                pk__in=ids[start:start + ID_CHUNK_SIZE]
+            ).values_list(field, flat=True))
+
+    def filter_changed(self, table, state, batch, result):
+        """Оставляет в пакете строки, изменившиеся с прошлого импорта."""
+        params, lines, digests = batch
+        if self.full or state['empty'] or not params:
+            return params, lines, digests
+        stored = self.get_stored_digests(table, [row[0] for row in params])
+        changed = [
+            index for index, (row, digest) in enumerate(zip(params, digests))
+            if stored.get(row[0]) != digest
+        ]
+        result.unchanged += len(params) - len(changed)
+        return (
+            [params[index] for index in changed],
+            [lines[index] for index in changed],
+            [digests[index] for index in changed],
+        )
+
+    @contextmanager
+    def bulk_load(self, table, state):
+        """Условия пакетной загрузки таблицы.
+
+        Внешние ключи уже проверены по множествам id, поэтому, как и
+        в loaddata, БД проверяет их один раз после загрузки. Вторичные
+        индексы пустой таблицы SQLite снимаются на время загрузки:
+        построить индекс по готовой таблице в разы быстрее, чем
+        поддерживать его на каждой вставке. Уникальные индексы
+        остаются — на них держатся ограничения. Снятые индексы
+        сохраняются в контрольной точке до удаления, чтобы их
+        восстановил и импорт, продолживший прерванный.
+        """
+        db_table = table.model._meta.db_table
+        indexes = state.get('indexes', [])
+        if (not indexes and connection.vendor == 'sqlite'
+                and not table.model.objects.exists()):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT name, sql FROM sqlite_master WHERE type = 'index' "
+                    "AND tbl_name = %s AND sql IS NOT NULL "
+                    "AND sql NOT LIKE 'CREATE UNIQUE%%'",
+                    [db_table]
+                )
+                indexes = state['indexes'] = cursor.fetchall()
+                self.checkpoint.save()
+                for name, _ in indexes:
+                    cursor.execute(
+                        f'DROP INDEX {connection.ops.quote_name(name)}'
+                    )
+        try:
+            with connection.constraint_checks_disabled():
+                yield
+        finally:
+            with connection.cursor() as cursor:
+                for _, sql in indexes:
+                    cursor.execute(sql)
+            if indexes:
+                state['indexes'] = []
+                self.checkpoint.save()
+        connection.check_constraints(table_names=[db_table])
+
+    def restore_state(self, table, state, filename, positions, data_start,
+                      result):
+        """Начинает загрузку таблицы или продолжает прерванную."""
+        if 'offset' not in state:
+            state.update(
+                offset=data_start, line=2,
+                empty=not table.model.objects.exists()
+            )
+        elif self.seen is not None:
+            # Записи, загруженные до прерывания, тоже есть в выгрузке,
+            # и удалять их нельзя.
+            self.seen[table.name].update(
+                read_ids(filename, positions, data_start, state['offset'])
+            )
+        if state['batch'] or state.get('done'):
+            # Какие строки записаны до прерывания, неизвестно.
+            if table.model in search.SEARCH_INDEXES:
+                self.rebuild_search = True
+            if table.model in TITLE_LOOKUPS:
+                self.recount_all = True
+        if state.get('done'):
+            result.skipped = True
+        elif state['batch']:
+            result.resumed_from = state['batch'] + 1
+
+    def import_table(self, table):
+        result = TableResult(table)
+        started = time.perf_counter()
+        filename = f'{self.path}{table.filename}'
+        state = self.checkpoint.get(table, get_fingerprint(filename))
+        with open(filename, 'rb') as file:
+            header = next(csv.reader([file.readline().decode('utf-8')]), [])
+            if not header:
+                state['done'] = True
+                self.checkpoint.save()
+                return result
+            positions = get_positions(table, header)
+            self.restore_state(
+                table, state, filename, positions, file.tell(), result
+            )
+            if result.skipped:
+                return result
+            ranges = iter_ranges(
+                file, state['offset'], state['line'], self.batch_size
+            )
+            # Загрузку в пустую таблицу проще проиндексировать
+            # целиком, чем запоминать id каждой строки.
+            self.track_changes = not state['empty']
+            with self.bulk_load(table, state):
+                ids = self.id_sets.get(table.name)
+                for offset, batch in self.parse(
+                    table, filename, positions, ranges
+                ):
+                    params, lines, digests, errors, line, seen = batch
+                    result.errors += errors
+                    if self.seen is not None:
+                        self.seen[table.name].update(seen)
+                    params, lines, digests = self.filter_changed(
+                        table, state, (params, lines, digests), result
+                    )
+                    if params:
+                        result.written += self.write(
+                            table, params, lines, digests, result
+                        )
+                        if ids is not None:
+                            ids.update(row[0] for row in params)
+                    state.update(
+                        offset=offset, line=line, batch=state['batch'] + 1
+                    )
+                    self.checkpoint.save()
+        if state['empty'] and result.written:
+            if table.model in search.SEARCH_INDEXES:
+                self.rebuild_search = True
+            if table.model in TITLE_LOOKUPS:
+                self.recount_all = True
+        state['done'] = True
+        self.checkpoint.save()
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def get_unique_keys(self, table):
+        """Уникальные наборы полей: позиции в строке и занятые значения.
+
+        Значения берутся из БД одним запросом на набор и дальше
+        пополняются проверенными строками файла.
+        """
+        fields = [field for _, field, _ in table.columns]
+        keys = []
+        for unique in table.unique:
+            taken = {
+                tuple(values): pk
+                for pk, *values in table.model.objects.values_list(
+                    'pk', *unique
+                ).iterator()
+            }
+            keys.append((
+                unique, [fields.index(field) for field in unique], taken
+            ))
+        return keys
+
+    @staticmethod
+    def check_unique(table, keys, row):
+        """Ошибка уникальности строки или None; запоминает ее значения."""
+        for unique, positions, taken in keys:
+            key = tuple(row[position] for position in positions)
+            owner = taken.setdefault(key, row[0])
+            if owner != row[0]:
+                values = ', '.join(
+                    f'{field}={value}' for field, value in zip(unique, key)
+                )
+                return (
+                    table.columns[positions[0]][0],
+                    f'{values} уже есть у строки id={owner}'
+                )
+        return None
+
+    def validate_table(self, table):
+        """Проверяет файл целиком, ничего не записывая.
+
+        Проверки те же, что при загрузке, плюс уникальность по
+        ``table.unique`` среди строк файла и БД. Корректные строки
+        пополняют множества id, как если бы были загружены: на них
+        могут ссылаться следующие файлы. ``written`` результата —
+        число корректных строк.
+        """
+        result = TableResult(table)
+        started = time.perf_counter()
+        filename = f'{self.path}{table.filename}'
+        with open(filename, 'rb') as file:
+            header = next(csv.reader([file.readline().decode('utf-8')]), [])
+            if not header:
+                return result
+            positions = get_positions(table, header)
+            ranges = iter_ranges(file, file.tell(), 2, self.batch_size)
+            ids = self.get_ids(table.name)
+            keys = self.get_unique_keys(table)
+            for _, batch in self.parse(table, filename, positions, ranges):
+                params, lines, _, errors, _, _ = batch
+                result.errors += errors
+                for row, line in zip(params, lines):
+                    error = self.check_unique(table, keys, row)
+                    if error:
+                        result.errors.append((line, *error))
+                        continue
+                    ids.add(row[0])
+                    result.written += 1
+        result.errors.sort(key=lambda error: error[0])
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def delete_missing(self, table, result):
+        """Удаляет загруженные прежде строки, которых нет в выгрузке.
+
+        Удаление идет через ORM: каскады и сигналы (рейтинги,
+        поисковый индекс) отрабатывают как при удалении через API.
+        Строку, на которую ссылаются защищенные внешние ключи,
+        удалить нельзя — она попадает в ошибки.
+        """
+        seen = self.seen.pop(table.name, set())
+        fingerprints = ImportFingerprint.objects.filter(
+            table_name=table.name
+        )
+        missing = [
+            row_id for row_id in fingerprints.values_list(
+                'row_id', flat=True
+            ).iterator()
+            if row_id not in seen
+        ]
+        label = table.model._meta.label
+        for start in range(0, len(missing), ID_CHUNK_SIZE):
+            chunk = missing[start:start + ID_CHUNK_SIZE]
+            try:
+                with transaction.atomic():
+                    _, deleted = table.model.objects.filter(
+                        pk__in=chunk
+                    ).delete()
+                    fingerprints.filter(row_id__in=chunk).delete()
+                result.deleted += deleted.get(label, 0)
+                continue
+            except (IntegrityError, ProtectedError):
+                pass
+            for row_id in chunk:
+                try:
+                    with transaction.atomic():
+                        _, deleted = table.model.objects.filter(
+                            pk=row_id
+                        ).delete()
+                        fingerprints.filter(row_id=row_id).delete()
+                    result.deleted += deleted.get(label, 0)
+                except (IntegrityError, ProtectedError) as error:
+                    result.delete_errors.append(
+                        f'id={row_id} не удален: {error}'
+                    )
+
+    def finish(self):
+        """Рейтинги, поиск и версии кэша, которые сигналы не обновили.
+
+        Строки записаны мимо сигналов, поэтому рейтинги, места в
+        рейтингах лучших, распределения оценок, дневные сводки и
+        популярность пересчитываются для произведений, затронутых
+        записанными строками. Удаленные строки обработали сигналы
+        ORM.
+
+        Если неизвестно, какие строки изменились (загрузка в пустую
+        таблицу или продолжение прерванного импорта), все это
+        перестраивается целиком, а полнотекстовый индекс нужно
+        перестроить командой ``rebuild_search_index``; иначе
+        переиндексируются только измененные строки. Импорт без
+        записанных строк ничего не пересчитывает.
+        """
+        if self.recount_all:
+            recount_ratings(Title.objects.all())
+            leaderboard.rebuild()
+            histograms.recount_histograms()
+            activity.recount_activity()
+            trending.recount_all()
+        else:
+            self.recount_titles(sorted(self.changed_titles))
+        if not (self.written or self.recount_all):
+            return
+        if search.is_supported() and not self.rebuild_search:
+            for model, ids in self.changed.items():
+                fields = search.SEARCH_INDEXES[model][1]
+                ids = sorted(ids)
+                for start in range(0, len(ids), ID_CHUNK_SIZE):
+                    search.index_objects(model, model.objects.only(
+                        *fields
+                    ).filter(pk__in=ids[start:start + ID_CHUNK_SIZE]))
+        bump_version('category', 'genre', 'title', 'autocomplete')
+
+    @staticmethod
+    def recount_titles(title_ids):
+        """Производные данные произведений ``title_ids`` по их отзывам."""
+        for start in range(0, len(title_ids), ID_CHUNK_SIZE):
+            chunk = title_ids[start:start + ID_CHUNK_SIZE]
+            recount_ratings(Title.objects.filter(pk__in=chunk))
+            histograms.recount_histograms(chunk)
+            trending.recount_trending(chunk)
+        activity.recount_activity(title_ids)
+        # Категория и жанры произведения тоже могли измениться.
+        for title_id in title_ids:
+            leaderboard.refresh_title(title_id)
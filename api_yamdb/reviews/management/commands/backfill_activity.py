@@ -0,0 +1,35 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from reviews.activity import DEFAULT_CHUNK_SIZE, recount_activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет дневных сводок отзывов, оценок и комментариев '
+        'по произведениям и жанрам'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=(
+                'Сколько произведений или жанров пересчитывается '
+                'в одной транзакции.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер куска должен быть положительным.')
+        started = time.perf_counter()
+        title_rows, genre_rows = recount_activity(
+            chunk_size=options['chunk_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Дней произведений: {title_rows}, дней жанров: {genre_rows}, '
+            f'{time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,71 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.models import Category, Title
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер скорости создания отзывов через API на временных данных'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=500,
+            help='Количество создаваемых отзывов.'
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        # Свой префикс на каждый запуск: временные записи не совпадают
+        # с уже существующими, и удаляются только созданные здесь.
+        prefix = f'benchmark-{uuid.uuid4().hex[:8]}'
+        category = Category.objects.create(name='Замер', slug=prefix)
+        title = Title.objects.create(
+            name='Замер', year=2000, category=category
+        )
+        author_ids = []
+        try:
+            User.objects.bulk_create(
+                User(
+                    username=f'{prefix}-{index}',
+                    email=f'{prefix}-{index}@yamdb.fake'
+                )
+                for index in range(count)
+            )
+            author_ids = list(User.objects.filter(
+                username__startswith=f'{prefix}-'
+            ).values_list('pk', flat=True))
+            url = f'/api/v1/titles/{title.id}/reviews/'
+            client = APIClient()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                for author in User.objects.filter(pk__in=author_ids):
+                    client.force_authenticate(author)
+                    response = client.post(
+                        url, data={'text': 'Замер', 'score': 5}
+                    )
+                    if response.status_code != 201:
+                        raise CommandError(response.content)
+                elapsed = time.perf_counter() - started
+        finally:
+            # Каждый отзыв создается в своей транзакции, как в обычном
+            # запросе, поэтому временные данные удаляются явно.
+            title.delete()
+            category.delete()
+            User.objects.filter(pk__in=author_ids).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано отзывов: {count} за {elapsed:.2f} с, '
+            f'{count / elapsed:.0f} отзывов/с, '
+            f'{len(context.captured_queries) / count:.1f} запросов на отзыв'
+        ))
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+from django.core.management import BaseCommand, CommandError
+
+from reviews.similarity import RatingMatrix, iter_neighbors
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер расчета похожих произведений на синтетических оценках '
+        'без обращения к БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reviews', type=int, default=1_000_000,
+            help='Количество оценок.'
+        )
+        parser.add_argument(
+            '--titles', type=int, default=20_000,
+            help='Количество произведений.'
+        )
+        parser.add_argument(
+            '--authors', type=int, default=100_000,
+            help='Количество авторов.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Количество процессов, считающих блоки.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора случайных чисел.'
+        )
+
+    @staticmethod
+    def generate(reviews, titles, authors, seed):
+        """Оценки с популярностью произведений и активностью авторов
+        по закону Ципфа, как в настоящих каталогах; повторные оценки
+        автором того же произведения заменяются новыми.
+        """
+        generator = np.random.default_rng(seed)
+
+        def zipf(size, count):
+            weights = 1 / np.arange(1, size + 1)
+            return generator.choice(size, count, p=weights / weights.sum())
+
+        pairs = np.empty(0, dtype=np.int64)
+        while len(pairs) < reviews:
+            count = 2 * (reviews - len(pairs))
+            pairs = np.union1d(pairs, zipf(authors, count) * titles
+                               + zipf(titles, count))
+        pairs = generator.choice(pairs, reviews, replace=False)
+        scores = generator.integers(1, 11, len(pairs))
+        return pairs // titles, pairs % titles, scores
+
+    def handle(self, *args, **options):
+        if min(options['reviews'], options['titles'], options['authors'],
+               options['workers']) < 1:
+            raise CommandError('Все параметры должны быть положительными.')
+        authors, titles, scores = self.generate(
+            options['reviews'], options['titles'], options['authors'],
+            options['seed']
+        )
+        started = time.perf_counter()
+        matrix = RatingMatrix(authors, titles, scores)
+        built = time.perf_counter()
+        found = sum(1 for _ in iter_neighbors(
+            matrix, workers=options['workers']
+        ))
+        elapsed = time.perf_counter() - built
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценок: {matrix.reviews}, произведений: {matrix.size}, '
+            f'с соседями: {found}; матрица {built - started:.2f} с, '
+            f'расчет {elapsed:.2f} с, '
+            f'{matrix.reviews / elapsed:.0f} оценок/с'
+        ))
@@ -0,0 +1,43 @@
+import os
+
+from django.core.management import BaseCommand, CommandError
+
+from api.constants import SIMILAR_TITLES_COUNT
+from reviews.similarity import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Пакетный расчет похожих произведений по оценкам авторов '
+        '(скорректированный косинус)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=SIMILAR_TITLES_COUNT,
+            help='Сколько соседей сохраняется для каждого произведения.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Количество процессов, считающих блоки произведений; '
+                 'при 1 блоки считаются в основном процессе.'
+        )
+
+    def handle(self, *args, **options):
+        if options['top_k'] < 1 or options['workers'] < 1:
+            raise CommandError(
+                'Число соседей и количество процессов должны быть '
+                'положительными.'
+            )
+        reviews, titles, (loaded, computed, saved) = rebuild(
+            options['top_k'], options['workers']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Отзывов: {reviews}, произведений с соседями: {titles}; '
+            f'загрузка {loaded:.2f} с, расчет {computed:.2f} с, '
+            f'запись {saved:.2f} с'
+        ))
@@ -0,0 +1,49 @@
+import os
+
+from django.core.management import BaseCommand, CommandError
+
+from reviews.exporting import DEFAULT_CHUNK_SIZE, export_table, snapshot
+from reviews.importing import TABLES
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгрузка всех таблиц в CSV-файлы в формате, который загружает '
+        'import_all'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Каталог для CSV-файлов; создается, если его нет.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Сколько строк читается из БД за раз.'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать файлы (имена с суффиксом .csv.gz).'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path.endswith('/'):
+            path += '/'
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер куска должен быть положительным.')
+        try:
+            os.makedirs(path, exist_ok=True)
+            with snapshot():
+                for table in TABLES:
+                    filename, count, elapsed = export_table(
+                        table, path, options['chunk_size'], options['gzip']
+                    )
+                    self.stdout.write(self.style.SUCCESS(
+                        f'{filename}: выгружено {count}, {elapsed:.2f} с'
+                    ))
+        except OSError as error:
+            raise CommandError(error)
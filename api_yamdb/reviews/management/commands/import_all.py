@@ -0,0 +1,205 @@
+import json
+import os
+import time
+
+from django.core.management import BaseCommand, CommandError, call_command
+
+from api.constants import STATIC_PATH_CSV_FILES
+from reviews.importing import (DEFAULT_BATCH_SIZE, TABLES, Checkpoint,
+                               Importer, get_checkpoint_filename)
+
+MAX_REPORTED_ERRORS = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Импорт всех CSV-файлов в порядке зависимостей: пакетная '
+        'вставка с обновлением существующих строк по id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=STATIC_PATH_CSV_FILES,
+            help='Каталог с CSV-файлами.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Примерный размер пакета в байтах файла; каждый пакет '
+                 'записывается в одной транзакции.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Количество процессов, разбирающих пакеты; при 1 пакеты '
+                 'разбираются в основном процессе.'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Записать все строки, а не только изменившиеся '
+                 'с прошлого импорта.'
+        )
+        parser.add_argument(
+            '--delete-missing',
+            action='store_true',
+            help='Удалить загруженные прежде строки, которых нет '
+                 'в выгрузке.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки; по умолчанию — файл во '
+                 'временном каталоге, свой для каждого каталога '
+                 'с CSV-файлами.'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать импорт заново, не продолжая прерванный.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только проверить файлы, ничего не записывая, и вывести '
+                 'отчет о некорректных строках в JSON.'
+        )
+        parser.add_argument(
+            '--report',
+            help='Файл для отчета --dry-run; по умолчанию отчет '
+                 'выводится в stdout.'
+        )
+
+    @staticmethod
+    def get_path(options):
+        """Каталог с CSV-файлами; заодно проверяет числовые параметры."""
+        path = options['path']
+        if not path.endswith('/'):
+            path += '/'
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError(
+                'Размер пакета и количество процессов должны быть '
+                'положительными.'
+            )
+        return path
+
+    def handle(self, *args, **options):
+        path = self.get_path(options)
+        if options['dry_run']:
+            return self.validate(path, options)
+        checkpoint = Checkpoint(
+            options['checkpoint'] or get_checkpoint_filename(path)
+        )
+        if options['restart']:
+            checkpoint.clear()
+        importer = Importer(
+            path, checkpoint, options['batch_size'], options['workers'],
+            full=options['full'], delete_missing=options['delete_missing']
+        )
+        started = time.perf_counter()
+        results = []
+        for table in TABLES:
+            try:
+                result = importer.import_table(table)
+            except (OSError, ValueError) as error:
+                raise CommandError(error)
+            self.report(result)
+            results.append(result)
+        if options['delete_missing']:
+            # Сначала зависимые таблицы: их строки могут ссылаться
+            # на удаляемые.
+            for result in reversed(results):
+                importer.delete_missing(result.table, result)
+                self.report_deleted(result)
+        importer.finish()
+        if importer.rebuild_search:
+            call_command('rebuild_search_index', stdout=self.stdout)
+        checkpoint.clear()
+        elapsed = time.perf_counter() - started
+        written = sum(result.written for result in results)
+        errors = sum(
+            len(result.errors) + len(result.delete_errors)
+            for result in results
+        )
+        style = self.style.WARNING if errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Всего записано строк: {written}, без изменений: '
+            f'{sum(result.unchanged for result in results)}, удалено: '
+            f'{sum(result.deleted for result in results)}, пропущено: '
+            f'{errors}, {elapsed:.2f} с, {written / elapsed:.0f} строк/с'
+        ))
+
+    def report(self, result):
+        filename = result.table.filename
+        if result.skipped:
+            self.stdout.write(
+                f'{filename}: загружен до прерывания, пропущен'
+            )
+            return
+        if result.resumed_from:
+            self.stdout.write(
+                f'{filename}: продолжение с пакета {result.resumed_from}'
+            )
+        for line, column, error in result.errors[:MAX_REPORTED_ERRORS]:
+            if column:
+                error = f'{column}: {error}'
+            self.stdout.write(self.style.ERROR(
+                f'{filename}, строка {line}: {error}'
+            ))
+        hidden = len(result.errors) - MAX_REPORTED_ERRORS
+        if hidden > 0:
+            self.stdout.write(self.style.ERROR(
+                f'{filename}: еще ошибок: {hidden}'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'{filename}: записано {result.written}, '
+            f'без изменений {result.unchanged}, '
+            f'пропущено {len(result.errors)}, '
+            f'{result.elapsed:.2f} с, {result.rate:.0f} строк/с'
+        ))
+
+    def report_deleted(self, result):
+        filename = result.table.filename
+        for error in result.delete_errors[:MAX_REPORTED_ERRORS]:
+            self.stdout.write(self.style.ERROR(f'{filename}: {error}'))
+        self.stdout.write(
+            f'{filename}: удалено {result.deleted}, '
+            f'не удалось удалить {len(result.delete_errors)}'
+        )
+
+    def validate(self, path, options):
+        """Проверка всех файлов без записи: отчет в JSON.
+
+        Команда завершается ошибкой, если есть некорректные строки,
+        поэтому ее можно ставить перед импортом в сценариях загрузки.
+        """
+        importer = Importer(path, None, options['batch_size'],
+                            options['workers'])
+        tables = []
+        errors = []
+        for table in TABLES:
+            try:
+                result = importer.validate_table(table)
+            except (OSError, ValueError) as error:
+                raise CommandError(error)
+            tables.append({
+                'file': table.filename,
+                'rows': result.written + len(result.errors),
+                'bad_rows': len(result.errors),
+                'elapsed': round(result.elapsed, 3),
+            })
+            errors.extend(
+                {'file': table.filename, 'line': line, 'column': column,
+                 'error': error}
+                for line, column, error in result.errors
+            )
+        report = {'valid': not errors, 'tables': tables, 'errors': errors}
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, ensure_ascii=False))
+        if errors:
+            raise CommandError(f'Некорректных строк: {len(errors)}')
@@ -44,4 +44,4 @@ class Command(BaseCommand):
             category = Category.objects.get(id=category_id)
             return category
         except Category.DoesNotExist:
-            return ValueError('Категория не найдена')
+            raise ValueError('Категория не найдена')
@@ -0,0 +1,46 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from api.cache import bump_version
+from reviews import search
+
+
+class Command(BaseCommand):
+    help = 'Перестроение полнотекстового индекса произведений и отзывов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Количество объектов, загружаемых из БД за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.ERROR(
+                'Полнотекстовый индекс поддерживается только для SQLite.'
+            ))
+            return
+        chunk_size = options['chunk_size']
+        search.create_tables()
+        for model, (_, fields) in search.SEARCH_INDEXES.items():
+            indexed = 0
+            with transaction.atomic():
+                search.clear_index(model)
+                chunk = []
+                for obj in model.objects.only(*fields).order_by().iterator(
+                    chunk_size=chunk_size
+                ):
+                    chunk.append(obj)
+                    if len(chunk) == chunk_size:
+                        search.index_objects(model, chunk, replace=False)
+                        indexed += len(chunk)
+                        chunk = []
+                search.index_objects(model, chunk, replace=False)
+                indexed += len(chunk)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: '
+                f'проиндексировано {indexed}'
+            ))
+        bump_version('title')
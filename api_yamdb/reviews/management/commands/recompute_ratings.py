@@ -0,0 +1,82 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from reviews.models import Review, Title
+
+
+class Command(BaseCommand):
+    help = 'Пересчет рейтингов произведений с отчетом о расхождениях'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Количество произведений, обрабатываемых за один проход.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести расхождения, не сохраняя изменения.'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            titles = list(
+                Title.objects.filter(pk__gt=last_pk).order_by('pk').only(
+                    'pk', 'rating_sum', 'review_count', 'updated_at'
+                )[:chunk_size]
+            )
+            if not titles:
+                break
+            last_pk = titles[-1].pk
+            changed = self.recompute_chunk(titles)
+            checked += len(titles)
+            drifted += len(changed)
+            for title, old_sum, old_count in changed:
+                self.stdout.write(self.style.WARNING(
+                    f'Произведение ID {title.pk}: '
+                    f'сумма {old_sum} -> {title.rating_sum}, '
+                    f'отзывов {old_count} -> {title.review_count}'
+                ))
+            if changed and not dry_run:
+                with transaction.atomic():
+                    Title.objects.bulk_update(
+                        [title for title, _, _ in changed],
+                        ['rating_sum', 'review_count', 'updated_at']
+                    )
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено произведений: {checked}, '
+            f'с расхождениями: {drifted}'
+            + (' (изменения не сохранены)' if dry_run and drifted else '')
+        ))
+
+    @staticmethod
+    def recompute_chunk(titles):
+        totals = {
+            row['title_id']: (row['rating_sum'], row['review_count'])
+            for row in Review.objects.filter(
+                title_id__in=[title.pk for title in titles]
+            ).order_by().values('title_id').annotate(
+                rating_sum=Sum('score'),
+                review_count=Count('pk')
+            )
+        }
+        changed = []
+        now = timezone.now()
+        for title in titles:
+            rating_sum, review_count = totals.get(title.pk, (0, 0))
+            if (title.rating_sum, title.review_count) != (
+                rating_sum, review_count
+            ):
+                changed.append((title, title.rating_sum, title.review_count))
+                title.rating_sum = rating_sum
+                title.review_count = review_count
+                title.updated_at = now
+        return changed
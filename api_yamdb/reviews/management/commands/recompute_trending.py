@@ -0,0 +1,43 @@
+from django.core.management import BaseCommand, CommandError
+
+from reviews.trending import DEFAULT_CHUNK_SIZE, iter_recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет популярности произведений по датам отзывов с отчетом '
+        'о расхождениях'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Количество произведений, обрабатываемых за один проход.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести расхождения, не сохраняя изменения.'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер куска должен быть положительным.')
+        dry_run = options['dry_run']
+        checked = drifted = 0
+        for count, changed in iter_recount(
+            options['chunk_size'], save=not dry_run
+        ):
+            checked += count
+            drifted += len(changed)
+            for title_id, stored, score in changed:
+                self.stdout.write(self.style.WARNING(
+                    f'Произведение ID {title_id}: {stored} -> {score}'
+                ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено произведений: {checked}, '
+            f'с расхождениями: {drifted}'
+            + (' (изменения не сохранены)' if dry_run and drifted else '')
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management import BaseCommand
+
+from reviews import leaderboard
+from reviews.models import LeaderboardPrior
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчет средней оценки по всем отзывам и всех рейтингов '
+        'лучших произведений'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Средняя оценка: {LeaderboardPrior.objects.get()}, '
+            f'мест в рейтингах: {written}, '
+            f'{time.perf_counter() - started:.2f} с'
+        ))
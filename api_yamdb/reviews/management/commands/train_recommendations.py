@@ -0,0 +1,56 @@
+from django.core.management import BaseCommand, CommandError
+
+from reviews.recommendations import (DEFAULT_FACTORS, DEFAULT_ITERATIONS,
+                                     DEFAULT_REGULARIZATION, train)
+
+
+class Command(BaseCommand):
+    help = (
+        'Обучение матричной факторизации оценок (ALS) для персональных '
+        'рекомендаций'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--factors',
+            type=int,
+            default=DEFAULT_FACTORS,
+            help='Длина векторов авторов и произведений.'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=DEFAULT_ITERATIONS,
+            help='Количество чередований авторы/произведения.'
+        )
+        parser.add_argument(
+            '--regularization',
+            type=float,
+            default=DEFAULT_REGULARIZATION,
+            help='Коэффициент регуляризации на одну оценку.'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно начальных векторов произведений.'
+        )
+
+    def handle(self, *args, **options):
+        if options['factors'] < 1 or options['iterations'] < 1:
+            raise CommandError(
+                'Длина векторов и количество итераций должны быть '
+                'положительными.'
+            )
+        if options['regularization'] <= 0:
+            raise CommandError('Регуляризация должна быть положительной.')
+        factorization, (trained, saved) = train(
+            options['factors'], options['iterations'],
+            options['regularization'], options['seed']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов: {len(factorization.author_ids)}, '
+            f'произведений: {len(factorization.title_ids)}, '
+            f'RMSE на обучающих оценках: {factorization.get_rmse():.3f}; '
+            f'обучение {trained:.2f} с, запись {saved:.2f} с'
+        ))
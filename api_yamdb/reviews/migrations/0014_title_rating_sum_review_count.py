@@ -0,0 +1,39 @@
+# Generated by Django 3.2 on 2026-10-18 18:56
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_title_ratings(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    Title = apps.get_model('reviews', 'Title')
+    totals = (
+        Review.objects.order_by().values('title_id')
+        .annotate(rating_sum=Sum('score'), review_count=Count('pk'))
+    )
+    for row in totals.iterator():
+        Title.objects.filter(pk=row['title_id']).update(
+            rating_sum=row['rating_sum'],
+            review_count=row['review_count']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_alter_comment_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.RunPython(fill_title_ratings, migrations.RunPython.noop),
+    ]
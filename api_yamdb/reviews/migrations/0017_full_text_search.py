@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-18 19:40
+
+from django.db import migrations
+
+# Снимок таблиц на момент миграции: модель -> (таблица, поля).
+SEARCH_TABLES = {
+    'Title': ('reviews_title_fts', ('name', 'description')),
+    'Review': ('reviews_review_fts', ('text',)),
+    'Comment': ('reviews_comment_fts', ('text',)),
+}
+
+
+def normalize(text):
+    return (text or '').casefold().replace('ё', 'е')
+
+
+def create_search_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for model_name, (table, fields) in SEARCH_TABLES.items():
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} '
+                f'USING fts5({", ".join(fields)}, '
+                f"tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            model = apps.get_model('reviews', model_name)
+            rows = (
+                [row[0]] + [normalize(value) for value in row[1:]]
+                for row in model.objects.values_list('pk', *fields)
+                .iterator()
+            )
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, {", ".join(fields)}) '
+                f'VALUES ({", ".join(["%s"] * (len(fields) + 1))})',
+                list(rows)
+            )
+
+
+def drop_search_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for table, _ in SEARCH_TABLES.values():
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0016_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-18 20:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0018_query_plan_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=32, verbose_name='Таблица импорта')),
+                ('row_id', models.BigIntegerField(verbose_name='ID строки')),
+                ('digest', models.BigIntegerField(verbose_name='Хэш содержимого')),
+            ],
+            options={
+                'verbose_name': 'Отпечаток строки импорта',
+                'verbose_name_plural': 'Отпечатки строк импорта',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importfingerprint',
+            constraint=models.UniqueConstraint(fields=('table_name', 'row_id'), name='importfingerprint_table_row_unique'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2 on 2026-10-18 20:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0019_import_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardPrior',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mean', models.FloatField(verbose_name='Средняя оценка по всем отзывам')),
+                ('weight', models.FloatField(verbose_name='Вес среднего в отзывах')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата пересчета')),
+            ],
+            options={
+                'verbose_name': 'Априорное среднее рейтинга',
+                'verbose_name_plural': 'Априорные средние рейтинга',
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('all', 'Все произведения'), ('genre', 'Жанр'), ('category', 'Категория')], max_length=8, verbose_name='Рейтинг')),
+                ('scope_id', models.BigIntegerField(default=0, verbose_name='ID жанра или категории')),
+                ('score', models.FloatField(null=True, verbose_name='Байесовский рейтинг')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='reviews.title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Место в рейтинге лучших',
+                'verbose_name_plural': 'Места в рейтингах лучших',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['scope', 'scope_id', '-score', 'title'], name='leaderboard_scope_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('scope', 'scope_id', 'title'), name='leaderboardentry_scope_title_unique'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2 on 2026-10-18 20:36
+
+from django.db import migrations
+from django.db.models import Sum
+
+PRIOR_WEIGHT = 10.0
+
+
+def fill_leaderboards(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    GenreTitle = apps.get_model('reviews', 'GenreTitle')
+    LeaderboardPrior = apps.get_model('reviews', 'LeaderboardPrior')
+    LeaderboardEntry = apps.get_model('reviews', 'LeaderboardEntry')
+    totals = Title.objects.aggregate(
+        total=Sum('rating_sum'), count=Sum('review_count')
+    )
+    # Без отзывов среднего нет: места создаются без оценок, а среднее
+    # посчитает refresh_leaderboards.
+    mean = weight = 0.0
+    if totals['count']:
+        mean, weight = totals['total'] / totals['count'], PRIOR_WEIGHT
+        LeaderboardPrior.objects.update_or_create(
+            pk=1, defaults={'mean': mean, 'weight': weight}
+        )
+    genres = {}
+    for title_id, genre_id in GenreTitle.objects.values_list(
+        'title_id', 'genre_id'
+    ).iterator():
+        genres.setdefault(title_id, []).append(genre_id)
+    entries = []
+    for title_id, category_id, rating_sum, review_count in (
+        Title.objects.values_list(
+            'pk', 'category_id', 'rating_sum', 'review_count'
+        ).iterator()
+    ):
+        score = (
+            (weight * mean + rating_sum) / (weight + review_count)
+            if review_count else None
+        )
+        scopes = [('all', 0), ('category', category_id)] + [
+            ('genre', genre_id) for genre_id in genres.get(title_id, ())
+        ]
+        entries += [
+            LeaderboardEntry(
+                scope=scope, scope_id=scope_id, title_id=title_id,
+                score=score
+            )
+            for scope, scope_id in scopes
+        ]
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0020_leaderboards'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_leaderboards, migrations.RunPython.noop),
+    ]
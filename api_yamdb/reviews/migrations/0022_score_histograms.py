@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-18 20:34
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_score_histograms(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    ScoreHistogram = apps.get_model('reviews', 'ScoreHistogram')
+    histograms = {}
+    for row in (
+        Review.objects.order_by().values('title_id', 'score')
+        .annotate(count=Count('pk')).iterator()
+    ):
+        histogram = histograms.setdefault(
+            row['title_id'], ScoreHistogram(title_id=row['title_id'])
+        )
+        setattr(histogram, f'score_{row["score"]}', row['count'])
+    ScoreHistogram.objects.bulk_create(
+        histograms.values(), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0021_fill_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreHistogram',
+            fields=[
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_histogram', serialize=False, to='reviews.title', verbose_name='Произведение')),
+                ('score_1', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 1')),
+                ('score_2', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 2')),
+                ('score_3', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 3')),
+                ('score_4', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 4')),
+                ('score_5', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 5')),
+                ('score_6', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 6')),
+                ('score_7', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 7')),
+                ('score_8', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 8')),
+                ('score_9', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 9')),
+                ('score_10', models.PositiveIntegerField(default=0, verbose_name='Отзывов с оценкой 10')),
+            ],
+            options={
+                'verbose_name': 'Распределение оценок',
+                'verbose_name_plural': 'Распределения оценок',
+            },
+        ),
+        migrations.RunPython(
+            fill_score_histograms, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 3.2 on 2026-10-18 20:41
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+CHUNK_SIZE = 500
+
+
+def fill_daily_activity(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    Comment = apps.get_model('reviews', 'Comment')
+    TitleDailyActivity = apps.get_model('reviews', 'TitleDailyActivity')
+    GenreDailyActivity = apps.get_model('reviews', 'GenreDailyActivity')
+    title_ids = list(Title.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(title_ids), CHUNK_SIZE):
+        chunk = title_ids[start:start + CHUNK_SIZE]
+        rows = {}
+        for row in (
+            Review.objects.filter(title__in=chunk).order_by()
+            .annotate(day=TruncDate('pub_date')).values('title_id', 'day')
+            .annotate(count=Count('pk'), total=Sum('score'))
+        ):
+            rows[row['title_id'], row['day']] = TitleDailyActivity(
+                title_id=row['title_id'], date=row['day'],
+                review_count=row['count'], score_sum=row['total']
+            )
+        for row in (
+            Comment.objects.filter(review__title__in=chunk).order_by()
+            .annotate(day=TruncDate('pub_date'))
+            .values('review__title_id', 'day').annotate(count=Count('pk'))
+        ):
+            key = row['review__title_id'], row['day']
+            rows.setdefault(key, TitleDailyActivity(
+                title_id=key[0], date=key[1]
+            )).comment_count = row['count']
+        TitleDailyActivity.objects.bulk_create(
+            rows.values(), batch_size=1000
+        )
+    GenreDailyActivity.objects.bulk_create((
+        GenreDailyActivity(
+            genre_id=row['title__genre'], date=row['date'],
+            review_count=row['review_count'], score_sum=row['score_sum'],
+            comment_count=row['comment_count']
+        )
+        for row in TitleDailyActivity.objects.filter(
+            title__genre__isnull=False
+        ).order_by().values('title__genre', 'date').annotate(
+            review_count=Sum('review_count'), score_sum=Sum('score_sum'),
+            comment_count=Sum('comment_count')
+        ).iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0022_score_histograms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='Отзывов')),
+                ('score_sum', models.PositiveIntegerField(default=0, verbose_name='Сумма оценок')),
+                ('comment_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='reviews.title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Активность произведения за день',
+                'verbose_name_plural': 'Активность произведений по дням',
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='GenreDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('review_count', models.PositiveIntegerField(default=0, verbose_name='Отзывов')),
+                ('score_sum', models.PositiveIntegerField(default=0, verbose_name='Сумма оценок')),
+                ('comment_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='reviews.genre', verbose_name='Жанр')),
+            ],
+            options={
+                'verbose_name': 'Активность жанра за день',
+                'verbose_name_plural': 'Активность жанров по дням',
+                'abstract': False,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='titledailyactivity',
+            constraint=models.UniqueConstraint(fields=('title', 'date'), name='titledailyactivity_title_date_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='genredailyactivity',
+            constraint=models.UniqueConstraint(fields=('genre', 'date'), name='genredailyactivity_genre_date_unique'),
+        ),
+        migrations.RunPython(
+            fill_daily_activity, migrations.RunPython.noop
+        ),
+    ]
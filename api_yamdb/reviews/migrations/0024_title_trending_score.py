@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-18 20:51
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+HALF_LIFE_HOURS = 72
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def fill_trending_scores(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    rate = math.log(2) / (HALF_LIFE_HOURS * 3600)
+    scores = {}
+    for title_id, pub_date in Review.objects.order_by().values_list(
+        'title_id', 'pub_date'
+    ).iterator():
+        exponent = rate * (pub_date - EPOCH).total_seconds()
+        score = scores.get(title_id)
+        if score is None:
+            scores[title_id] = exponent
+        else:
+            high, low = max(score, exponent), min(score, exponent)
+            scores[title_id] = high + math.log1p(math.exp(low - high))
+    Title.objects.bulk_update(
+        [
+            Title(pk=title_id, trending_score=score)
+            for title_id, score in scores.items()
+        ],
+        ['trending_score'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0023_daily_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='trending_score',
+            field=models.FloatField(editable=False, help_text='Логарифм затухающей суммы отзывов, см. reviews.trending.', null=True, verbose_name='Популярность сейчас'),
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['-trending_score', 'id'], name='title_trending_idx'),
+        ),
+        migrations.RunPython(
+            fill_trending_scores, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2 on 2026-10-18 21:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0024_title_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleNeighbors',
+            fields=[
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='neighbors', serialize=False, to='reviews.title', verbose_name='Произведение')),
+                ('neighbors', models.BinaryField(verbose_name='Соседи')),
+            ],
+            options={
+                'verbose_name': 'Похожие произведения',
+                'verbose_name_plural': 'Похожие произведения',
+            },
+        ),
+    ]
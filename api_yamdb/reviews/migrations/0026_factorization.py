@@ -0,0 +1,40 @@
+# Generated by Django 3.2 on 2026-10-18 21:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reviews', '0025_title_neighbors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleFactors',
+            fields=[
+                ('factors', models.BinaryField(verbose_name='Вектор')),
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='factors', serialize=False, to='reviews.title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Вектор произведения',
+                'verbose_name_plural': 'Векторы произведений',
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='UserFactors',
+            fields=[
+                ('factors', models.BinaryField(verbose_name='Вектор')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='factors', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Вектор пользователя',
+                'verbose_name_plural': 'Векторы пользователей',
+                'abstract': False,
+            },
+        ),
+    ]
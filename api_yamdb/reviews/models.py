@@ -1,3 +1,5 @@
+import struct
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
@@ -24,6 +26,9 @@ class AbstractNameSlugModel(models.Model):
     class Meta:
         abstract = True
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], name='%(class)s_name_idx'),
+        ]
 
     def __str__(self):
         return self.name[TEXT_CUTOFF_LENGTH]
@@ -68,16 +73,70 @@ class Title(models.Model):
         on_delete=models.DO_NOTHING,
         verbose_name='Категория'
     )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Сумма оценок'
+    )
+    review_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество отзывов'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    trending_score = models.FloatField(
+        null=True,
+        editable=False,
+        verbose_name='Популярность сейчас',
+        help_text='Логарифм затухающей суммы отзывов, см. reviews.trending.'
+    )
 
     class Meta:
         verbose_name = 'Произведение'
         verbose_name_plural = 'Произведения'
         ordering = ['name']
         default_related_name = 'titles'
+        indexes = [
+            models.Index(fields=['name', 'id'], name='title_name_id_idx'),
+            models.Index(
+                fields=['category', 'name', 'id'],
+                name='title_category_name_idx'
+            ),
+            models.Index(
+                fields=['year', 'name', 'id'], name='title_year_name_idx'
+            ),
+            models.Index(
+                fields=['-trending_score', 'id'], name='title_trending_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name[TEXT_CUTOFF_LENGTH]
 
+    # Счетчики и популярность меняются атомарными UPDATE при записи
+    # отзывов; обычное сохранение загруженного ранее произведения их не
+    # перезаписывает.
+    DERIVED_FIELDS = ('rating_sum', 'review_count', 'trending_score')
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def rating(self):
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
 
 class GenreTitle(models.Model):
     genre = models.ForeignKey(
@@ -91,6 +150,13 @@ class GenreTitle(models.Model):
         verbose_name='Произведение'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['genre', 'title'], name='genretitle_genre_title_idx'
+            ),
+        ]
+
     def __str__(self):
         return f'Жанр: {self.genre}, произведение: {self.title}'
 
@@ -109,6 +175,10 @@ class DefaultReviewCommentModel(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         abstract = True
@@ -137,7 +207,15 @@ class Review(DefaultReviewCommentModel):
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
         default_related_name = 'reviews'
-
+        indexes = [
+            models.Index(
+                fields=['title', '-pub_date', '-id'],
+                name='review_title_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'], name='review_pub_date_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['author', 'title'],
@@ -145,6 +223,23 @@ class Review(DefaultReviewCommentModel):
             )
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_rating_state()
+        return instance
+
+    def remember_rating_state(self):
+        """Запоминает оценку, уже учтенную в рейтинге произведения."""
+        self._rating_state = (
+            self.__dict__.get('title_id'),
+            self.__dict__.get('score')
+        )
+
+    @property
+    def rating_state(self):
+        return getattr(self, '_rating_state', (None, None))
+
 
 class Comment(DefaultReviewCommentModel):
     review = models.ForeignKey(
@@ -157,3 +252,310 @@ class Comment(DefaultReviewCommentModel):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         default_related_name = 'comments'
+        indexes = [
+            models.Index(
+                fields=['review', '-pub_date', '-id'],
+                name='comment_review_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'], name='comment_pub_date_idx'
+            ),
+        ]
+
+
+class ImportFingerprint(models.Model):
+    """Хэш содержимого строки CSV, загруженной командой import_all."""
+
+    table_name = models.CharField(
+        max_length=32,
+        verbose_name='Таблица импорта'
+    )
+    row_id = models.BigIntegerField(verbose_name='ID строки')
+    digest = models.BigIntegerField(verbose_name='Хэш содержимого')
+
+    class Meta:
+        verbose_name = 'Отпечаток строки импорта'
+        verbose_name_plural = 'Отпечатки строк импорта'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['table_name', 'row_id'],
+                name='importfingerprint_table_row_unique'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.table_name}: {self.row_id}'
+
+
+class LeaderboardPrior(models.Model):
+    """Априорное среднее байесовского рейтинга; одна строка на всю БД."""
+
+    mean = models.FloatField(verbose_name='Средняя оценка по всем отзывам')
+    weight = models.FloatField(verbose_name='Вес среднего в отзывах')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата пересчета'
+    )
+
+    class Meta:
+        verbose_name = 'Априорное среднее рейтинга'
+        verbose_name_plural = 'Априорные средние рейтинга'
+
+    def __str__(self):
+        return f'{self.mean:.2f} (вес {self.weight:g})'
+
+
+class LeaderboardEntry(models.Model):
+    """Произведение в рейтинге лучших: общем, жанра или категории.
+
+    У произведения без отзывов ``score`` пустой, и в выдачу оно
+    не попадает.
+    """
+
+    ALL = 'all'
+    GENRE = 'genre'
+    CATEGORY = 'category'
+    SCOPE_CHOICES = (
+        (ALL, 'Все произведения'),
+        (GENRE, 'Жанр'),
+        (CATEGORY, 'Категория'),
+    )
+
+    scope = models.CharField(
+        max_length=8,
+        choices=SCOPE_CHOICES,
+        verbose_name='Рейтинг'
+    )
+    scope_id = models.BigIntegerField(
+        default=0,
+        verbose_name='ID жанра или категории'
+    )
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='leaderboard_entries',
+        verbose_name='Произведение'
+    )
+    score = models.FloatField(
+        null=True,
+        verbose_name='Байесовский рейтинг'
+    )
+
+    class Meta:
+        verbose_name = 'Место в рейтинге лучших'
+        verbose_name_plural = 'Места в рейтингах лучших'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'scope_id', 'title'],
+                name='leaderboardentry_scope_title_unique'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['scope', 'scope_id', '-score', 'title'],
+                name='leaderboard_scope_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.scope} {self.scope_id}: {self.title_id}'
+
+
+class ScoreHistogram(models.Model):
+    """Число отзывов произведения с каждой оценкой.
+
+    Поля ``score_1`` ... ``score_10`` добавляются ниже, по одному на
+    оценку от MIN_SCORE до MAX_SCORE.
+    """
+
+    title = models.OneToOneField(
+        Title,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score_histogram',
+        verbose_name='Произведение'
+    )
+
+    class Meta:
+        verbose_name = 'Распределение оценок'
+        verbose_name_plural = 'Распределения оценок'
+
+    def __str__(self):
+        return f'{self.title_id}: {self.counts}'
+
+    @staticmethod
+    def get_field_name(score):
+        return f'score_{score}'
+
+    @property
+    def counts(self):
+        """Оценка -> число отзывов с ней."""
+        return {
+            score: getattr(self, self.get_field_name(score))
+            for score in range(MIN_SCORE, MAX_SCORE + 1)
+        }
+
+
+for _score in range(MIN_SCORE, MAX_SCORE + 1):
+    ScoreHistogram.add_to_class(
+        ScoreHistogram.get_field_name(_score),
+        models.PositiveIntegerField(
+            default=0, verbose_name=f'Отзывов с оценкой {_score}'
+        )
+    )
+del _score
+
+
+class AbstractDailyActivity(models.Model):
+    """Отзывы и комментарии за день: сводка вместо сканирования отзывов.
+
+    День считается по ``pub_date`` в часовом поясе проекта.
+    """
+
+    date = models.DateField(verbose_name='День')
+    review_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Отзывов'
+    )
+    score_sum = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Сумма оценок'
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Комментариев'
+    )
+
+    class Meta:
+        abstract = True
+
+
+class TitleDailyActivity(AbstractDailyActivity):
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='daily_activity',
+        verbose_name='Произведение'
+    )
+
+    class Meta(AbstractDailyActivity.Meta):
+        verbose_name = 'Активность произведения за день'
+        verbose_name_plural = 'Активность произведений по дням'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['title', 'date'],
+                name='titledailyactivity_title_date_unique'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.title_id}: {self.date}'
+
+
+class GenreDailyActivity(AbstractDailyActivity):
+    """Сумма сводок произведений жанра за день."""
+
+    genre = models.ForeignKey(
+        Genre,
+        on_delete=models.CASCADE,
+        related_name='daily_activity',
+        verbose_name='Жанр'
+    )
+
+    class Meta(AbstractDailyActivity.Meta):
+        verbose_name = 'Активность жанра за день'
+        verbose_name_plural = 'Активность жанров по дням'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['genre', 'date'],
+                name='genredailyactivity_genre_date_unique'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.genre_id}: {self.date}'
+
+
+class TitleNeighbors(models.Model):
+    """Ближайшие по оценкам произведения, рассчитанные пакетно.
+
+    Соседи упакованы в одно двоичное поле парами (id, сходство) по
+    убыванию сходства: похожие произведения читаются одним запросом
+    по первичному ключу.
+    """
+
+    # id соседа (int64) и сходство (float32), little-endian.
+    ITEM = struct.Struct('<qf')
+
+    title = models.OneToOneField(
+        Title,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='neighbors',
+        verbose_name='Произведение'
+    )
+    neighbors = models.BinaryField(verbose_name='Соседи')
+
+    class Meta:
+        verbose_name = 'Похожие произведения'
+        verbose_name_plural = 'Похожие произведения'
+
+    def __str__(self):
+        return f'{self.title_id}: {len(self.items)}'
+
+    @classmethod
+    def pack(cls, items):
+        """Соседи для поля ``neighbors`` из пар (id, сходство)."""
+        return b''.join(cls.ITEM.pack(*item) for item in items)
+
+    @property
+    def items(self):
+        """Пары (id соседа, сходство) по убыванию сходства."""
+        return list(self.ITEM.iter_unpack(self.neighbors))
+
+
+class AbstractFactors(models.Model):
+    """Вектор матричной факторизации оценок, float32 little-endian."""
+
+    factors = models.BinaryField(verbose_name='Вектор')
+
+    class Meta:
+        abstract = True
+
+
+class UserFactors(AbstractFactors):
+    """Вектор автора: [p_u, b_u, 1]."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='factors',
+        verbose_name='Пользователь'
+    )
+
+    class Meta(AbstractFactors.Meta):
+        verbose_name = 'Вектор пользователя'
+        verbose_name_plural = 'Векторы пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TitleFactors(AbstractFactors):
+    """Вектор произведения: [q_i, 1, μ + b_i]."""
+
+    title = models.OneToOneField(
+        Title,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='factors',
+        verbose_name='Произведение'
+    )
+
+    class Meta(AbstractFactors.Meta):
+        verbose_name = 'Вектор произведения'
+        verbose_name_plural = 'Векторы произведений'
+
+    def __str__(self):
+        return str(self.title_id)
@@ -6,7 +6,7 @@ class OwnerOrModerOrAdminOrSuperuserOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return (
             request.method in permissions.SAFE_METHODS
-            or obj.author == request.user
+            or obj.author_id == request.user.id
             or request.user.is_moderator
             or request.user.is_admin
         )
@@ -20,3 +20,12 @@ class AdminOrSuperuserOrReadOnly(permissions.BasePermission):
             or (request.user.is_authenticated
                 and request.user.is_admin)
         )
+
+
+class ModerOrAdminOrSuperuser(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        return (
+            request.user.is_authenticated
+            and (request.user.is_moderator or request.user.is_admin)
+        )
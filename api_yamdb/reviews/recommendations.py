@@ -0,0 +1,284 @@
+"""Персональные рекомендации: матричная факторизация оценок (ALS).
+
+Оценка автора u произведению i приближается как
+
+    r̂ = μ + b_u + b_i + p_u·q_i,
+
+где μ — средняя оценка, b_u и b_i — смещения автора и произведения,
+p_u и q_i — векторы длины ``factors``. Обучение — чередующиеся
+наименьшие квадраты: при фиксированных векторах произведений вектор
+каждого автора (вместе со смещением) — решение своей небольшой
+гребневой регрессии, и наоборот. Системы всех авторов собираются
+векторно из разреженных массивов оценок и решаются пакетом
+``np.linalg.solve``; регуляризация пропорциональна числу оценок (ALS-WR).
+
+Векторы хранятся дополненными: у автора [p_u, b_u, 1], у произведения
+[q_i, 1, μ + b_i], так что прогноз — одно скалярное произведение.
+Матрица векторов всех произведений держится в памяти процесса и
+перечитывается по версии ресурса, которую увеличивает обучение;
+прогноз по всему каталогу — одно умножение матрицы на вектор.
+"""
+import threading
+import time
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+
+from api.cache import get_version, increment_version
+from api.constants import MAX_SCORE, MIN_SCORE
+from .models import Review, TitleFactors, UserFactors
+from .similarity import get_pointers
+
+VERSION_RESOURCE = 'recommendations'
+FACTOR_DTYPE = np.dtype('<f4')
+DEFAULT_FACTORS = 16
+DEFAULT_ITERATIONS = 10
+DEFAULT_REGULARIZATION = 0.1
+# Оценок на пакет систем: память под пакет — оценки × (factors + 1)².
+SOLVE_CHUNK = 20000
+CHUNK_SIZE = 10000
+
+
+def iter_row_groups(counts, entries=SOLVE_CHUNK):
+    """Строки с одинаковым числом оценок пакетами по ~``entries`` оценок.
+
+    Возвращает пары (число оценок, номера строк).
+    """
+    order = np.argsort(counts, kind='stable')
+    order = order[counts[order] > 0]
+    if not len(order):
+        # Оценок нет: np.split вернул бы одну пустую группу.
+        return
+    bounds = np.flatnonzero(np.diff(counts[order])) + 1
+    for group in np.split(order, bounds):
+        count = int(counts[group[0]])
+        step = max(1, entries // count)
+        for start in range(0, len(group), step):
+            yield count, group[start:start + step]
+
+
+def solve_rows(pointers, columns, targets, features, regularization):
+    """Гребневая регрессия для каждой строки разреженной матрицы.
+
+    Строка r — оценки ``targets[pointers[r]:pointers[r + 1]]`` по
+    признакам ``features[columns[...]]``. Строки с одинаковым числом
+    оценок складываются в трехмерный массив, и их системы собираются
+    пакетным умножением матриц. Строка без оценок получает нулевой
+    вектор.
+    """
+    size = features.shape[1]
+    solution = np.zeros((len(pointers) - 1, size))
+    counts = np.diff(pointers)
+    for count, rows in iter_row_groups(counts):
+        entries = pointers[rows, None] + np.arange(count)
+        rated = features[columns[entries]]
+        transposed = rated.transpose(0, 2, 1)
+        gram = transposed @ rated
+        gram += regularization * count * np.eye(size)
+        solution[rows] = np.linalg.solve(
+            gram, transposed @ targets[entries][:, :, None]
+        )[:, :, 0]
+    return solution
+
+
+class Factorization:
+    """Оценки в разреженном виде и обученные по ним векторы."""
+
+    def __init__(self, authors, titles, scores):
+        self.title_ids, items = np.unique(titles, return_inverse=True)
+        self.author_ids, users = np.unique(authors, return_inverse=True)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.users, self.items = users, items
+        self.mean = self.scores.mean() if len(self.scores) else 0.0
+        # Оценки по авторам и по произведениям.
+        self.by_user = np.argsort(users, kind='stable')
+        self.user_ptr = get_pointers(users, len(self.author_ids))
+        self.by_item = np.argsort(items, kind='stable')
+        self.item_ptr = get_pointers(items, len(self.title_ids))
+        self.user_vectors = self.title_vectors = None
+
+    @classmethod
+    def from_reviews(cls):
+        """Оценки всех отзывов без создания объектов на строку."""
+        rows = np.fromiter(
+            chain.from_iterable(
+                Review.objects.order_by().values_list(
+                    'author_id', 'title_id', 'score'
+                ).iterator(chunk_size=CHUNK_SIZE)
+            ),
+            dtype=np.int64
+        ).reshape(-1, 3)
+        return cls(rows[:, 0], rows[:, 1], rows[:, 2])
+
+    def fit(self, factors=DEFAULT_FACTORS, iterations=DEFAULT_ITERATIONS,
+            regularization=DEFAULT_REGULARIZATION, seed=0):
+        generator = np.random.default_rng(seed)
+        ones = (np.ones((len(self.author_ids), 1)),
+                np.ones((len(self.title_ids), 1)))
+        item_vectors = generator.normal(
+            0, 0.1, (len(self.title_ids), factors)
+        )
+        item_bias = np.zeros(len(self.title_ids))
+        residuals = self.scores - self.mean
+        for _ in range(iterations):
+            # Вектор автора со смещением: признаки произведения [q_i, 1].
+            solution = solve_rows(
+                self.user_ptr, self.items[self.by_user],
+                (residuals - item_bias[self.items])[self.by_user],
+                np.hstack([item_vectors, ones[1]]), regularization
+            )
+            user_vectors, user_bias = solution[:, :-1], solution[:, -1]
+            solution = solve_rows(
+                self.item_ptr, self.users[self.by_item],
+                (residuals - user_bias[self.users])[self.by_item],
+                np.hstack([user_vectors, ones[0]]), regularization
+            )
+            item_vectors, item_bias = solution[:, :-1], solution[:, -1]
+        self.user_vectors = np.hstack(
+            [user_vectors, user_bias[:, None], ones[0]]
+        )
+        self.title_vectors = np.hstack(
+            [item_vectors, ones[1], self.mean + item_bias[:, None]]
+        )
+        return self
+
+    def predict(self):
+        """Прогнозы для всех известных оценок, в их порядке."""
+        return np.einsum(
+            'ij,ij->i',
+            self.user_vectors[self.users], self.title_vectors[self.items]
+        )
+
+    def get_rmse(self):
+        if not len(self.scores):
+            return 0.0
+        return float(np.sqrt(np.mean((self.predict() - self.scores) ** 2)))
+
+
+def save_factors(factorization):
+    """Заменяет векторы авторов и произведений одной транзакцией."""
+    with transaction.atomic():
+        UserFactors.objects.all().delete()
+        TitleFactors.objects.all().delete()
+        UserFactors.objects.bulk_create(
+            (
+                UserFactors(user_id=int(pk), factors=vector.tobytes())
+                for pk, vector in zip(
+                    factorization.author_ids,
+                    factorization.user_vectors.astype(FACTOR_DTYPE)
+                )
+            ),
+            batch_size=1000
+        )
+        TitleFactors.objects.bulk_create(
+            (
+                TitleFactors(title_id=int(pk), factors=vector.tobytes())
+                for pk, vector in zip(
+                    factorization.title_ids,
+                    factorization.title_vectors.astype(FACTOR_DTYPE)
+                )
+            ),
+            batch_size=1000
+        )
+        transaction.on_commit(lambda: increment_version(VERSION_RESOURCE))
+
+
+def train(factors=DEFAULT_FACTORS, iterations=DEFAULT_ITERATIONS,
+          regularization=DEFAULT_REGULARIZATION, seed=0):
+    """Обучает факторизацию по всем отзывам и сохраняет векторы.
+
+    Возвращает обученную факторизацию и время обучения и записи
+    в секундах.
+    """
+    started = time.perf_counter()
+    factorization = Factorization.from_reviews().fit(
+        factors, iterations, regularization, seed
+    )
+    trained = time.perf_counter()
+    save_factors(factorization)
+    return factorization, (
+        trained - started, time.perf_counter() - trained
+    )
+
+
+def get_user_vector(user, size):
+    """Вектор пользователя длины ``size``.
+
+    Пользователь без вектора — например, еще без отзывов на момент
+    обучения — получает [0, ..., 0, 1] и прогноз μ + b_i.
+    """
+    factors = UserFactors.objects.filter(user=user).values_list(
+        'factors', flat=True
+    ).first()
+    if factors is not None:
+        vector = np.frombuffer(bytes(factors), dtype=FACTOR_DTYPE)
+        # Вектор другого обучения, если матрица еще не перечитана.
+        if len(vector) == size:
+            return vector
+    vector = np.zeros(size, dtype=FACTOR_DTYPE)
+    vector[-1] = 1
+    return vector
+
+
+class TitleFactorMatrix:
+    """Векторы всех произведений в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.title_ids = np.zeros(0, dtype=np.int64)
+        self.matrix = np.zeros((0, 0), dtype=FACTOR_DTYPE)
+
+    def load(self):
+        # Версия читается до загрузки, как в реестре справочников.
+        version = get_version(VERSION_RESOURCE)
+        with self.lock:
+            if version != self.version:
+                rows = list(TitleFactors.objects.order_by(
+                    'title_id'
+                ).values_list('title_id', 'factors'))
+                self.title_ids = np.array(
+                    [pk for pk, _ in rows], dtype=np.int64
+                )
+                self.matrix = np.frombuffer(
+                    b''.join(bytes(factors) for _, factors in rows),
+                    dtype=FACTOR_DTYPE
+                ).reshape(len(rows), -1) if rows else np.zeros(
+                    (0, 0), dtype=FACTOR_DTYPE
+                )
+                self.version = version
+            return self.title_ids, self.matrix
+
+    def recommend(self, user, limit):
+        """(id произведения, прогноз оценки) по убыванию прогноза.
+
+        Прогноз ограничен шкалой оценок; произведения, на которые
+        пользователь уже написал отзыв, пропускаются.
+        """
+        title_ids, matrix = self.load()
+        if not len(title_ids):
+            return []
+        scores = matrix @ get_user_vector(user, matrix.shape[1])
+        reviewed = np.fromiter(
+            Review.objects.filter(author=user).order_by().values_list(
+                'title_id', flat=True
+            ),
+            dtype=np.int64
+        )
+        positions = np.searchsorted(title_ids, reviewed)
+        known = positions < len(title_ids)
+        positions = positions[known]
+        scores[positions[title_ids[positions] == reviewed[known]]] = -np.inf
+        count = min(limit, len(scores))
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [
+            (int(title_ids[index]),
+             float(np.clip(scores[index], MIN_SCORE, MAX_SCORE)))
+            for index in best
+            if np.isfinite(scores[index])
+        ]
+
+
+title_factors = TitleFactorMatrix()
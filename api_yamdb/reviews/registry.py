@@ -0,0 +1,72 @@
+"""Справочники категорий и жанров в памяти процесса.
+
+Категорий и жанров немного, а нужны они почти в каждом запросе на
+запись произведения: реестр загружает таблицу целиком один раз и
+отдает объекты по слагу без обращения к БД. Актуальность проверяется
+по версии ресурса каталога, которую сигналы увеличивают после коммита
+каждого изменения категории или жанра.
+
+Версия видна другим процессам только через общий бэкенд кэша. Чтобы
+процесс с локальным кэшем не отставал навсегда, таблица перечитывается
+не реже раза в REFERENCE_REGISTRY_TIMEOUT секунд, а слаг, которого нет
+в реестре, проверяется по БД: если объект там есть, реестр
+перечитывается сразу.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from api.cache import get_version
+from .models import Category, Genre
+
+
+class ReferenceRegistry:
+
+    def __init__(self, model, resource):
+        self.model = model
+        self.resource = resource
+        self.lock = threading.Lock()
+        self.version = None
+        self.loaded_at = None
+        self.objects = []
+        self.by_slug = {}
+
+    def __deepcopy__(self, memo):
+        # Поля сериализаторов копируются вместе с аргументами,
+        # а реестр на процесс должен оставаться один.
+        return self
+
+    def is_stale(self, version):
+        timeout = getattr(settings, 'REFERENCE_REGISTRY_TIMEOUT', 60)
+        return (version != self.version
+                or time.monotonic() - self.loaded_at >= timeout)
+
+    def load(self, force=False):
+        # Версия читается до загрузки: если справочник изменится
+        # в процессе, следующая проверка увидит новую версию.
+        version = get_version(self.resource)
+        with self.lock:
+            if force or self.is_stale(version):
+                self.objects = list(self.model.objects.order_by('name'))
+                self.by_slug = {obj.slug: obj for obj in self.objects}
+                self.version = version
+                self.loaded_at = time.monotonic()
+            return self.objects, self.by_slug
+
+    def all(self):
+        """Все объекты в порядке сортировки по названию."""
+        return self.load()[0]
+
+    def get(self, slug):
+        obj = self.load()[1].get(slug)
+        if (obj is None and slug
+                and self.model.objects.filter(slug=slug).exists()):
+            # Объект добавлен в другом процессе, а его версия сюда
+            # не дошла.
+            obj = self.load(force=True)[1].get(slug)
+        return obj
+
+
+category_registry = ReferenceRegistry(Category, 'category')
+genre_registry = ReferenceRegistry(Genre, 'genre')
@@ -0,0 +1,102 @@
+"""Полнотекстовый поиск по произведениям, отзывам и комментариям.
+
+Для каждой модели в SQLite ведется теневая таблица FTS5 с rowid,
+равным id объекта. Текст в ней хранится нормализованным: в нижнем
+регистре и с заменой «ё» на «е», — так же нормализуется и запрос,
+поэтому «Ёлка», «ёлка» и «елка» находят одно и то же.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Comment, Review, Title
+
+# Модель -> (теневая таблица, индексируемые поля).
+SEARCH_INDEXES = {
+    Title: ('reviews_title_fts', ('name', 'description')),
+    Review: ('reviews_review_fts', ('text',)),
+    Comment: ('reviews_comment_fts', ('text',)),
+}
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def normalize(text):
+    return (text or '').casefold().replace('ё', 'е')
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def create_tables(using=connection):
+    with using.cursor() as cursor:
+        for table, fields in SEARCH_INDEXES.values():
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} '
+                f'USING fts5({", ".join(fields)}, '
+                f"tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+
+def index_objects(model, objects, replace=True, using=connection):
+    table, fields = SEARCH_INDEXES[model]
+    rows = [
+        [obj.pk] + [normalize(getattr(obj, field)) for field in fields]
+        for obj in objects
+    ]
+    if not rows:
+        return
+    with using.cursor() as cursor:
+        if replace:
+            cursor.executemany(
+                f'DELETE FROM {table} WHERE rowid = %s',
+                [row[:1] for row in rows]
+            )
+        cursor.executemany(
+            f'INSERT INTO {table} (rowid, {", ".join(fields)}) '
+            f'VALUES ({", ".join(["%s"] * (len(fields) + 1))})',
+            rows
+        )
+
+
+def unindex_object(model, pk, using=connection):
+    table, _ = SEARCH_INDEXES[model]
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+
+
+def clear_index(model, using=connection):
+    table, _ = SEARCH_INDEXES[model]
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+
+
+def build_match(query):
+    """Запрос FTS5: все слова запроса, каждое как префикс."""
+    words = WORD_PATTERN.findall(normalize(query))
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search(queryset, query):
+    """Оставляет в выборке совпадения с запросом, лучшие — первыми."""
+    model = queryset.model
+    table, fields = SEARCH_INDEXES[model]
+    match = build_match(query)
+    if not match:
+        return queryset.none()
+    if not is_supported():
+        condition = Q()
+        for word in WORD_PATTERN.findall(query):
+            condition &= Q(*[
+                Q(**{f'{field}__icontains': word}) for field in fields
+            ], _connector=Q.OR)
+        return queryset.filter(condition)
+    pk_column = f'{model._meta.db_table}.{model._meta.pk.column}'
+    return queryset.extra(
+        select={'search_rank': f'{table}.rank'},
+        tables=[table],
+        where=[f'{table}.rowid = {pk_column}', f'{table} MATCH %s'],
+        params=[match],
+    ).order_by('search_rank', 'pk')
@@ -1,11 +1,14 @@
 from datetime import datetime
 
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from django.http import Http404
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from api.constants import MAX_SCORE, MIN_SCORE
 from reviews.models import Category, Comment, Genre, Review, Title
+from reviews.registry import category_registry, genre_registry
 
 User = get_user_model()
 
@@ -31,21 +34,38 @@ class TitleSerializer(serializers.ModelSerializer):
     )
 
     class Meta:
-        fields = '__all__'
+        fields = ('id', 'name', 'year', 'rating',
+                  'description', 'genre', 'category')
         model = Title
 
 
+class RegistrySlugRelatedField(serializers.SlugRelatedField):
+    """Слаг категории или жанра, разрешаемый по реестру в памяти."""
+
+    def __init__(self, registry, **kwargs):
+        self.registry = registry
+        super().__init__(
+            queryset=registry.model.objects.all(), slug_field='slug', **kwargs
+        )
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        obj = self.registry.get(data)
+        if obj is None:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+        return obj
+
+
 class TitleCreateSerializer(serializers.ModelSerializer):
-    genre = serializers.SlugRelatedField(
-        queryset=Genre.objects.all(),
-        slug_field='slug',
+    genre = RegistrySlugRelatedField(
+        registry=genre_registry,
         many=True,
         allow_null=False,
         allow_empty=False,
     )
-    category = serializers.SlugRelatedField(
-        queryset=Category.objects.all(),
-        slug_field='slug',
+    category = RegistrySlugRelatedField(
+        registry=category_registry,
         allow_null=False,
         allow_empty=False,
     )
@@ -55,7 +75,7 @@ class TitleCreateSerializer(serializers.ModelSerializer):
         return TitleSerializer(instance).data
 
     class Meta:
-        fields = '__all__'
+        fields = ('id', 'name', 'year', 'description', 'genre', 'category')
         model = Title
 
     def validate_year(self, value):
@@ -66,22 +86,12 @@ class TitleCreateSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
-        if data['category'] not in Category.objects.all():
+        # Существование категории и жанров уже проверено при разборе
+        # слагов по реестру.
+        if self.context['request'].method != 'PATCH' and 'genre' not in data:
             raise serializers.ValidationError(
-                'Нельзя добавить произведение несуществующей категории!'
+                'Нельзя добавить произведение без жанра!'
             )
-        if self.context['request'].method != 'PATCH':
-            if 'genre' not in data:
-                raise serializers.ValidationError(
-                    'Нельзя добавить произведение без жанра!'
-                )
-
-            for genre in data['genre']:
-                if genre not in Genre.objects.all():
-                    raise serializers.ValidationError(
-                        'Нельзя добавить произведение несуществующего жанра!'
-                    )
-
         return data
 
 
@@ -104,23 +114,27 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
             )
         return value
 
-    def validate(self, data):
-        title_id = self.context.get('request'
-                                    ).parser_context.get('kwargs'
-                                                         ).get('title_id')
-
-        title = get_object_or_404(
-            Title,
-            id=title_id
-        )
-        if self.context['request'].method == 'POST' and Review.objects.filter(
-            title=title,
-            author=self.context['request'].user
-        ).exists():
-            raise serializers.ValidationError(
-                'Вы уже оставили отзыв к этому произведению!'
-            )
-        return data
+    def create(self, validated_data):
+        # Уникальность пары (автор, произведение) и существование
+        # произведения проверяет БД: в обычном случае создание отзыва —
+        # один INSERT, а причина ошибки выясняется только при отказе.
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            title_id = validated_data['title_id']
+            if Review.objects.filter(
+                title_id=title_id,
+                author=validated_data['author']
+            ).exists():
+                raise serializers.ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        'Вы уже оставили отзыв к этому произведению!'
+                    ]
+                })
+            if not Title.objects.filter(id=title_id).exists():
+                raise Http404
+            raise
 
 
 class CommentCreateSerializer(serializers.ModelSerializer):
@@ -132,3 +146,18 @@ class CommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('id', 'text', 'author', 'pub_date')
         model = Comment
+
+
+class ReviewSearchSerializer(ReviewCreateSerializer):
+    title = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta(ReviewCreateSerializer.Meta):
+        fields = ('id', 'title', 'text', 'author', 'score', 'pub_date')
+
+
+class CommentSearchSerializer(CommentCreateSerializer):
+    title = serializers.IntegerField(source='review.title_id', read_only=True)
+    review = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta(CommentCreateSerializer.Meta):
+        fields = ('id', 'title', 'review', 'text', 'author', 'pub_date')
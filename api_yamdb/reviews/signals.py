@@ -0,0 +1,294 @@
+import threading
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from api.cache import bump_version
+from . import activity, histograms, leaderboard, search, trending
+from .autocomplete import autocomplete
+from .models import (Category, Comment, Genre, GenreTitle, LeaderboardEntry,
+                     Review, Title)
+
+# Ответы каких ресурсов каталога зависят от модели: произведения
+# включают свои категорию, жанры и рейтинг.
+CATALOG_DEPENDENCIES = {
+    Category: ('category', 'title'),
+    Genre: ('genre', 'title'),
+    Title: ('title',),
+    GenreTitle: ('title',),
+    Review: ('title',),
+}
+
+# Записи, которые удаляются сейчас в этом потоке. Каскад не трогает
+# производные данные удаляемого родителя на каждую зависимую запись:
+# комментарии удаляемого отзыва вычитаются из сводок одним набором
+# запросов, а счетчики, гистограмма, сводки и рейтинги удаляемого
+# произведения уходят вместе с ним.
+deleting = threading.local()
+
+
+def get_deleting_titles():
+    if not hasattr(deleting, 'titles'):
+        deleting.titles = set()
+    return deleting.titles
+
+
+def get_deleting_reviews():
+    """Удаляемые отзывы: pk -> число их удаленных комментариев по дням."""
+    if not hasattr(deleting, 'reviews'):
+        deleting.reviews = {}
+    return deleting.reviews
+
+
+def change_title_rating(title_id, score_delta, count_delta, pub_date=None):
+    """Атомарно сдвигает сумму оценок и число отзывов произведения.
+
+    С ``pub_date`` добавленный или удаленный отзыв меняет и популярность
+    произведения — в том же UPDATE. Запрос собирается строкой: выражения
+    ORM на каждый отзыв заметно замедляют запись.
+    """
+    if title_id is None or not (score_delta or count_delta):
+        return
+    quote = connection.ops.quote_name
+    changes = [
+        f'{quote("rating_sum")} = {quote("rating_sum")} + %s',
+        f'{quote("review_count")} = {quote("review_count")} + %s',
+        f'{quote("updated_at")} = %s',
+    ]
+    params = [
+        score_delta, count_delta,
+        connection.ops.adapt_datetimefield_value(timezone.now())
+    ]
+    if count_delta and pub_date is not None:
+        sql, score_params = trending.get_score_change(pub_date, count_delta)
+        changes.append(f'{quote("trending_score")} = {sql}')
+        params += score_params
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {quote(Title._meta.db_table)} '
+            f'SET {", ".join(changes)} WHERE id = %s',
+            [*params, title_id]
+        )
+    leaderboard.update_title_score(title_id)
+
+
+def recount_ratings(titles):
+    """Пересчитывает рейтинги произведений по их отзывам одним UPDATE."""
+    reviews = Review.objects.filter(title=OuterRef('pk')).order_by()
+    titles.update(
+        rating_sum=Coalesce(Subquery(
+            reviews.values('title').annotate(total=Sum('score'))
+            .values('total')
+        ), 0),
+        review_count=Coalesce(Subquery(
+            reviews.values('title').annotate(total=Count('pk'))
+            .values('total')
+        ), 0),
+        updated_at=timezone.now()
+    )
+
+
+def recount_title_rating(title_id):
+    recount_ratings(Title.objects.filter(pk=title_id))
+    trending.recount_trending([title_id])
+    leaderboard.update_title_score(title_id)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance, created, **kwargs):
+    old_title_id, old_score = instance.rating_state
+    if created or old_score is not None:
+        histograms.move_score(
+            old_title_id, old_score, instance.title_id, instance.score
+        )
+        activity.move_review(
+            old_title_id, old_score, instance.title_id, instance.score,
+            instance.pub_date
+        )
+    if created:
+        change_title_rating(
+            instance.title_id, instance.score, 1, instance.pub_date
+        )
+    elif old_score is None:
+        recount_title_rating(instance.title_id)
+        histograms.recount_histograms([instance.title_id])
+        activity.recount_activity([instance.title_id])
+    elif old_title_id != instance.title_id:
+        change_title_rating(old_title_id, -old_score, -1, instance.pub_date)
+        change_title_rating(
+            instance.title_id, instance.score, 1, instance.pub_date
+        )
+    else:
+        change_title_rating(instance.title_id, instance.score - old_score, 0)
+    instance.remember_rating_state()
+
+
+@receiver(pre_delete, sender=Title)
+def start_title_delete(sender, instance, **kwargs):
+    # Collector шлет все pre_delete до первого удаления: к post_delete
+    # отзывов каскада произведение уже отмечено.
+    get_deleting_titles().add(instance.pk)
+
+
+@receiver(post_delete, sender=Title)
+def finish_title_delete(sender, instance, **kwargs):
+    get_deleting_titles().discard(instance.pk)
+
+
+@receiver(pre_delete, sender=Review)
+def start_review_delete(sender, instance, **kwargs):
+    get_deleting_reviews()[instance.pk] = Counter()
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance, **kwargs):
+    comments = get_deleting_reviews().pop(instance.pk, {})
+    if instance.title_id in get_deleting_titles():
+        return
+    for day, count in comments.items():
+        activity.change_activity(instance.title_id, day, comments=-count)
+    old_title_id, old_score = instance.rating_state
+    if old_score is None:
+        old_title_id, old_score = instance.title_id, instance.score
+    change_title_rating(old_title_id, -old_score, -1, instance.pub_date)
+    histograms.move_score(old_title_id, old_score, None, None)
+    activity.move_review(
+        old_title_id, old_score, None, None, instance.pub_date
+    )
+
+
+@receiver(post_save, sender=Comment)
+def update_activity_on_comment_save(sender, instance, created, **kwargs):
+    if created:
+        activity.change_activity(
+            instance.review.title_id, activity.get_day(instance.pub_date),
+            comments=1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def update_activity_on_comment_delete(sender, instance, **kwargs):
+    comments = get_deleting_reviews().get(instance.review_id)
+    if comments is not None:
+        # Комментарии каскада удаляются раньше отзыва; сводки сдвинет
+        # удаление отзыва, за все его комментарии сразу.
+        comments[activity.get_day(instance.pub_date)] += 1
+        return
+    activity.change_activity(
+        instance.review.title_id, activity.get_day(instance.pub_date),
+        comments=-1
+    )
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_catalog_cache(sender, **kwargs):
+    resources = CATALOG_DEPENDENCIES.get(sender)
+    if resources:
+        # После коммита: иначе другой процесс успел бы закэшировать
+        # под новой версией еще не закоммиченное состояние.
+        transaction.on_commit(lambda: bump_version(*resources))
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def invalidate_catalog_cache_on_genres(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(lambda: bump_version('title'))
+
+
+@receiver(post_save, sender=Title)
+def update_leaderboards(sender, instance, **kwargs):
+    # Категория могла измениться; жанры новой записи придут следом,
+    # через m2m_changed.
+    leaderboard.refresh_title(instance.pk)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def update_leaderboards_on_genres(sender, instance, action, reverse, pk_set,
+                                  **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    title_ids = (pk_set or ()) if reverse else (instance.pk,)
+    for title_id in title_ids:
+        leaderboard.refresh_title(title_id)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def update_activity_on_genres(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    # Удаленные связи приходят еще и как post_delete GenreTitle: сводки
+    # жанров уменьшает только тот обработчик, ниже.
+    if action != 'post_add':
+        return
+    if reverse:
+        for title_id in pk_set:
+            activity.add_title_to_genres(title_id, [instance.pk])
+    else:
+        activity.add_title_to_genres(instance.pk, pk_set)
+
+
+@receiver(post_save, sender=GenreTitle)
+def add_activity_to_genre(sender, instance, created, **kwargs):
+    if created:
+        activity.add_title_to_genres(instance.title_id, [instance.genre_id])
+
+
+@receiver(post_delete, sender=GenreTitle)
+def remove_activity_from_genre(sender, instance, **kwargs):
+    activity.remove_title_from_genre(instance.title_id, instance.genre_id)
+
+
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+def remove_leaderboard(sender, instance, **kwargs):
+    leaderboard.remove_scope(
+        LeaderboardEntry.GENRE if sender is Genre
+        else LeaderboardEntry.CATEGORY,
+        instance.pk
+    )
+
+
+@receiver(post_save)
+def update_search_index(sender, instance, created, **kwargs):
+    if sender in search.SEARCH_INDEXES and search.is_supported():
+        search.index_objects(sender, [instance], replace=not created)
+
+
+@receiver(post_delete)
+def remove_from_search_index(sender, instance, **kwargs):
+    if sender in search.SEARCH_INDEXES and search.is_supported():
+        search.unindex_object(sender, instance.pk)
+
+
+@receiver(post_save, sender=Title)
+def update_autocomplete_title(sender, instance, **kwargs):
+    autocomplete.refresh_title(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def update_autocomplete_rating(sender, instance, **kwargs):
+    if instance.title_id in get_deleting_titles():
+        return
+    autocomplete.refresh_rating(instance.title_id)
+
+
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    autocomplete.remove(sender, instance.pk)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+def update_autocomplete_name(sender, instance, **kwargs):
+    autocomplete.update_named(
+        sender, instance.pk, instance.name, instance.slug
+    )
@@ -0,0 +1,245 @@
+"""Похожие произведения: сходство по оценкам авторов (item-item).
+
+Сходство двух произведений — скорректированный косинус: из каждой
+оценки вычитается средняя оценка ее автора, и произведения сравниваются
+как векторы таких отклонений по авторам. Строгий и щедрый автор,
+одинаково выделившие пару произведений, делают их похожими одинаково.
+
+Матрица оценок хранится в разреженном виде двумя наборами массивов
+NumPy: по авторам (CSR) и по произведениям (CSC). Произведения
+делятся на непрерывные блоки; для блока все пары «оценка произведения
+блока × оценка того же автора» разворачиваются векторно и суммируются
+одним ``np.bincount`` в плотную матрицу блок × все произведения. Блок
+ограничен числом пар и размером плотной матрицы, поэтому память не
+зависит от размера каталога. Блоки независимы и считаются в пуле
+процессов. От блока остаются только COUNT лучших соседей каждого
+произведения.
+"""
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+import django
+import numpy as np
+from django.apps import apps
+from django.db import transaction
+
+from api.constants import SIMILAR_TITLES_COUNT, SIMILAR_TITLES_MIN_COMMON
+from .models import Review, TitleNeighbors
+
+# Формат TitleNeighbors.ITEM.
+NEIGHBOR_DTYPE = np.dtype([('id', '<i8'), ('similarity', '<f4')])
+# Пар оценок и ячеек плотной матрицы на блок: порядка сотни мегабайт
+# памяти на процесс.
+BLOCK_PAIRS = 4_000_000
+BLOCK_CELLS = 2_000_000
+CHUNK_SIZE = 10000
+# Меньшее скалярное произведение — ноль с погрешностью округления.
+MIN_DOT = 1e-9
+# Автор, оценивший не меньше 1/DENSE_RATIO произведений, — активный.
+DENSE_RATIO = 10
+
+
+def get_pointers(indexes, count):
+    """Границы строк: строка r занимает [pointers[r], pointers[r + 1])."""
+    pointers = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indexes, minlength=count), out=pointers[1:])
+    return pointers
+
+
+class RatingMatrix:
+    """Матрица оценок, центрированных по средней оценке автора."""
+
+    def __init__(self, authors, titles, scores, dense_ratio=DENSE_RATIO):
+        self.title_ids, items = np.unique(titles, return_inverse=True)
+        _, users = np.unique(authors, return_inverse=True)
+        self.reviews = len(scores)
+        scores = np.asarray(scores, dtype=np.float64)
+        degrees = np.bincount(users)
+        values = scores - (np.bincount(users, weights=scores) / degrees)[users]
+        self.norms = np.sqrt(
+            np.bincount(items, weights=values ** 2, minlength=self.size)
+        )
+        # Активный автор дает пар квадрат числа своих оценок: его строка
+        # хранится плотной и учитывается умножением матриц (BLAS).
+        heavy = degrees * dense_ratio >= self.size
+        dense_rows = np.cumsum(heavy) - 1
+        is_dense = heavy[users]
+        shape = (int(heavy.sum()), self.size)
+        self.dense_values = np.zeros(shape)
+        self.dense_rated = np.zeros(shape, dtype=np.float32)
+        cells = (dense_rows[users[is_dense]], items[is_dense])
+        self.dense_values[cells] = values[is_dense]
+        self.dense_rated[cells] = 1
+        users, items, values = (
+            array[~is_dense] for array in (users, items, values)
+        )
+        # По авторам: оценки автора подряд, row_ptr — границы авторов.
+        order = np.lexsort((items, users))
+        self.row_ptr = get_pointers(users, len(degrees))
+        self.row_items = items[order]
+        self.row_values = values[order]
+        # По произведениям: оценки произведения подряд.
+        order = np.argsort(items, kind='stable')
+        self.col_ptr = get_pointers(items, self.size)
+        self.col_users = users[order]
+        self.col_values = values[order]
+
+    @classmethod
+    def from_reviews(cls):
+        """Матрица всех отзывов без создания объектов на строку."""
+        rows = np.fromiter(
+            chain.from_iterable(
+                Review.objects.order_by().values_list(
+                    'author_id', 'title_id', 'score'
+                ).iterator(chunk_size=CHUNK_SIZE)
+            ),
+            dtype=np.int64
+        ).reshape(-1, 3)
+        return cls(rows[:, 0], rows[:, 1], rows[:, 2])
+
+    @property
+    def size(self):
+        return len(self.title_ids)
+
+    def get_blocks(self, pairs=BLOCK_PAIRS, cells=BLOCK_CELLS):
+        """Границы блоков (start, stop) по индексам произведений."""
+        if not self.size:
+            return
+        degrees = np.diff(self.row_ptr)
+        # Пар у произведения — сумма числа оценок его авторов.
+        work = np.zeros(self.size + 1)
+        np.cumsum(np.bincount(
+            np.repeat(np.arange(self.size), np.diff(self.col_ptr)),
+            weights=degrees[self.col_users], minlength=self.size
+        ), out=work[1:])
+        width = max(1, cells // self.size)
+        start = 0
+        while start < self.size:
+            stop = int(np.searchsorted(work, work[start] + pairs, 'right'))
+            stop = min(max(stop - 1, start + 1), start + width, self.size)
+            yield start, stop
+            start = stop
+
+    def get_similarities(self, start, stop):
+        """Сходство произведений блока [start, stop) со всеми."""
+        lower, upper = self.col_ptr[start], self.col_ptr[stop]
+        users = self.col_users[lower:upper]
+        counts = self.row_ptr[users + 1] - self.row_ptr[users]
+        # Индексы всех оценок авторов блока, строка автора за строкой.
+        offsets = self.row_ptr[users] - (np.cumsum(counts) - counts)
+        positions = np.repeat(offsets, counts) + np.arange(counts.sum())
+        rows = np.repeat(
+            np.arange(stop - start), np.diff(self.col_ptr[start:stop + 1])
+        )
+        cells = np.repeat(rows, counts) * self.size + self.row_items[positions]
+        size = (stop - start) * self.size
+        # Вклад активных авторов — произведения плотных матриц, остальных
+        # — суммы по парам их оценок.
+        dots = self.dense_values[:, start:stop].T @ self.dense_values
+        dots += np.bincount(
+            cells,
+            weights=np.repeat(self.col_values[lower:upper], counts)
+            * self.row_values[positions],
+            minlength=size
+        ).reshape(dots.shape)
+        common = self.dense_rated[:, start:stop].T @ self.dense_rated
+        common += np.bincount(cells, minlength=size).reshape(dots.shape)
+        valid = (dots > MIN_DOT) & (common >= SIMILAR_TITLES_MIN_COMMON)
+        valid[np.arange(stop - start), np.arange(start, stop)] = False
+        return np.divide(
+            dots, np.outer(self.norms[start:stop], self.norms),
+            out=np.zeros(dots.shape), where=valid
+        )
+
+    def get_neighbors(self, start, stop, count=SIMILAR_TITLES_COUNT):
+        """(id произведения, упакованные соседи) для произведений блока.
+
+        Произведения без соседей с положительным сходством пропускаются.
+        """
+        similarities = self.get_similarities(start, stop)
+        count = min(count, self.size)
+        best = np.argpartition(
+            -similarities, count - 1, axis=1
+        )[:, :count]
+        scores = np.take_along_axis(similarities, best, axis=1)
+        order = np.argsort(-scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        packed = np.empty(best.shape, dtype=NEIGHBOR_DTYPE)
+        packed['id'] = self.title_ids[best]
+        packed['similarity'] = np.take_along_axis(scores, order, axis=1)
+        found = (scores > 0).sum(axis=1)
+        return [
+            (int(self.title_ids[start + row]), packed[row, :found[row]]
+             .tobytes())
+            for row in np.flatnonzero(found)
+        ]
+
+
+# Матрица оценок процесса пула: передается один раз при его запуске.
+worker_matrix = []
+
+
+def init_worker(matrix):
+    if not apps.ready:
+        # Процесс запущен не через fork и не унаследовал настройку.
+        django.setup()
+    worker_matrix[:] = [matrix]
+
+
+def get_block_neighbors(start, stop, count):
+    return worker_matrix[0].get_neighbors(start, stop, count)
+
+
+def iter_neighbors(matrix, count=SIMILAR_TITLES_COUNT, workers=1,
+                   **block_size):
+    """Соседи произведений матрицы, блок за блоком."""
+    blocks = matrix.get_blocks(**block_size)
+    if workers == 1:
+        for start, stop in blocks:
+            yield from matrix.get_neighbors(start, stop, count)
+        return
+    with ProcessPoolExecutor(
+        workers, initializer=init_worker, initargs=(matrix,)
+    ) as executor:
+        pending = deque()
+        for start, stop in blocks:
+            pending.append(executor.submit(
+                get_block_neighbors, start, stop, count
+            ))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def save_neighbors(neighbors):
+    """Заменяет таблицу соседей одной короткой транзакцией."""
+    with transaction.atomic():
+        TitleNeighbors.objects.all().delete()
+        TitleNeighbors.objects.bulk_create(
+            (
+                TitleNeighbors(title_id=title_id, neighbors=packed)
+                for title_id, packed in neighbors
+            ),
+            batch_size=1000
+        )
+
+
+def rebuild(count=SIMILAR_TITLES_COUNT, workers=1):
+    """Пересчитывает соседей всех произведений по отзывам.
+
+    Возвращает число отзывов, число произведений с соседями и время
+    загрузки, расчета и записи в секундах.
+    """
+    started = time.perf_counter()
+    matrix = RatingMatrix.from_reviews()
+    loaded = time.perf_counter()
+    # Вся таблица собирается до записи: расчет идет без блокировки БД.
+    neighbors = list(iter_neighbors(matrix, count, workers))
+    computed = time.perf_counter()
+    save_neighbors(neighbors)
+    return matrix.reviews, len(neighbors), (
+        loaded - started, computed - loaded, time.perf_counter() - computed
+    )
@@ -0,0 +1,168 @@
+"""Популярные сейчас произведения: затухающая сумма отзывов.
+
+Отзыв вносит в популярность произведения exp(-λ·возраст), где
+λ = ln 2 / TRENDING_HALF_LIFE_HOURS: вклад отзыва вдвое меньше через
+каждый период полураспада. Хранится не сама сумма, а
+
+    trending_score = ln Σ exp(λ·(pub_date - EPOCH)),
+
+сумма, приведенная к одному моменту EPOCH. Текущая популярность
+равна exp(trending_score - λ·(now - EPOCH)): множитель у всех
+произведений общий, поэтому порядок по столбцу — порядок по
+популярности, и выдача читается по индексу без пересчета. Новый отзыв
+меняет столбец за O(1), ln(e^score + e^x), в том же UPDATE, что
+и рейтинг; логарифм не переполняется, сколько бы лет ни прошло.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import TextField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from api.constants import TRENDING_HALF_LIFE_HOURS
+from .models import Review, Title
+
+DECAY_RATE = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 3600)
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+# Удаление единственного учтенного отзыва оставляет «ноль»: разность
+# логарифмов меньше этого порога считается пустой суммой.
+EMPTY_SCORE_GAP = 1e-9
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def get_seconds(pub_date):
+    """Секунды от EPOCH до ``pub_date``."""
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date)
+    return (pub_date - EPOCH).total_seconds()
+
+
+def get_exponent(pub_date):
+    """Вклад отзыва в trending_score: λ·(pub_date - EPOCH)."""
+    return DECAY_RATE * get_seconds(pub_date)
+
+
+def log_sum_exp(exponents):
+    """ln Σ e^x без переполнения."""
+    high = max(exponents)
+    return high + math.log(math.fsum(math.exp(x - high) for x in exponents))
+
+
+def get_trending(score, now=None):
+    """Текущая популярность: затухающее число отзывов."""
+    if score is None:
+        return 0.0
+    now = now or timezone.now()
+    return math.exp(score - get_exponent(now))
+
+
+def get_score_change(pub_date, delta):
+    """SQL и параметры нового trending_score после добавления
+    (delta > 0) или удаления (delta < 0) отзыва с датой ``pub_date``.
+    """
+    score = connection.ops.quote_name('trending_score')
+    exponent = get_exponent(pub_date)
+    if delta > 0:
+        return (
+            f'CASE WHEN {score} IS NULL THEN %s '
+            f'WHEN {score} >= %s THEN {score} + LN(1 + EXP(%s - {score})) '
+            f'ELSE %s + LN(1 + EXP({score} - %s)) END'
+        ), [exponent] * 5
+    return (
+        f'CASE WHEN {score} IS NULL OR {score} < %s THEN NULL '
+        f'ELSE {score} + LN(1 - EXP(%s - {score})) END'
+    ), [exponent + EMPTY_SCORE_GAP, exponent]
+
+
+def iter_review_seconds(title_ids):
+    """(title_id, секунды от EPOCH до pub_date) отзывов произведений."""
+    reviews = Review.objects.filter(title__in=title_ids).order_by()
+    if connection.vendor != 'sqlite' or not settings.USE_TZ:
+        for title_id, pub_date in reviews.values_list(
+            'title_id', 'pub_date'
+        ).iterator():
+            yield title_id, get_seconds(pub_date)
+        return
+    # Как в выгрузке CSV: конвертер дат SQLite в Django дороже всего
+    # пересчета, а fromisoformat читает хранимый текст в разы быстрее.
+    # Даты в UTC вычитаются без часовых поясов.
+    naive_epoch = None
+    if connection.timezone_name == 'UTC':
+        naive_epoch = EPOCH.replace(tzinfo=None)
+    for title_id, pub_date in reviews.values_list(
+        'title_id', Cast('pub_date', output_field=TextField())
+    ).iterator():
+        pub_date = datetime.fromisoformat(pub_date)
+        if naive_epoch is not None:
+            yield title_id, (pub_date - naive_epoch).total_seconds()
+        else:
+            yield title_id, get_seconds(
+                timezone.make_aware(pub_date, connection.timezone)
+            )
+
+
+def get_scores(title_ids):
+    """trending_score произведений, пересчитанный по датам их отзывов."""
+    seconds = {}
+    for title_id, value in iter_review_seconds(title_ids):
+        seconds.setdefault(title_id, []).append(value)
+    return {
+        title_id: log_sum_exp([DECAY_RATE * value for value in values])
+        for title_id, values in seconds.items()
+    }
+
+
+def is_close(stored, score):
+    if stored is None or score is None:
+        return stored is score
+    return math.isclose(stored, score, rel_tol=1e-9, abs_tol=1e-6)
+
+
+def recount_trending(title_ids, save=True):
+    """Пересчитывает trending_score произведений по датам их отзывов.
+
+    Возвращает разошедшиеся с сохраненными значения как (id, было,
+    стало); с ``save=False`` только сравнивает.
+    """
+    scores = get_scores(title_ids)
+    drifted = []
+    for title in Title.objects.filter(pk__in=title_ids).order_by().only(
+        'trending_score'
+    ):
+        score = scores.get(title.pk)
+        if not is_close(title.trending_score, score):
+            drifted.append((title, title.trending_score, score))
+            title.trending_score = score
+    if drifted and save:
+        Title.objects.bulk_update(
+            [title for title, _, _ in drifted], ['trending_score']
+        )
+    return [(title.pk, stored, score) for title, stored, score in drifted]
+
+
+def iter_recount(chunk_size=DEFAULT_CHUNK_SIZE, save=True):
+    """Пересчет всех произведений кусками по ``chunk_size``.
+
+    На каждый кусок — число произведений и разошедшиеся значения.
+    """
+    last_pk = 0
+    while True:
+        title_ids = list(
+            Title.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not title_ids:
+            return
+        last_pk = title_ids[-1]
+        yield len(title_ids), recount_trending(title_ids, save)
+
+
+def recount_all(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Пересчитывает популярность всех произведений.
+
+    Возвращает число исправленных значений.
+    """
+    return sum(len(changed) for _, changed in iter_recount(chunk_size))
@@ -1,18 +1,52 @@
-from django.db.models import Avg
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, mixins, viewsets
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework import filters, generics, mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (AllowAny, IsAuthenticated,
+                                        IsAuthenticatedOrReadOnly)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from .filters import TitleFilter
-from .models import Category, Genre, Review, Title
+from api.cache import CachedListMixin, CachedRetrieveMixin
+from api.conditional import (ConditionalListMixin,
+                             ConditionalRetrieveMixin,
+                             make_etag)
+from api.constants import (AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT,
+                           LEADERBOARD_LIMIT, LEADERBOARD_MAX_LIMIT,
+                           RECOMMENDATIONS_LIMIT, RECOMMENDATIONS_MAX_LIMIT,
+                           SIMILAR_TITLES_COUNT, SIMILAR_TITLES_LIMIT,
+                           TRENDING_LIMIT, TRENDING_MAX_LIMIT)
+from api.pagination import PageNumberOrCursorPagination
+from user.permissions import IsAdminRole
+from .activity import BUCKETS, COUNTERS, get_timeseries
+from .autocomplete import autocomplete
+from .exporting import iter_title_lines
+from .histograms import SCORES, get_stats
+from .filters import (FullTextSearchFilter,
+                      TitleFilter,
+                      TITLE_FACETS,
+                      get_title_facets)
+from .models import (Category, Comment, Genre, GenreTitle, LeaderboardEntry,
+                     Review, ScoreHistogram, Title, TitleDailyActivity,
+                     TitleNeighbors)
 from .permissions import (OwnerOrModerOrAdminOrSuperuserOrReadOnly,
-                          AdminOrSuperuserOrReadOnly)
+                          AdminOrSuperuserOrReadOnly,
+                          ModerOrAdminOrSuperuser)
+from .recommendations import title_factors
+from .registry import category_registry, genre_registry
+from .trending import get_trending
 from .serializers import (CategorySerializer,
                           CommentCreateSerializer,
+                          CommentSearchSerializer,
                           GenreSerializer,
                           ReviewCreateSerializer,
+                          ReviewSearchSerializer,
                           TitleSerializer,
                           TitleCreateSerializer)
 
@@ -21,7 +55,7 @@ class CreateListDestroyViewSet(mixins.CreateModelMixin,
                                mixins.ListModelMixin,
                                mixins.DestroyModelMixin,
                                viewsets.GenericViewSet):
-    pagination_class = PageNumberPagination
+    pagination_class = PageNumberOrCursorPagination
     filter_backends = (filters.SearchFilter,)
     search_fields = ('name',)
     lookup_field = 'slug'
@@ -29,28 +63,74 @@ class CreateListDestroyViewSet(mixins.CreateModelMixin,
 
 
 class DefaulPaginationModelViewset(viewsets.ModelViewSet):
-    pagination_class = PageNumberPagination
+    pagination_class = PageNumberOrCursorPagination
 
 
-class CategoryViewSet(CreateListDestroyViewSet):
+class RegistryListMixin:
+    """list справочника из реестра в памяти, без запросов к БД.
+
+    Поиск по ``search`` повторяет SearchFilter по названию: каждое
+    слово запроса должно входить в название без учета регистра.
+    """
+
+    registry = None
+
+    def get_validators(self, request):
+        # ETag по содержимому реестра, а не по версии: реестр мог
+        # перечитаться по времени, когда версия в этом процессе
+        # не изменилась.
+        return make_etag(request, [
+            (obj.pk, obj.name, obj.slug) for obj in self.registry.all()
+        ])
+
+    def filter_queryset(self, queryset):
+        if self.action != 'list':
+            return super().filter_queryset(queryset)
+        terms = self.request.query_params.get(
+            api_settings.SEARCH_PARAM, ''
+        ).replace(',', ' ').casefold().split()
+        return [
+            obj for obj in self.registry.all()
+            if all(term in obj.name.casefold() for term in terms)
+        ]
+
+
+class CategoryViewSet(RegistryListMixin,
+                      ConditionalListMixin,
+                      CachedListMixin,
+                      CreateListDestroyViewSet):
+    cache_resource = 'category'
+    registry = category_registry
     queryset = Category.objects.all().order_by('name')
     serializer_class = CategorySerializer
 
 
-class GenreViewSet(CreateListDestroyViewSet):
+class GenreViewSet(RegistryListMixin,
+                   ConditionalListMixin,
+                   CachedListMixin,
+                   CreateListDestroyViewSet):
+    cache_resource = 'genre'
+    registry = genre_registry
     queryset = Genre.objects.all().order_by('name')
     serializer_class = GenreSerializer
 
 
-class TitleViewSet(DefaulPaginationModelViewset):
+class TitleViewSet(ConditionalListMixin,
+                   ConditionalRetrieveMixin,
+                   CachedListMixin,
+                   CachedRetrieveMixin,
+                   DefaulPaginationModelViewset):
+    cache_resource = 'title'
+    last_modified_field = 'updated_at'
     http_method_names = ['get', 'post', 'head', 'patch', 'delete']
-    queryset = Title.objects.all().annotate(
-        rating=Avg('reviews__score')
+    queryset = Title.objects.select_related('category').prefetch_related(
+        'genre'
     ).order_by('name')
+    cursor_ordering = ('name', 'id')
     serializer_class = TitleCreateSerializer
     permission_classes = (AdminOrSuperuserOrReadOnly,)
 
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, FullTextSearchFilter)
     filterset_class = TitleFilter
 
     def get_serializer_class(self):
@@ -58,51 +138,330 @@ class TitleViewSet(DefaulPaginationModelViewset):
             return TitleSerializer
         return TitleCreateSerializer
 
+    def get_facet_names(self):
+        names = [
+            name.strip() for name in
+            self.request.query_params.get('facets', '').split(',')
+            if name.strip()
+        ]
+        unknown = set(names) - set(TITLE_FACETS)
+        if unknown:
+            raise ValidationError({
+                'facets': f'Неизвестные фасеты: {", ".join(sorted(unknown))}.'
+                          f' Доступны: {", ".join(TITLE_FACETS)}.'
+            })
+        return list(dict.fromkeys(names))
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        names = self.get_facet_names()
+        if names:
+            response.data['facets'] = get_title_facets(
+                self.filter_queryset(self.get_queryset()), names
+            )
+        return response
+
+    @action(detail=False, permission_classes=(IsAdminRole,),
+            filter_backends=(), pagination_class=None)
+    def export(self, request):
+        """Весь каталог одним ответом: NDJSON, по строке на произведение.
+
+        Строки отдаются по мере чтения кусков из БД, и память сервера
+        не зависит от размера каталога.
+        """
+        return StreamingHttpResponse(
+            iter_title_lines(), content_type='application/x-ndjson'
+        )
+
+    @staticmethod
+    def get_limit(params, default, maximum):
+        try:
+            return max(1, min(int(params.get('limit', default)), maximum))
+        except ValueError:
+            return default
+
+    @action(detail=False, filter_backends=(), pagination_class=None)
+    def top(self, request):
+        """Лучшие произведения по байесовскому рейтингу.
+
+        Выборка читает начало индекса рейтинга: общего, жанра или
+        категории; при обоих фильтрах — рейтинга жанра, отфильтрованного
+        по категории.
+        """
+        params = request.query_params
+        limit = self.get_limit(
+            params, LEADERBOARD_LIMIT, LEADERBOARD_MAX_LIMIT
+        )
+        genre = genre_registry.get(params.get('genre', ''))
+        category = category_registry.get(params.get('category', ''))
+        if (params.get('genre') and genre is None
+                or params.get('category') and category is None):
+            return Response([])
+        if genre is not None:
+            entries = LeaderboardEntry.objects.filter(
+                scope=LeaderboardEntry.GENRE, scope_id=genre.pk
+            )
+            if category is not None:
+                entries = entries.filter(title__category=category)
+        elif category is not None:
+            entries = LeaderboardEntry.objects.filter(
+                scope=LeaderboardEntry.CATEGORY, scope_id=category.pk
+            )
+        else:
+            entries = LeaderboardEntry.objects.filter(
+                scope=LeaderboardEntry.ALL, scope_id=0
+            )
+        entries = entries.filter(score__isnull=False).select_related(
+            'title__category'
+        ).prefetch_related('title__genre').order_by('-score', 'title_id')
+        return Response([
+            {**TitleSerializer(entry.title).data,
+             'score': round(entry.score, 2)}
+            for entry in entries[:limit]
+        ])
+
+    @action(detail=False, filter_backends=(), pagination_class=None)
+    def trending(self, request):
+        """Популярные сейчас произведения, в том числе жанра.
+
+        Выборка читает начало индекса по trending_score; текущая
+        популярность — затухающее число отзывов.
+        """
+        params = request.query_params
+        limit = self.get_limit(params, TRENDING_LIMIT, TRENDING_MAX_LIMIT)
+        titles = Title.objects.filter(trending_score__isnull=False)
+        if params.get('genre'):
+            genre = genre_registry.get(params['genre'])
+            if genre is None:
+                return Response([])
+            # EXISTS, а не JOIN: план идет по индексу популярности
+            # и проверяет жанр каждого произведения, без сортировки.
+            titles = titles.filter(Exists(GenreTitle.objects.filter(
+                title=OuterRef('pk'), genre=genre
+            )))
+        now = timezone.now()
+        return Response([
+            {**TitleSerializer(title).data,
+             'trending': round(get_trending(title.trending_score, now), 3)}
+            for title in titles.select_related('category').prefetch_related(
+                'genre'
+            ).order_by('-trending_score', 'id')[:limit]
+        ])
+
+    @action(detail=True, filter_backends=(), pagination_class=None)
+    def stats(self, request, pk=None):
+        """Распределение оценок произведения и статистика по нему.
+
+        Один запрос к БД: произведение вместе со счетчиками оценок.
+        """
+        title = generics.get_object_or_404(
+            Title.objects.select_related('score_histogram'), pk=pk
+        )
+        try:
+            counts = title.score_histogram.counts
+        except ScoreHistogram.DoesNotExist:
+            counts = dict.fromkeys(SCORES, 0)
+        return Response({
+            **get_stats(counts),
+            'histogram': {
+                str(score): count for score, count in counts.items()
+            },
+        })
+
+    @action(detail=True, filter_backends=(), pagination_class=None)
+    def similar(self, request, pk=None):
+        """Похожие по оценкам авторов произведения.
+
+        Соседи рассчитываются заранее командой compute_similar_titles
+        и читаются вместе с произведением по первичному ключу.
+        """
+        title = generics.get_object_or_404(
+            Title.objects.select_related('neighbors'), pk=pk
+        )
+        limit = self.get_limit(
+            request.query_params, SIMILAR_TITLES_LIMIT, SIMILAR_TITLES_COUNT
+        )
+        try:
+            neighbors = title.neighbors.items[:limit]
+        except TitleNeighbors.DoesNotExist:
+            return Response([])
+        titles = Title.objects.select_related('category').prefetch_related(
+            'genre'
+        ).in_bulk([title_id for title_id, _ in neighbors])
+        # Соседи, удаленные после расчета, пропускаются.
+        return Response([
+            {**TitleSerializer(titles[title_id]).data,
+             'similarity': round(similarity, 3)}
+            for title_id, similarity in neighbors
+            if title_id in titles
+        ])
+
+    @staticmethod
+    def get_date_param(params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise ValidationError({name: 'Укажите дату в формате ГГГГ-ММ-ДД.'})
+        return day
+
+    @action(detail=True, filter_backends=(), pagination_class=None)
+    def timeseries(self, request, pk=None):
+        """Отзывы, оценки и комментарии произведения по дням, неделям
+        или месяцам.
 
-class ReviewViewSet(DefaulPaginationModelViewset):
+        Читаются дневные сводки произведения за период, а не отзывы.
+        """
+        params = request.query_params
+        bucket = params.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            raise ValidationError({
+                'bucket': f'Доступны: {", ".join(BUCKETS)}.'
+            })
+        first = self.get_date_param(params, 'from')
+        last = self.get_date_param(params, 'to')
+        title = generics.get_object_or_404(Title.objects.only('pk'), pk=pk)
+        days = TitleDailyActivity.objects.filter(title=title)
+        if first is not None:
+            days = days.filter(date__gte=first)
+        if last is not None:
+            days = days.filter(date__lte=last)
+        return Response(get_timeseries(
+            days.order_by('date').values_list('date', *COUNTERS), bucket
+        ))
+
+
+class ReviewViewSet(ConditionalListMixin,
+                    ConditionalRetrieveMixin,
+                    DefaulPaginationModelViewset):
+    last_modified_field = 'updated_at'
     http_method_names = ['get', 'post', 'head', 'patch', 'delete']
     serializer_class = ReviewCreateSerializer
+    cursor_ordering = ('-pub_date', '-id')
     permission_classes = (IsAuthenticatedOrReadOnly,
                           OwnerOrModerOrAdminOrSuperuserOrReadOnly)
 
     def get_title(self):
-        return get_object_or_404(
-            Title,
-            id=self.kwargs['title_id']
-        )
+        # Произведение загружается один раз за запрос, даже если
+        # get_queryset вызывается повторно.
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(
+                Title,
+                id=self.kwargs['title_id']
+            )
+        return self._title
 
     def get_queryset(self):
-        return self.get_title().reviews.all()
+        return self.get_title().reviews.select_related('author')
 
     def perform_create(self, serializer):
         serializer.save(
-            title=self.get_title(),
+            title_id=int(self.kwargs['title_id']),
             author=self.request.user
         )
 
 
-class CommentViewSet(DefaulPaginationModelViewset):
+class CommentViewSet(ConditionalListMixin,
+                     ConditionalRetrieveMixin,
+                     DefaulPaginationModelViewset):
+    last_modified_field = 'updated_at'
     http_method_names = ['get', 'post', 'head', 'patch', 'delete']
     serializer_class = CommentCreateSerializer
+    cursor_ordering = ('-pub_date', '-id')
     permission_classes = (IsAuthenticatedOrReadOnly,
                           OwnerOrModerOrAdminOrSuperuserOrReadOnly)
 
     def get_review(self):
-        title = get_object_or_404(
-            Title,
-            id=self.kwargs['title_id']
-        )
-        return get_object_or_404(
-            Review,
-            id=self.kwargs['review_id'],
-            title=title
-        )
+        # Отзыв и его произведение выбираются одним запросом с JOIN
+        # и запоминаются до конца запроса.
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review.objects.select_related('title'),
+                id=self.kwargs['review_id'],
+                title_id=self.kwargs['title_id']
+            )
+        return self._review
+
+    def get_title(self):
+        return self.get_review().title
 
     def get_queryset(self):
-        return self.get_review().comments.all()
+        return self.get_review().comments.select_related('author')
 
     def perform_create(self, serializer):
         serializer.save(
             review=self.get_review(),
             author=self.request.user
         )
+
+
+class ModerationSearchViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    pagination_class = PageNumberOrCursorPagination
+    permission_classes = (ModerOrAdminOrSuperuser,)
+    filter_backends = (FullTextSearchFilter,)
+    cursor_ordering = ('-pub_date', '-id')
+
+
+class ReviewSearchViewSet(ModerationSearchViewSet):
+    queryset = Review.objects.select_related('author').order_by(
+        '-pub_date', '-id'
+    )
+    serializer_class = ReviewSearchSerializer
+
+
+class CommentSearchViewSet(ModerationSearchViewSet):
+    queryset = Comment.objects.select_related(
+        'author', 'review'
+    ).order_by('-pub_date', '-id')
+    serializer_class = CommentSearchSerializer
+
+
+class Autocomplete(APIView):
+    """Подсказки по префиксу из индекса в памяти, без запросов к БД."""
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            limit = max(1, min(
+                int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT)),
+                AUTOCOMPLETE_MAX_LIMIT
+            ))
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        return Response(
+            autocomplete.suggest(request.query_params.get('q', ''), limit),
+            status=status.HTTP_200_OK
+        )
+
+
+class Recommendations(APIView):
+    """Произведения с наибольшей прогнозной оценкой пользователя.
+
+    Прогноз по всему каталогу — умножение матрицы векторов
+    произведений в памяти процесса на вектор пользователя.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        limit = TitleViewSet.get_limit(
+            request.query_params,
+            RECOMMENDATIONS_LIMIT, RECOMMENDATIONS_MAX_LIMIT
+        )
+        recommended = title_factors.recommend(request.user, limit)
+        titles = Title.objects.select_related('category').prefetch_related(
+            'genre'
+        ).in_bulk([title_id for title_id, _ in recommended])
+        # Произведения, удаленные после обучения, пропускаются.
+        return Response([
+            {**TitleSerializer(titles[title_id]).data,
+             'predicted_score': round(score, 2)}
+            for title_id, score in recommended
+            if title_id in titles
+        ])
@@ -1,11 +1,11 @@
 from django.contrib.auth import get_user_model
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api.pagination import PageNumberOrCursorPagination
 from user.permissions import IsAdminRole
 from user.serializers import (SignUpSerializer,
                               TokenSerializer,
@@ -20,7 +20,8 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     filter_backends = (filters.SearchFilter,)
     search_fields = ('username',)
-    pagination_class = PageNumberPagination
+    pagination_class = PageNumberOrCursorPagination
+    cursor_ordering = ('username',)
     lookup_field = 'username'
 
     def get_queryset(self):
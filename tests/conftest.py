@@ -1,6 +1,9 @@
 import os
 import sys
 
+import pytest
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.version import get_version
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -33,3 +36,20 @@ assert get_version() < '4.0.0', 'Пожалуйста, используйте в
 pytest_plugins = [
     'tests.fixtures.fixture_user',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(
+    django_db_modify_db_settings_parallel_suffix
+):
+    # Тестовая БД в файле, а не в памяти: иначе запросы из разных
+    # потоков не ждут блокировку записи, а сразу получают ошибку
+    # «database table is locked».
+    settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = (
+        os.path.join(MANAGE_PATH, 'test_db.sqlite3')
+    )
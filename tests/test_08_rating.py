@@ -0,0 +1,181 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.activity import recount_activity
+from reviews.models import GenreDailyActivity, ScoreHistogram, Title
+
+from tests.utils import (create_reviews, create_single_comment,
+                         create_single_review, create_titles)
+
+
+def get_genre_activity():
+    """Ненулевые строки сводок жанров."""
+    return [
+        row for row in GenreDailyActivity.objects.values_list(
+            'genre_id', 'date', 'review_count', 'score_sum', 'comment_count'
+        ).order_by('genre_id', 'date') if any(row[2:])
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08TitleRating:
+
+    TITLE_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
+    REVIEW_DETAIL_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/'
+    )
+
+    @staticmethod
+    def get_title(title_id):
+        return Title.objects.get(pk=title_id)
+
+    def test_01_rating_follows_review_writes(self, client, admin_client,
+                                             admin, user_client, user,
+                                             moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        title_id = titles[0]['id']
+
+        title = self.get_title(title_id)
+        assert (title.rating_sum, title.review_count) == (15, 3), (
+            'Проверьте, что при создании отзыва сумма оценок и количество '
+            'отзывов произведения увеличиваются.'
+        )
+
+        response = user_client.patch(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=title_id, review_id=reviews[1]['id']
+            ),
+            data={'score': 8}
+        )
+        assert response.status_code == HTTPStatus.OK
+        title = self.get_title(title_id)
+        assert (title.rating_sum, title.review_count) == (18, 3), (
+            'Проверьте, что при изменении оценки отзыва сумма оценок '
+            'произведения сдвигается на разницу оценок.'
+        )
+
+        response = moderator_client.delete(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=title_id, review_id=reviews[1]['id']
+            )
+        )
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        title = self.get_title(title_id)
+        assert (title.rating_sum, title.review_count) == (10, 2), (
+            'Проверьте, что при удалении отзыва его оценка исключается из '
+            'рейтинга произведения.'
+        )
+
+        moderator.delete()
+        title = self.get_title(title_id)
+        assert (title.rating_sum, title.review_count) == (5, 1), (
+            'Проверьте, что каскадное удаление отзывов пересчитывает '
+            'рейтинг произведения.'
+        )
+        response = client.get(
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=title_id)
+        )
+        assert response.json().get('rating') == 5
+
+    def test_02_recompute_ratings(self, admin_client, admin, user_client,
+                                  user):
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        Title.objects.update(rating_sum=0, review_count=0)
+
+        out = StringIO()
+        call_command('recompute_ratings', '--dry-run', stdout=out)
+        assert 'с расхождениями: 1' in out.getvalue()
+        assert self.get_title(titles[0]['id']).review_count == 0, (
+            'Проверьте, что `recompute_ratings --dry-run` не сохраняет '
+            'изменения.'
+        )
+
+        call_command('recompute_ratings', '--chunk-size', '1', stdout=out)
+        title = self.get_title(titles[0]['id'])
+        assert (title.rating_sum, title.review_count) == (10, 2), (
+            'Проверьте, что `recompute_ratings` восстанавливает сумму оценок '
+            'и количество отзывов.'
+        )
+
+    def test_03_title_save_keeps_counters(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        title = self.get_title(title_id)
+        create_single_review(user_client, title_id, 'Отзыв', 7)
+        title.name = 'Новое название'
+        title.save()
+        admin_client.patch(
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=title_id),
+            data={'year': 1990}
+        )
+        title = self.get_title(title_id)
+        assert (title.name, title.year) == ('Новое название', 1990)
+        assert (title.rating_sum, title.review_count) == (7, 1), (
+            'Проверьте, что сохранение загруженного ранее произведения '
+            'не перезаписывает счетчики отзывов.'
+        )
+
+    def test_04_title_delete_cascade(self, admin_client, admin, user_client,
+                                     user, moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        title_id = titles[0]['id']
+        create_single_comment(
+            admin_client, title_id, reviews[0]['id'], 'Комментарий'
+        )
+        create_single_review(user_client, titles[1]['id'], 'Отзыв', 3)
+
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.delete(
+                self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=title_id)
+            )
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        # Сводки жанров уменьшаются один раз, при удалении связей
+        # произведения с жанрами.
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE')
+            and GenreDailyActivity._meta.db_table not in query['sql']
+        ]
+        assert updates == [], (
+            'Проверьте, что каскадное удаление отзывов вместе с '
+            'произведением не обновляет по каждому отзыву рейтинг, '
+            'гистограмму, сводки и рейтинги удаляемого произведения.'
+        )
+        assert not ScoreHistogram.objects.filter(title_id=title_id).exists()
+        title = self.get_title(titles[1]['id'])
+        assert (title.rating_sum, title.review_count) == (3, 1)
+        activity = get_genre_activity()
+        recount_activity()
+        assert activity == get_genre_activity(), (
+            'Проверьте, что удаление произведения с отзывами оставляет '
+            'сводки жанров согласованными.'
+        )
+
+        review_id = Title.objects.get(pk=titles[1]['id']).reviews.get().pk
+        response = user_client.delete(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[1]['id'], review_id=review_id
+            )
+        )
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        title = self.get_title(titles[1]['id'])
+        assert (title.rating_sum, title.review_count) == (0, 0), (
+            'Проверьте, что после удаления произведения отзывы других '
+            'произведений удаляются с пересчетом рейтинга.'
+        )
@@ -0,0 +1,165 @@
+import base64
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09CursorPagination:
+
+    TITLES_URL = '/api/v1/titles/'
+    USERS_URL = '/api/v1/users/'
+
+    @staticmethod
+    def create_titles(count):
+        category = Category.objects.create(name='Фильм', slug='films')
+        Title.objects.bulk_create(
+            Title(name=f'Фильм {index % 7}', year=2000, category=category)
+            for index in range(count)
+        )
+        return list(
+            Title.objects.order_by('name', 'id').values_list('id', flat=True)
+        )
+
+    def walk(self, client, url):
+        pages = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что GET-запрос к `{url}` в режиме курсора '
+                'возвращает ответ со статусом 200.'
+            )
+            data = response.json()
+            assert 'count' not in data, (
+                'Проверьте, что в режиме курсора ответ не содержит `count`.'
+            )
+            pages.append(data)
+            url = data['next']
+        return pages
+
+    def test_01_titles_cursor_walk(self, client):
+        expected_ids = self.create_titles(25)
+
+        pages = self.walk(client, f'{self.TITLES_URL}?cursor=')
+        ids = [title['id'] for page in pages for title in page['results']]
+        assert ids == expected_ids, (
+            'Проверьте, что обход `/api/v1/titles/` по курсору возвращает '
+            'все произведения в порядке (name, id) без пропусков и повторов.'
+        )
+        assert pages[0]['previous'] is None
+
+        response = client.get(pages[-1]['previous'])
+        assert response.json()['results'] == pages[-2]['results'], (
+            'Проверьте, что ссылка `previous` в режиме курсора возвращает '
+            'предыдущую страницу.'
+        )
+
+    def test_02_invalid_cursor(self, client):
+        response = client.get(f'{self.TITLES_URL}?cursor=broken')
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_03_page_number_is_default(self, client):
+        self.create_titles(12)
+        data = client.get(self.TITLES_URL).json()
+        assert data['count'] == 12
+        assert len(data['results']) == 10
+
+    def test_04_users_cursor_walk(self, admin_client, django_user_model):
+        for index in range(14):
+            django_user_model.objects.create_user(
+                username=f'user{index:02}', email=f'user{index}@yamdb.fake'
+            )
+        pages = self.walk(admin_client, f'{self.USERS_URL}?cursor=')
+        usernames = [user['username']
+                     for page in pages for user in page['results']]
+        assert usernames == sorted(
+            django_user_model.objects.values_list('username', flat=True)
+        )
+
+    def assert_empty_page(self, client, url):
+        response = client.get(url)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что курсор, за которым не осталось строк, '
+            'возвращает пустую страницу, а не ошибку.'
+        )
+        data = response.json()
+        assert data['results'] == []
+        assert data['next'] is None and data['previous'] is None
+
+    def test_05_empty_cursor_page(self, admin_client):
+        ids = self.create_titles(15)
+        first = admin_client.get(f'{self.TITLES_URL}?cursor=').json()
+        second = admin_client.get(first['next']).json()
+        Title.objects.filter(id__in=ids[10:]).delete()
+        self.assert_empty_page(admin_client, first['next'])
+        Title.objects.filter(id__in=ids[:10]).delete()
+        self.assert_empty_page(admin_client, second['previous'])
+
+        cursor = base64.urlsafe_b64encode(b'{"p": [""], "r": 1}').decode()
+        self.assert_empty_page(
+            admin_client, f'{self.USERS_URL}?cursor={cursor}'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09CountModes:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    @override_settings(PAGINATION_COUNT_MODES={'title': 'none'})
+    def test_01_count_free_pages(self, client):
+        Test09CursorPagination.create_titles(15)
+
+        with CaptureQueriesContext(connection) as context:
+            data = client.get(self.TITLES_URL).json()
+        assert not any(
+            'COUNT(' in query['sql'] for query in context.captured_queries
+        ), 'Проверьте, что в режиме `none` не выполняется COUNT(*).'
+        assert 'count' not in data, (
+            'Проверьте, что в режиме `none` ответ не содержит `count`.'
+        )
+        assert len(data['results']) == 10
+        assert data['previous'] is None
+
+        data = client.get(data['next']).json()
+        assert len(data['results']) == 5
+        assert data['next'] is None
+        assert data['previous'] is not None
+
+        response = client.get(f'{self.TITLES_URL}?page=3')
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    @override_settings(PAGINATION_COUNT_MODES={'title': 'estimated'})
+    def test_02_estimated_count_is_cached(self, client):
+        Test09CursorPagination.create_titles(12)
+
+        assert client.get(self.TITLES_URL).json()['count'] == 12
+        Title.objects.filter(pk=Title.objects.first().pk).delete()
+        assert client.get(self.TITLES_URL).json()['count'] == 12, (
+            'Проверьте, что в режиме `estimated` значение `count` берется '
+            'из кэша, пока не истек PAGINATION_COUNT_TIMEOUT.'
+        )
+        assert client.get(
+            f'{self.TITLES_URL}?year=2000&page=2'
+        ).json()['count'] == 11, (
+            'Проверьте, что оценка `count` хранится отдельно для каждого '
+            'набора фильтров.'
+        )
+
+    @override_settings(PAGINATION_COUNT_MODES={'category': 'estimated'})
+    def test_03_estimated_count_of_registry(self, client):
+        Category.objects.bulk_create(
+            Category(name=f'Категория {index}', slug=f'category-{index}')
+            for index in range(12)
+        )
+        response = client.get('/api/v1/categories/')
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что режим `estimated` работает и для справочников, '
+            'которые отдаются из реестра в памяти.'
+        )
+        assert response.json()['count'] == 12
@@ -0,0 +1,82 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10CatalogCache:
+
+    CATEGORIES_URL = '/api/v1/categories/'
+    TITLES_URL = '/api/v1/titles/'
+    TITLE_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
+    STATS_URL = '/api/v1/cache/stats/'
+
+    def test_01_anonymous_reads_are_cached(self, client, admin_client,
+                                           django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        url = self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=titles[0]['id'])
+
+        first = client.get(url)
+        assert first['X-Cache'] == 'MISS'
+        with django_assert_num_queries(0):
+            second = client.get(url)
+        assert second['X-Cache'] == 'HIT', (
+            'Проверьте, что повторный анонимный GET-запрос к '
+            f'`{self.TITLE_DETAIL_URL_TEMPLATE}` отдается из кэша без '
+            'обращения к БД.'
+        )
+        assert second.json() == first.json()
+
+        response = admin_client.get(url)
+        assert not response.has_header('X-Cache'), (
+            'Проверьте, что ответы авторизованным пользователям не кэшируются.'
+        )
+
+    def test_02_writes_invalidate_cache(self, client, admin_client,
+                                        user_client):
+        titles, _, _ = create_titles(admin_client)
+        url = self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        assert client.get(url).json()['rating'] is None
+
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 8)
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS'
+        assert response.json()['rating'] == 8, (
+            'Проверьте, что после добавления отзыва кэш произведения '
+            'сбрасывается.'
+        )
+
+        client.get(self.TITLES_URL)
+        admin_client.patch(
+            url, data={'genre': ['drama'], 'category': 'films'}
+        )
+        data = client.get(self.TITLES_URL).json()
+        title = next(
+            item for item in data['results'] if item['id'] == titles[0]['id']
+        )
+        assert [genre['slug'] for genre in title['genre']] == ['drama'], (
+            'Проверьте, что изменение жанров произведения сбрасывает кэш '
+            f'`{self.TITLES_URL}`.'
+        )
+
+        client.get(self.CATEGORIES_URL)
+        admin_client.post(
+            self.CATEGORIES_URL, data={'name': 'Музыка', 'slug': 'music'}
+        )
+        data = client.get(self.CATEGORIES_URL).json()
+        assert 'music' in [item['slug'] for item in data['results']], (
+            'Проверьте, что добавление категории сбрасывает кэш '
+            f'`{self.CATEGORIES_URL}`.'
+        )
+
+    def test_03_stats(self, client, admin_client, user_client):
+        client.get(self.CATEGORIES_URL)
+        client.get(self.CATEGORIES_URL)
+
+        response = user_client.get(self.STATS_URL)
+        assert response.status_code == HTTPStatus.FORBIDDEN
+        response = admin_client.get(self.STATS_URL)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
@@ -0,0 +1,154 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+
+from reviews.models import Category
+from tests.utils import create_reviews, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11ConditionalGet:
+
+    TITLE_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+    REVIEW_DETAIL_URL_TEMPLATE = (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/'
+    )
+
+    def test_01_not_modified(self, client, admin_client, admin, user_client,
+                             user):
+        author_map = {admin: admin_client, user: user_client}
+        reviews, titles = create_reviews(admin_client, author_map)
+
+        for url in (
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=titles[0]['id']),
+            self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id']),
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=reviews[0]['id']
+            ),
+        ):
+            response = client.get(url)
+            assert response.status_code == HTTPStatus.OK
+            assert response.has_header('ETag'), (
+                f'Проверьте, что ответ на GET-запрос к `{url}` содержит ETag.'
+            )
+            assert 'public' in response['Cache-Control']
+            assert 'Authorization' in response['Vary']
+
+            etag = response['ETag']
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+                f'Проверьте, что GET-запрос к `{url}` с актуальным '
+                '`If-None-Match` возвращает ответ со статусом 304.'
+            )
+            assert response['ETag'] == etag
+            assert not response.has_header('Last-Modified'), (
+                f'Проверьте, что ответ на GET-запрос к `{url}` не содержит '
+                'Last-Modified: ответы проверяются по ETag.'
+            )
+
+        response = user_client.get(
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        )
+        assert 'private' in response['Cache-Control']
+
+    def test_02_etag_changes_after_write(self, client, admin_client, admin,
+                                         user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        reviews, titles = create_reviews(admin_client, author_map)
+        title_url = self.TITLE_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id']
+        )
+        reviews_url = self.REVIEWS_URL_TEMPLATE.format(
+            title_id=titles[0]['id']
+        )
+        title_etag = client.get(title_url)['ETag']
+        reviews_etag = client.get(reviews_url)['ETag']
+
+        user_client.patch(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=reviews[1]['id']
+            ),
+            data={'score': 9}
+        )
+        response = client.get(title_url, HTTP_IF_NONE_MATCH=title_etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что после изменения оценки ETag произведения '
+            'меняется.'
+        )
+        response = client.get(reviews_url, HTTP_IF_NONE_MATCH=reviews_etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что после изменения отзыва ETag списка отзывов '
+            'меняется.'
+        )
+
+    def test_03_list_after_delete(self, client, admin_client, admin,
+                                  user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        reviews, titles = create_reviews(admin_client, author_map)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        assert client.get(url).status_code == HTTPStatus.OK
+        date = http_date()
+
+        user_client.delete(self.REVIEW_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[1]['id']
+        ))
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=date)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что после удаления отзыва список с '
+            '`If-Modified-Since` возвращается заново, а не 304.'
+        )
+        assert len(response.json()['results']) == len(reviews) - 1
+
+    def test_04_invalid_pk(self, client, admin_client, admin, user_client,
+                           user):
+        author_map = {admin: admin_client, user: user_client}
+        reviews, titles = create_reviews(admin_client, author_map)
+        for url in (
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id='abc'),
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id='abc'
+            ),
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=reviews[0]['id']
+            ) + 'comments/abc/',
+        ):
+            assert client.get(url).status_code == HTTPStatus.NOT_FOUND, (
+                f'Проверьте, что GET-запрос к `{url}` с некорректным '
+                'идентификатором возвращает ответ со статусом 404.'
+            )
+
+    def test_05_single_count(self, client, admin_client, admin, user_client,
+                             user):
+        author_map = {admin: admin_client, user: user_client}
+        _, titles = create_reviews(admin_client, author_map)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        for api_client in (client, user_client):
+            with CaptureQueriesContext(connection) as context:
+                response = api_client.get(url)
+            assert response.json()['count'] == 2
+            assert sum(
+                'COUNT(' in query['sql'] for query in context.captured_queries
+            ) == 1, (
+                'Проверьте, что для ETag и `count` списка строки '
+                'считаются одним запросом.'
+            )
+
+    def test_06_title_after_category_rename(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        url = self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        assert client.get(url).status_code == HTTPStatus.OK
+        date = http_date()
+
+        category = Category.objects.get(slug=titles[0]['category'])
+        category.name = 'Новое название'
+        category.save()
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=date)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что после переименования категории произведение '
+            'с `If-Modified-Since` возвращается заново, а не 304.'
+        )
+        assert response.json()['category']['name'] == 'Новое название'
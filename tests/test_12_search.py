@@ -0,0 +1,92 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12FullTextSearch:
+
+    TITLES_URL = '/api/v1/titles/'
+    TITLE_DETAIL_URL_TEMPLATE = '/api/v1/titles/{title_id}/'
+    REVIEWS_SEARCH_URL = '/api/v1/moderation/reviews/'
+    COMMENTS_SEARCH_URL = '/api/v1/moderation/comments/'
+
+    def create_data(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.patch(
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=titles[1]['id']),
+            data={
+                'name': 'Ёжик в тумане',
+                'category': 'books',
+                'description': 'Ёжик ищет лошадку, Ёжик находит ежа.'
+            }
+        )
+        return titles
+
+    def search_titles(self, client, query):
+        response = client.get(self.TITLES_URL, {'search': query})
+        assert response.status_code == HTTPStatus.OK
+        return [title['id'] for title in response.json()['results']]
+
+    def test_01_title_search(self, client, admin_client):
+        titles = self.create_data(admin_client)
+
+        for query in ('ёжик', 'ЕЖИК', 'Ежик туман'):
+            assert self.search_titles(client, query) == [titles[1]['id']], (
+                'Проверьте, что поиск по `search` не зависит от регистра, '
+                'не различает «е» и «ё» и ищет по префиксу слова.'
+            )
+        assert self.search_titles(client, 'ежик кролик') == []
+        assert self.search_titles(client, 'терми') == [titles[0]['id']]
+
+        admin_client.delete(
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=titles[1]['id'])
+        )
+        assert self.search_titles(client, 'ёжик') == []
+
+    def test_02_moderator_search(self, admin_client, moderator_client,
+                                 user_client):
+        titles = self.create_data(admin_client)
+        create_single_review(
+            user_client, titles[0]['id'], 'Ёмкий и жёсткий фильм', 9
+        )
+        create_single_review(
+            moderator_client, titles[1]['id'], 'Мультфильм про ежа', 8
+        )
+
+        response = user_client.get(
+            self.REVIEWS_SEARCH_URL, {'search': 'жесткий'}
+        )
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            'Проверьте, что поиск по отзывам доступен только модераторам '
+            'и администраторам.'
+        )
+        response = moderator_client.get(
+            self.REVIEWS_SEARCH_URL, {'search': 'жесткий'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        results = response.json()['results']
+        assert [review['title'] for review in results] == [titles[0]['id']]
+
+        response = moderator_client.get(
+            self.COMMENTS_SEARCH_URL, {'search': 'жесткий'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['results'] == []
+
+    def test_03_rebuild_command(self, client, admin_client):
+        titles = self.create_data(admin_client)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM reviews_title_fts')
+        assert self.search_titles(client, 'ежик') == []
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        assert self.search_titles(client, 'ежик') == [titles[1]['id']], (
+            'Проверьте, что команда `rebuild_search_index` восстанавливает '
+            'полнотекстовый индекс.'
+        )
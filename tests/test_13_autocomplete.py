@@ -0,0 +1,106 @@
+import pytest
+from django.test import override_settings
+
+from api.cache import get_version, increment_version
+from reviews.models import Title
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13Autocomplete:
+
+    AUTOCOMPLETE_URL = '/api/v1/autocomplete/'
+
+    def test_01_suggestions(self, client, admin_client, user_client,
+                            django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.post(
+            '/api/v1/titles/',
+            data={
+                'name': 'Крепкий орешек 2',
+                'year': 1990,
+                'genre': ['drama'],
+                'category': 'films'
+            }
+        )
+        create_single_review(user_client, titles[1]['id'], 'Отлично', 9)
+
+        client.get(self.AUTOCOMPLETE_URL, {'q': 'к'})
+        with django_assert_num_queries(0):
+            response = client.get(self.AUTOCOMPLETE_URL, {'q': 'КРЕП'})
+        data = response.json()
+        assert [title['name'] for title in data['titles']] == [
+            'Крепкий орешек', 'Крепкий орешек 2'
+        ], (
+            'Проверьте, что подсказки произведений отсортированы по '
+            'рейтингу и отдаются без запросов к БД.'
+        )
+        assert data['titles'][0]['rating'] == 9
+
+        data = client.get(self.AUTOCOMPLETE_URL, {'q': 'орешек'}).json()
+        assert len(data['titles']) == 2, (
+            'Проверьте, что подсказки ищут по началу любого слова названия.'
+        )
+        data = client.get(self.AUTOCOMPLETE_URL, {'q': 'ко'}).json()
+        assert data['genres'] == [{'name': 'Комедия', 'slug': 'comedy'}]
+        data = client.get(self.AUTOCOMPLETE_URL, {'q': 'кни'}).json()
+        assert data['categories'] == [{'name': 'Книги', 'slug': 'books'}]
+
+    def test_02_incremental_updates(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        client.get(self.AUTOCOMPLETE_URL, {'q': 'т'})
+
+        admin_client.patch(
+            f'/api/v1/titles/{titles[0]["id"]}/',
+            data={'name': 'Ёжик в тумане', 'category': 'films'}
+        )
+        data = client.get(self.AUTOCOMPLETE_URL, {'q': 'ежик'}).json()
+        assert [title['id'] for title in data['titles']] == [titles[0]['id']]
+        data = client.get(self.AUTOCOMPLETE_URL, {'q': 'терм'}).json()
+        assert data['titles'] == []
+
+        admin_client.post(
+            '/api/v1/genres/', data={'name': 'Вестерн', 'slug': 'western'}
+        )
+        data = client.get(self.AUTOCOMPLETE_URL, {'q': 'вест'}).json()
+        assert data['genres'] == [{'name': 'Вестерн', 'slug': 'western'}]
+        admin_client.delete('/api/v1/genres/western/')
+        data = client.get(self.AUTOCOMPLETE_URL, {'q': 'вест'}).json()
+        assert data['genres'] == [], (
+            'Проверьте, что удаление жанра сразу убирает его из подсказок.'
+        )
+
+    def test_03_rating_updates(self, client, admin_client, user_client,
+                               django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        client.get(self.AUTOCOMPLETE_URL, {'q': 'т'})
+        version = get_version('autocomplete')
+
+        create_single_review(user_client, titles[0]['id'], 'Отлично', 8)
+        assert get_version('autocomplete') == version, (
+            'Проверьте, что отзыв не заставляет другие процессы '
+            'перестраивать индекс автодополнения целиком.'
+        )
+        with django_assert_num_queries(0):
+            data = client.get(self.AUTOCOMPLETE_URL, {'q': 'терм'}).json()
+        assert data['titles'][0]['rating'] == 8, (
+            'Проверьте, что процесс, записавший отзыв, сразу обновляет '
+            'рейтинг в подсказках.'
+        )
+
+        # Отзыв записан в другом процессе.
+        Title.objects.filter(pk=titles[0]['id']).update(
+            rating_sum=12, review_count=2
+        )
+        increment_version('autocomplete-rating')
+        data = client.get(self.AUTOCOMPLETE_URL, {'q': 'терм'}).json()
+        assert data['titles'][0]['rating'] == 8
+        with override_settings(AUTOCOMPLETE_RATING_TIMEOUT=0):
+            with django_assert_num_queries(1):
+                data = client.get(
+                    self.AUTOCOMPLETE_URL, {'q': 'терм'}
+                ).json()
+        assert data['titles'][0]['rating'] == 6, (
+            'Проверьте, что рейтинги, измененные другими процессами, '
+            'перечитываются одним запросом без перестройки индекса.'
+        )
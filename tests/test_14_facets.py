@@ -0,0 +1,95 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14Facets:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    def test_01_facet_counts(self, client, admin_client):
+        create_titles(admin_client)
+        admin_client.post(
+            self.TITLES_URL,
+            data={
+                'name': 'Чужой',
+                'year': 1984,
+                'genre': ['horror'],
+                'category': 'films'
+            }
+        )
+        response = client.get(
+            self.TITLES_URL, {'facets': 'genre,category,year'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        facets = response.json().get('facets')
+        assert facets == {
+            'genre': [
+                {'value': 'horror', 'count': 2},
+                {'value': 'comedy', 'count': 1},
+                {'value': 'drama', 'count': 1},
+            ],
+            'category': [
+                {'value': 'films', 'count': 2},
+                {'value': 'books', 'count': 1},
+            ],
+            'year': [
+                {'value': 1984, 'count': 2},
+                {'value': 1988, 'count': 1},
+            ],
+        }, (
+            'Проверьте, что GET-запрос к `/api/v1/titles/` с параметром '
+            '`facets` возвращает число произведений по каждому значению '
+            'фасетов.'
+        )
+
+        response = client.get(self.TITLES_URL)
+        assert 'facets' not in response.json(), (
+            'Проверьте, что без параметра `facets` фасеты не считаются.'
+        )
+
+    def test_02_facets_follow_filters(self, client, admin_client):
+        create_titles(admin_client)
+        response = client.get(
+            self.TITLES_URL, {'genre': 'comedy', 'facets': 'genre,year'}
+        )
+        data = response.json()
+        assert data['count'] == 1
+        assert data['facets'] == {
+            'genre': [
+                {'value': 'comedy', 'count': 1},
+                {'value': 'horror', 'count': 1},
+            ],
+            'year': [{'value': 1984, 'count': 1}],
+        }, (
+            'Проверьте, что фасеты считаются по отфильтрованной выборке '
+            'и включают все жанры найденных произведений.'
+        )
+
+    def test_03_single_query(self, admin_client):
+        create_titles(admin_client)
+        with CaptureQueriesContext(connection) as context:
+            admin_client.get(
+                self.TITLES_URL, {'facets': 'genre,category,year'}
+            )
+        grouped = [
+            query['sql'] for query in context.captured_queries
+            if 'GROUP BY' in query['sql']
+        ]
+        assert len(grouped) == 1 and 'UNION ALL' in grouped[0], (
+            'Проверьте, что все фасеты считаются одним сгруппированным '
+            'запросом.'
+        )
+
+    def test_04_unknown_facet(self, client, admin_client):
+        create_titles(admin_client)
+        response = client.get(self.TITLES_URL, {'facets': 'genre,author'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что запрос неизвестного фасета возвращает ответ '
+            'со статусом 400.'
+        )
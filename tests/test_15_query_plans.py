@@ -0,0 +1,38 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from api.management.commands.audit_query_plans import (get_fingerprint,
+                                                       get_problems)
+from reviews.models import Title
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15QueryPlans:
+
+    def test_01_audit_passes(self):
+        out = StringIO()
+        call_command('audit_query_plans', stdout=out)
+        output = out.getvalue()
+        assert 'title-list' in output and 'comment-detail' in output, (
+            'Проверьте, что аудит обходит все маршруты API.'
+        )
+        assert 'проблемных: 0' in output, (
+            'Проверьте, что запросы API не сканируют таблицы целиком '
+            'и не сортируют строки во временных B-деревьях.'
+        )
+        assert not Title.objects.exists(), (
+            'Проверьте, что тестовые данные аудита не остаются в БД.'
+        )
+
+    def test_02_problem_detection(self):
+        assert get_fingerprint(
+            "SELECT * FROM t WHERE a = 'x' AND b IN (1, 2, 3) LIMIT 10"
+        ) == 'SELECT * FROM t WHERE a = ? AND b IN (?) LIMIT ?'
+        assert get_problems([
+            'SCAN reviews_title',
+            'SCAN reviews_title USING INDEX title_name_id_idx',
+            'SEARCH reviews_genre USING INTEGER PRIMARY KEY (rowid=?)',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]) == ['SCAN reviews_title', 'USE TEMP B-TREE FOR ORDER BY']
@@ -0,0 +1,121 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.pagination import PageNumberOrCursorPagination
+from reviews.models import Category, Comment, Genre, Review, Title
+
+User = get_user_model()
+
+OBJECTS_COUNT = 100
+
+
+def bulk_create(model, objects):
+    # SQLite не возвращает id созданных bulk_create объектов.
+    model.objects.bulk_create(objects)
+    return list(model.objects.order_by('-id')[:len(objects)])[::-1]
+
+
+def create_objects():
+    categories = bulk_create(Category, [
+        Category(name=f'Категория {index}', slug=f'category-{index}')
+        for index in range(OBJECTS_COUNT)
+    ])
+    genres = bulk_create(Genre, [
+        Genre(name=f'Жанр {index}', slug=f'genre-{index}')
+        for index in range(OBJECTS_COUNT)
+    ])
+    titles = bulk_create(Title, [
+        Title(name=f'Произведение {index}', year=2000,
+              category=categories[index])
+        for index in range(OBJECTS_COUNT)
+    ])
+    Title.genre.through.objects.bulk_create(
+        Title.genre.through(title=title, genre=genre)
+        for title in titles for genre in genres[:2]
+    )
+    users = bulk_create(User, [
+        User(username=f'user-{index}', email=f'user-{index}@yamdb.fake')
+        for index in range(OBJECTS_COUNT)
+    ])
+    Review.objects.bulk_create(
+        Review(title=titles[0], author=user, text='Отзыв', score=5)
+        for user in users
+    )
+    review = Review.objects.filter(title=titles[0]).first()
+    Comment.objects.bulk_create(
+        Comment(review=review, author=user, text='Комментарий')
+        for user in users
+    )
+    return titles[0], review
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16QueryBudget:
+
+    # Эндпоинт -> допустимое число запросов независимо от размера страницы.
+    BUDGETS = {
+        '/api/v1/categories/': 1,
+        '/api/v1/genres/': 1,
+        '/api/v1/titles/': 6,
+        '/api/v1/titles/{title_id}/reviews/': 6,
+        '/api/v1/titles/{title_id}/reviews/{review_id}/comments/': 6,
+        '/api/v1/users/': 3,
+        '/api/v1/moderation/reviews/': 3,
+        '/api/v1/moderation/comments/': 3,
+    }
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == 200
+        return len(context.captured_queries)
+
+    @pytest.mark.parametrize('page_size', (10, 100))
+    def test_01_list_budget(self, admin_client, monkeypatch, page_size):
+        title, review = create_objects()
+        monkeypatch.setattr(
+            PageNumberOrCursorPagination, 'page_size', page_size
+        )
+        for template, budget in self.BUDGETS.items():
+            url = template.format(title_id=title.id, review_id=review.id)
+            response = admin_client.get(url)
+            assert len(response.json()['results']) == page_size
+            queries = self.count_queries(admin_client, url)
+            assert queries <= budget, (
+                f'Проверьте, что GET-запрос к `{url}` со страницей из '
+                f'{page_size} объектов выполняет не больше {budget} '
+                f'запросов к БД, а не {queries}.'
+            )
+
+    def test_02_nested_parent_loaded_once(self, admin_client, user_client):
+        title, review = create_objects()
+        reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+        comments_url = f'{reviews_url}{review.id}/comments/'
+        comment = review.comments.first()
+        for method, url, data, budget in (
+            ('get', f'{reviews_url}{review.id}/', None, 4),
+            ('patch', f'{reviews_url}{review.id}/', {'text': 'Новый'}, 6),
+            ('get', f'{comments_url}{comment.id}/', None, 4),
+            # Комментарий сдвигает дневные сводки произведения и жанров.
+            ('post', comments_url, {'text': 'Комментарий'}, 6),
+        ):
+            client = user_client if method == 'post' else admin_client
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(client, method)(url, data=data)
+            assert response.status_code in (200, 201)
+            queries = [
+                query['sql'] for query in context.captured_queries
+                if 'FROM "reviews_title"' in query['sql']
+                or 'FROM "reviews_review" INNER JOIN "reviews_title"'
+                in query['sql']
+            ]
+            assert len(queries) <= 1, (
+                f'Проверьте, что {method.upper()}-запрос к `{url}` '
+                'загружает родительские объекты одним запросом.'
+            )
+            assert len(context.captured_queries) <= budget, (
+                f'Проверьте, что {method.upper()}-запрос к `{url}` '
+                f'выполняет не больше {budget} запросов к БД.'
+            )
@@ -0,0 +1,100 @@
+import threading
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.models import Category, Review, Title
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17ReviewWrites:
+
+    REVIEWS_URL_TEMPLATE = '/api/v1/titles/{title_id}/reviews/'
+
+    def test_01_single_insert(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        data = {'text': 'Отлично', 'score': 9}
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(url, data=data)
+        assert response.status_code == HTTPStatus.CREATED
+        reads = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'reviews_review' in query['sql']
+        ]
+        assert not reads, (
+            'Проверьте, что при создании отзыва не выполняется отдельная '
+            'проверка существования отзыва автора.'
+        )
+
+        response = user_client.post(url, data=data)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {
+            'non_field_errors': ['Вы уже оставили отзыв к этому произведению!']
+        }, (
+            'Проверьте, что повторный отзыв автора на произведение '
+            'возвращает прежнее сообщение об ошибке.'
+        )
+
+    def test_02_parallel_posts(self, admin_client, user, token_user):
+        titles, _, _ = create_titles(admin_client)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        workers = 8
+        barrier = threading.Barrier(workers)
+        statuses = []
+
+        def post():
+            client = APIClient()
+            client.credentials(
+                HTTP_AUTHORIZATION=f'Bearer {token_user["access"]}'
+            )
+            try:
+                barrier.wait()
+                response = client.post(url, data={'text': 'Гонка', 'score': 7})
+                statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=post) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(statuses) == (
+            [HTTPStatus.CREATED] + [HTTPStatus.BAD_REQUEST] * (workers - 1)
+        ), (
+            'Проверьте, что из одновременных POST-запросов одного автора '
+            'к одному произведению успешен ровно один, а остальные '
+            'возвращают ответ со статусом 400.'
+        )
+        assert Review.objects.filter(
+            author=user, title_id=titles[0]['id']
+        ).count() == 1
+
+    def test_03_benchmark_keeps_existing_users(self):
+        User = get_user_model()
+        User.objects.create(
+            username='benchmark-0', email='benchmark-0@example.com'
+        )
+        out = StringIO()
+        call_command('benchmark_reviews', '--count', '3', stdout=out)
+        assert 'Создано отзывов: 3' in out.getvalue()
+        assert list(
+            User.objects.values_list('username', flat=True)
+        ) == ['benchmark-0'], (
+            'Проверьте, что `benchmark_reviews` удаляет только созданных им '
+            'пользователей и не трогает существующих.'
+        )
+        assert not (
+            Title.objects.exists() or Category.objects.exists()
+            or Review.objects.exists()
+        ), 'Проверьте, что `benchmark_reviews` удаляет временные данные.'
@@ -0,0 +1,130 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre
+from tests.utils import create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test18Registry:
+
+    CATEGORIES_URL = '/api/v1/categories/'
+    GENRES_URL = '/api/v1/genres/'
+    TITLES_URL = '/api/v1/titles/'
+
+    def test_01_lists_from_memory(self, client, admin_client,
+                                  django_assert_num_queries):
+        create_titles(admin_client)
+        client.get(self.CATEGORIES_URL)
+        client.get(self.GENRES_URL)
+        with django_assert_num_queries(0):
+            response = client.get(self.GENRES_URL, {'search': 'ДРАМ'})
+        assert [genre['slug'] for genre in response.json()['results']] == [
+            'drama'
+        ], (
+            'Проверьте, что список жанров с поиском отдается из памяти.'
+        )
+        with django_assert_num_queries(0):
+            response = client.get(self.CATEGORIES_URL)
+        assert [
+            category['slug'] for category in response.json()['results']
+        ] == ['books', 'films']
+
+    def test_02_invalidation(self, client, admin_client):
+        create_titles(admin_client)
+        client.get(self.CATEGORIES_URL)
+        admin_client.post(
+            self.CATEGORIES_URL, data={'name': 'Музыка', 'slug': 'music'}
+        )
+        slugs = [
+            category['slug']
+            for category in client.get(self.CATEGORIES_URL).json()['results']
+        ]
+        assert 'music' in slugs, (
+            'Проверьте, что новая категория сразу видна в списке.'
+        )
+        response = admin_client.post(
+            self.TITLES_URL,
+            data={'name': 'Пластинка', 'year': 1990,
+                  'genre': ['drama'], 'category': 'music'}
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что произведение можно создать в только что '
+            'добавленной категории.'
+        )
+
+        admin_client.post(
+            self.GENRES_URL, data={'name': 'Джаз', 'slug': 'jazz'}
+        )
+        admin_client.delete(f'{self.GENRES_URL}jazz/')
+        response = admin_client.post(
+            self.TITLES_URL,
+            data={'name': 'Пластинка 2', 'year': 1990,
+                  'genre': ['jazz'], 'category': 'music'}
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что удаленный жанр нельзя указать у произведения.'
+        )
+
+    def test_03_title_write_resolves_slugs_in_memory(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.post(
+                self.TITLES_URL,
+                data={'name': 'Чужой', 'year': 1979,
+                      'genre': ['horror', 'drama'], 'category': 'films'}
+            )
+        assert response.status_code == HTTPStatus.CREATED
+        lookups = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and ('FROM "reviews_category"' in query['sql']
+                 or 'FROM "reviews_genre" WHERE' in query['sql'])
+        ]
+        assert not lookups, (
+            'Проверьте, что слаги категории и жанров произведения '
+            'разрешаются по реестру без запросов к БД.'
+        )
+
+        response = admin_client.patch(
+            f'{self.TITLES_URL}{titles[0]["id"]}/', data={'name': 'Т2'}
+        )
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что PATCH-запрос к произведению без поля '
+            '`category` не приводит к ошибке.'
+        )
+        assert response.json()['category']['slug'] == 'films'
+
+    def test_04_changes_from_other_process(self, admin_client):
+        create_titles(admin_client)
+        etag = admin_client.get(self.GENRES_URL)['ETag']
+        # Записи другого процесса: сигналы здесь не срабатывают,
+        # и версия в локальном кэше не меняется.
+        Category.objects.bulk_create([Category(name='Музыка', slug='music')])
+        Genre.objects.bulk_create([Genre(name='Джаз', slug='jazz')])
+
+        response = admin_client.post(
+            self.TITLES_URL,
+            data={'name': 'Пластинка', 'year': 1990,
+                  'genre': ['jazz'], 'category': 'music'}
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Проверьте, что слаг, которого нет в реестре, проверяется '
+            'по БД, и реестр перечитывается.'
+        )
+        with override_settings(REFERENCE_REGISTRY_TIMEOUT=0):
+            Genre.objects.bulk_create([Genre(name='Блюз', slug='blues')])
+            response = admin_client.get(
+                self.GENRES_URL, HTTP_IF_NONE_MATCH=etag
+            )
+        assert response.status_code == HTTPStatus.OK
+        assert 'blues' in [
+            genre['slug'] for genre in response.json()['results']
+        ], (
+            'Проверьте, что реестр перечитывается по истечении '
+            'REFERENCE_REGISTRY_TIMEOUT, даже если версия не изменилась.'
+        )
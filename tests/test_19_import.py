@@ -0,0 +1,488 @@
+import csv
+import gzip
+import json
+from io import BytesIO, StringIO
+from pathlib import Path
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.importing import (TABLES, Importer, get_checkpoint_filename,
+                               iter_ranges)
+
+HEADERS = {
+    'users': ['id', 'username', 'email', 'role', 'bio', 'first_name',
+              'last_name'],
+    'category': ['id', 'name', 'slug'],
+    'genre': ['id', 'name', 'slug'],
+    'titles': ['id', 'name', 'year', 'category'],
+    'genre_title': ['id', 'title_id', 'genre_id'],
+    'review': ['id', 'title_id', 'text', 'author', 'score', 'pub_date'],
+    'comments': ['id', 'review_id', 'text', 'author', 'pub_date'],
+}
+
+
+def get_rows():
+    return {
+        'users': [
+            [1, 'reader', 'reader@yamdb.fake', 'user', '', '', ''],
+            [2, 'critic', 'critic@yamdb.fake', 'moderator', 'Био', '', ''],
+        ],
+        'category': [[1, 'Фильм', 'movie'], [2, 'Книга', 'book']],
+        'genre': [[1, 'Драма', 'drama'], [2, 'Комедия', 'comedy']],
+        'titles': [[1, 'Побег', 1994, 1], [2, 'Идиот', 1869, 2]],
+        'genre_title': [[1, 1, 1], [2, 2, 1], [3, 2, 2]],
+        'review': [
+            [1, 1, 'Отлично', 1, 10, '2019-09-24T21:08:21.567Z'],
+            [2, 1, 'Хорошо,\nно длинно', 2, 7, '2019-09-24T21:08:21.567Z'],
+            [3, 2, 'Скучно', 1, 4, '2019-09-25T10:00:00Z'],
+        ],
+        'comments': [[1, 1, 'Согласен', 2, '2019-09-24T21:08:21.567Z']],
+    }
+
+
+def write_csv(path, rows):
+    for name, header in HEADERS.items():
+        with open(path / f'{name}.csv', 'w', encoding='utf-8',
+                  newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows[name])
+
+
+def import_all(path, *args):
+    out = StringIO()
+    call_command('import_all', '--path', str(path), *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test19Import:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    def test_01_import_all(self, client, tmp_path):
+        write_csv(tmp_path, get_rows())
+        client.get(self.TITLES_URL)
+        output = import_all(tmp_path, '--batch-size', '40')
+        assert 'строк/с' in output, (
+            'Проверьте, что команда сообщает скорость импорта.'
+        )
+        titles = {
+            title['id']: title
+            for title in client.get(self.TITLES_URL).json()['results']
+        }
+        assert set(titles) == {1, 2}, (
+            'Проверьте, что после импорта список произведений не отдается '
+            'из устаревшего кэша.'
+        )
+        assert titles[1]['rating'] == 8 and titles[2]['rating'] == 4, (
+            'Проверьте, что после импорта рейтинги пересчитаны по отзывам.'
+        )
+        stats = client.get(f'{self.TITLES_URL}1/stats/').json()
+        assert stats['histogram']['10'] == stats['histogram']['7'] == 1, (
+            'Проверьте, что после импорта распределения оценок '
+            'пересчитаны по отзывам.'
+        )
+        assert {genre['slug'] for genre in titles[2]['genre']} == {
+            'drama', 'comedy'
+        }
+        response = client.get(f'{self.TITLES_URL}1/reviews/2/')
+        assert response.json()['text'] == 'Хорошо,\nно длинно', (
+            'Проверьте, что многострочный текст отзыва импортирован целиком.'
+        )
+        response = client.get(f'{self.TITLES_URL}1/reviews/1/comments/')
+        assert response.json()['count'] == 1
+
+    def test_02_reimport_updates(self, client, tmp_path):
+        rows = get_rows()
+        write_csv(tmp_path, rows)
+        import_all(tmp_path)
+        rows['review'][0][2:5] = ['Пересмотрел', 1, 1]
+        rows['titles'][1][1] = 'Идиот (роман)'
+        write_csv(tmp_path, rows)
+        import_all(tmp_path)
+        title = client.get(f'{self.TITLES_URL}1/').json()
+        assert title['rating'] == 4, (
+            'Проверьте, что повторный импорт обновляет существующие '
+            'строки по id и рейтинг пересчитывается.'
+        )
+        assert client.get(f'{self.TITLES_URL}1/reviews/').json()[
+            'count'
+        ] == 2, (
+            'Проверьте, что повторный импорт не создает дубликатов.'
+        )
+        assert client.get(f'{self.TITLES_URL}2/').json()[
+            'name'
+        ] == 'Идиот (роман)'
+
+    def test_03_invalid_rows_skipped(self, client, tmp_path):
+        rows = get_rows()
+        rows['titles'].append([3, 'Без категории', 2000, 99])
+        rows['genre_title'].append([4, 3, 1])
+        rows['review'] += [
+            [4, 2, 'Нет автора', 42, 5, '2019-09-25T10:00:00Z'],
+            [5, 2, 'Плохая оценка', 2, 'десять', '2019-09-25T10:00:00Z'],
+            [6, 2, 'Повтор', 1, 5, '2019-09-25T10:00:00Z'],
+            [7, 2],
+        ]
+        write_csv(tmp_path, rows)
+        output = import_all(tmp_path)
+        assert 'category_id=99 не найден' in output, (
+            'Проверьте, что строки с несуществующим внешним ключом '
+            'пропускаются с указанием причины.'
+        )
+        assert 'title_id=3 не найден' in output, (
+            'Проверьте, что строки, ссылающиеся на пропущенные строки, '
+            'тоже пропускаются.'
+        )
+        assert 'author_id=42 не найден' in output
+        assert 'score' in output and 'не хватает колонок' in output
+        assert 'review.csv, строка 8' in output, (
+            'Проверьте, что нарушение уникальности отзыва сообщается '
+            'с номером строки файла.'
+        )
+        assert client.get(f'{self.TITLES_URL}2/reviews/').json()[
+            'count'
+        ] == 1, (
+            'Проверьте, что некорректные строки не попадают в БД, '
+            'а корректные из того же куска сохраняются.'
+        )
+        assert client.get(f'{self.TITLES_URL}3/').status_code == 404
+
+    def test_04_indexes_restored(self, tmp_path):
+        write_csv(tmp_path, get_rows())
+
+        def get_indexes():
+            with connection.cursor() as cursor:
+                return {
+                    table: {
+                        name for name, info in
+                        connection.introspection.get_constraints(
+                            cursor, table
+                        ).items()
+                        if info['index']
+                    }
+                    for table in ('reviews_review', 'reviews_title')
+                }
+
+        indexes = get_indexes()
+        import_all(tmp_path)
+        assert get_indexes() == indexes, (
+            'Проверьте, что индексы, снятые на время загрузки, '
+            'восстановлены.'
+        )
+
+    def test_05_resume(self, client, tmp_path, monkeypatch):
+        rows = get_rows()
+        rows['review'] += [
+            [index, 2, f'Отзыв {index}', index - 2, 5,
+             '2019-09-25T10:00:00Z']
+            for index in range(4, 8)
+        ]
+        rows['users'] += [
+            [index, f'user{index}', f'user{index}@yamdb.fake', 'user',
+             '', '', '']
+            for index in range(3, 6)
+        ]
+        write_csv(tmp_path, rows)
+        write = Importer.write
+        batches = []
+
+        def failing_write(importer, table, params, lines, *args):
+            if table.name == 'review':
+                batches.append(lines)
+                if len(batches) == 3:
+                    raise RuntimeError('Обрыв соединения')
+            return write(importer, table, params, lines, *args)
+
+        monkeypatch.setattr(Importer, 'write', failing_write)
+        with pytest.raises(RuntimeError):
+            import_all(tmp_path, '--workers', '1', '--batch-size', '1')
+        checkpoint = Path(get_checkpoint_filename(tmp_path))
+        assert checkpoint.exists(), (
+            'Проверьте, что при прерывании импорта остается контрольная '
+            'точка.'
+        )
+        assert not list(tmp_path.glob('*.json')), (
+            'Проверьте, что контрольная точка по умолчанию не пишется '
+            'в каталог с выгрузкой.'
+        )
+        output = import_all(
+            tmp_path, '--workers', '1', '--batch-size', '1'
+        )
+        assert 'review.csv: продолжение с пакета 3' in output, (
+            'Проверьте, что импорт продолжается с первого незаписанного '
+            'пакета.'
+        )
+        assert 'users.csv: загружен до прерывания' in output
+        assert batches[3] == batches[2], (
+            'Проверьте, что после продолжения записываются только пакеты, '
+            'не записанные до прерывания.'
+        )
+        assert len(batches) == 3 + 5
+        assert not checkpoint.exists(), (
+            'Проверьте, что после успешного импорта контрольная точка '
+            'удаляется.'
+        )
+        assert client.get(f'{self.TITLES_URL}2/reviews/').json()[
+            'count'
+        ] == 5
+
+    def test_06_worker_pool(self, client, tmp_path):
+        write_csv(tmp_path, get_rows())
+        output = import_all(tmp_path, '--workers', '2', '--batch-size', '30')
+        assert 'пропущено: 0' in output
+        title = client.get(f'{self.TITLES_URL}1/').json()
+        assert title['rating'] == 8, (
+            'Проверьте, что импорт в пуле процессов дает тот же результат.'
+        )
+        response = client.get(f'{self.TITLES_URL}1/reviews/2/')
+        assert response.json()['text'] == 'Хорошо,\nно длинно'
+
+    def test_07_ranges_keep_records_whole(self, tmp_path):
+        write_csv(tmp_path, get_rows())
+        with open(tmp_path / 'review.csv', 'rb') as file:
+            data = file.read()
+        for size in (1, 7, 40, len(data)):
+            ranges = list(iter_ranges(BytesIO(data), 0, 1, size))
+            assert [start for start, _, _ in ranges[1:]] == [
+                end for _, end, _ in ranges[:-1]
+            ] and ranges[-1][1] == len(data)
+            records = []
+            for start, end, line in ranges:
+                assert line == data[:start].count(b'\n') + 1
+                records += csv.reader(
+                    StringIO(data[start:end].decode(), newline='')
+                )
+            assert records == list(
+                csv.reader(StringIO(data.decode(), newline=''))
+            ), (
+                'Проверьте, что файл делится на пакеты только по границам '
+                'записей CSV, в том числе с переводами строк в кавычках.'
+            )
+
+    def test_08_delta_writes_only_changed(self, client, tmp_path):
+        rows = get_rows()
+        write_csv(tmp_path, rows)
+        import_all(tmp_path)
+        output = import_all(tmp_path)
+        assert 'review.csv: записано 0, без изменений 3' in output, (
+            'Проверьте, что повторный импорт без изменений в выгрузке '
+            'не перезаписывает строки.'
+        )
+        assert 'Отзывы: проиндексировано' not in output, (
+            'Проверьте, что без изменений полнотекстовый индекс не '
+            'перестраивается целиком.'
+        )
+        rows['titles'][0][1] = 'Побег из Шоушенка'
+        rows['review'][2][4] = 8
+        write_csv(tmp_path, rows)
+        output = import_all(tmp_path)
+        assert 'titles.csv: записано 1, без изменений 1' in output
+        assert 'review.csv: записано 1, без изменений 2' in output
+        assert client.get(f'{self.TITLES_URL}2/').json()['rating'] == 8, (
+            'Проверьте, что рейтинг пересчитан после записи изменений.'
+        )
+        response = client.get(self.TITLES_URL, {'search': 'шоушенка'})
+        assert [title['id'] for title in response.json()['results']] == [
+            1
+        ], (
+            'Проверьте, что измененные строки переиндексированы для поиска.'
+        )
+
+    def test_09_row_deleted_via_api_restored(self, admin_client, tmp_path):
+        write_csv(tmp_path, get_rows())
+        import_all(tmp_path)
+        admin_client.delete(f'{self.TITLES_URL}1/reviews/2/')
+        output = import_all(tmp_path)
+        assert 'review.csv: записано 1, без изменений 2' in output, (
+            'Проверьте, что строка, удаленная после импорта, записывается '
+            'снова, даже если в выгрузке она не изменилась.'
+        )
+        assert admin_client.get(
+            f'{self.TITLES_URL}1/reviews/2/'
+        ).status_code == 200
+        assert admin_client.get(f'{self.TITLES_URL}1/').json()['rating'] == 8
+
+    def test_10_delete_missing(self, admin_client, tmp_path):
+        rows = get_rows()
+        write_csv(tmp_path, rows)
+        import_all(tmp_path)
+        admin_client.post(
+            f'{self.TITLES_URL}2/reviews/', data={'text': 'Мой', 'score': 9}
+        )
+        del rows['review'][0]
+        del rows['comments'][0]
+        del rows['genre'][1]
+        write_csv(tmp_path, rows)
+        output = import_all(tmp_path)
+        assert admin_client.get(
+            f'{self.TITLES_URL}1/reviews/1/'
+        ).status_code == 200
+        assert 'удалено' not in output.split('Всего')[0], (
+            'Проверьте, что без --delete-missing строки не удаляются.'
+        )
+        output = import_all(tmp_path, '--delete-missing')
+        assert admin_client.get(
+            f'{self.TITLES_URL}1/reviews/1/'
+        ).status_code == 404, (
+            'Проверьте, что с --delete-missing удаляются строки, '
+            'пропавшие из выгрузки.'
+        )
+        assert 'comments.csv: удалено 1' in output
+        assert admin_client.get(f'{self.TITLES_URL}1/').json()[
+            'rating'
+        ] == 7
+        assert admin_client.get(f'{self.TITLES_URL}2/reviews/').json()[
+            'count'
+        ] == 2, (
+            'Проверьте, что строки, созданные через API, не удаляются.'
+        )
+        assert 'genre.csv: id=2 не удален' in output, (
+            'Проверьте, что строка, на которую еще ссылаются, не '
+            'удаляется, а попадает в отчет.'
+        )
+        genres = admin_client.get('/api/v1/genres/').json()['results']
+        assert {genre['slug'] for genre in genres} == {'drama', 'comedy'}
+
+    def test_11_dry_run_valid(self, client, tmp_path):
+        write_csv(tmp_path, get_rows())
+        report = json.loads(import_all(tmp_path, '--dry-run'))
+        assert report['valid'] and report['errors'] == [], (
+            'Проверьте, что --dry-run не находит ошибок в корректных '
+            'файлах.'
+        )
+        rows = {table['file']: table['rows'] for table in report['tables']}
+        assert rows['review.csv'] == 3 and rows['comments.csv'] == 1
+        assert client.get(self.TITLES_URL).json()['count'] == 0, (
+            'Проверьте, что --dry-run ничего не записывает в БД.'
+        )
+
+    def test_12_dry_run_report(self, client, tmp_path):
+        rows = get_rows()
+        write_csv(tmp_path, rows)
+        import_all(tmp_path)
+        rows['users'].append([3, 'reader', 'other@yamdb.fake', 'user',
+                              '', '', ''])
+        rows['titles'].append([3, 'Без категории', 2000, 99])
+        rows['review'] += [
+            [4, 2, 'Повтор в файле', 2, 5, '2019-09-25T10:00:00Z'],
+            [5, 2, 'Повтор в файле', 2, 6, '2019-09-25T10:00:00Z'],
+            [6, 1, 'Повтор в БД', 1, 5, '2019-09-25T10:00:00Z'],
+            [7, 2, 'Плохая оценка', 1, 11, '2019-09-25T10:00:00Z'],
+            [8, 3, 'Нет произведения', 1, 5, '2019-09-25T10:00:00Z'],
+            [9, 2, 'Плохая дата', 1, 5, '25.09.2019'],
+        ]
+        rows['review'][0][2] = 'Изменен'
+        write_csv(tmp_path, rows)
+        report_file = tmp_path / 'report.json'
+        with pytest.raises(CommandError):
+            import_all(tmp_path, '--dry-run', '--report', str(report_file))
+        with open(report_file, encoding='utf-8') as file:
+            report = json.load(file)
+        assert not report['valid']
+        errors = {
+            (error['file'], error['line'], error['column'])
+            for error in report['errors']
+        }
+        assert errors == {
+            ('users.csv', 4, 'username'),
+            ('titles.csv', 4, 'category'),
+            ('review.csv', 7, 'author'),
+            ('review.csv', 8, 'author'),
+            ('review.csv', 9, 'score'),
+            ('review.csv', 10, 'title_id'),
+            ('review.csv', 11, 'pub_date'),
+        }, (
+            'Проверьте, что --dry-run сообщает о каждой некорректной '
+            'строке: ссылочная целостность, уникальность в файле и в БД, '
+            'диапазон оценки и формат даты.'
+        )
+        assert client.get(f'{self.TITLES_URL}1/reviews/1/').json()[
+            'text'
+        ] == 'Отлично', (
+            'Проверьте, что --dry-run ничего не записывает в БД.'
+        )
+
+    def test_13_export_round_trip(self, tmp_path):
+        write_csv(tmp_path, get_rows())
+        import_all(tmp_path)
+
+        def get_data():
+            return {
+                table.name: list(table.model.objects.order_by(
+                    'pk'
+                ).values_list(*(field for _, field, _ in table.columns)))
+                for table in TABLES
+            }
+
+        data = get_data()
+        export_path = tmp_path / 'export'
+        call_command('export_all', str(export_path), '--chunk-size', '2',
+                     stdout=StringIO())
+        call_command('export_all', str(tmp_path / 'gzip'), '--gzip',
+                     stdout=StringIO())
+        for name, header in HEADERS.items():
+            with open(export_path / f'{name}.csv', encoding='utf-8',
+                      newline='') as file:
+                text = file.read()
+            assert text.splitlines()[0] == ','.join(header), (
+                'Проверьте, что выгрузка использует колонки исходных '
+                'CSV-файлов.'
+            )
+            with gzip.open(tmp_path / 'gzip' / f'{name}.csv.gz', 'rt',
+                           encoding='utf-8', newline='') as file:
+                assert file.read() == text, (
+                    'Проверьте, что с --gzip выгружаются те же данные.'
+                )
+        call_command('flush', '--no-input')
+        import_all(export_path)
+        assert get_data() == data, (
+            'Проверьте, что выгрузка загружается обратно командой '
+            'import_all без потерь.'
+        )
+
+    def test_14_delta_recounts_changed_titles(self, client, tmp_path):
+        rows = get_rows()
+        write_csv(tmp_path, rows)
+        import_all(tmp_path)
+        with CaptureQueriesContext(connection) as context:
+            import_all(tmp_path)
+        assert not any(
+            table in query['sql']
+            for query in context.captured_queries
+            for table in ('leaderboard', 'histogram', 'dailyactivity')
+        ), (
+            'Проверьте, что импорт без изменений не пересчитывает '
+            'рейтинги, распределения оценок и сводки.'
+        )
+
+        # Отзыв переходит к другому произведению.
+        rows['review'][2][1] = 1
+        rows['review'][2][3] = 3
+        rows['users'].append([3, 'editor', 'editor@yamdb.fake', 'user',
+                              '', '', ''])
+        write_csv(tmp_path, rows)
+        import_all(tmp_path)
+        titles = {
+            title['id']: title
+            for title in client.get(self.TITLES_URL).json()['results']
+        }
+        assert titles[1]['rating'] == 7 and titles[2]['rating'] is None, (
+            'Проверьте, что импорт пересчитывает рейтинги и прежнего, '
+            'и нового произведения отзыва.'
+        )
+        assert client.get(f'{self.TITLES_URL}1/stats/').json()[
+            'histogram'
+        ]['4'] == 1
+        assert client.get(f'{self.TITLES_URL}2/stats/').json()[
+            'histogram'
+        ]['4'] == 0
+        top = client.get(f'{self.TITLES_URL}top/').json()
+        assert [title['id'] for title in top] == [1], (
+            'Проверьте, что рейтинг лучших обновлен для затронутых '
+            'произведений.'
+        )
@@ -0,0 +1,71 @@
+import json
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.exporting import iter_title_lines
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test20TitlesExport:
+
+    EXPORT_URL = '/api/v1/titles/export/'
+
+    def test_01_admin_only(self, client, user_client, moderator_client):
+        assert client.get(self.EXPORT_URL).status_code == (
+            HTTPStatus.UNAUTHORIZED
+        ), (
+            'Проверьте, что выгрузка каталога недоступна анониму.'
+        )
+        for api_client in (user_client, moderator_client):
+            assert api_client.get(self.EXPORT_URL).status_code == (
+                HTTPStatus.FORBIDDEN
+            ), (
+                'Проверьте, что выгрузка каталога доступна только '
+                'администратору.'
+            )
+
+    def test_02_ndjson(self, admin_client, user_client, moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        create_single_review(user_client, titles[0]['id'], 'Да', 8)
+        create_single_review(moderator_client, titles[0]['id'], 'Нет', 3)
+        response = admin_client.get(self.EXPORT_URL)
+        assert response.status_code == HTTPStatus.OK
+        assert response.streaming, (
+            'Проверьте, что выгрузка отдается потоком '
+            '(StreamingHttpResponse).'
+        )
+        assert response['Content-Type'] == 'application/x-ndjson'
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        exported = [json.loads(line) for line in lines]
+        assert [title['id'] for title in exported] == sorted(
+            title['id'] for title in titles
+        ), (
+            'Проверьте, что выгружаются все произведения, по строке на '
+            'каждое, в порядке id.'
+        )
+        for title in exported:
+            detail = admin_client.get(f'/api/v1/titles/{title["id"]}/').json()
+            assert title['rating'] == detail['rating'], (
+                'Проверьте, что рейтинг в выгрузке совпадает с API.'
+            )
+            assert title['category'] == detail['category']['slug']
+            assert sorted(title['genre']) == sorted(
+                genre['slug'] for genre in detail['genre']
+            ), (
+                'Проверьте, что в выгрузке указаны слаги жанров.'
+            )
+        assert exported[0]['rating'] == 5
+
+    def test_03_chunks(self, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        with CaptureQueriesContext(connection) as queries:
+            lines = list(iter_title_lines(chunk_size=1))
+        assert len(lines) == len(titles)
+        assert len(queries) == 2 * len(titles) + 1, (
+            'Проверьте, что на кусок выгрузки приходится запрос '
+            'произведений и один запрос жанров.'
+        )
@@ -0,0 +1,94 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test21Leaderboard:
+
+    TITLES_URL = '/api/v1/titles/'
+    TOP_URL = '/api/v1/titles/top/'
+
+    def create_data(self, admin_client, clients):
+        titles, _, _ = create_titles(admin_client)
+        response = admin_client.post(self.TITLES_URL, data={
+            'name': 'Провал', 'year': 2000, 'genre': ['drama'],
+            'category': 'films'
+        })
+        titles.append(response.json())
+        single, popular, weak = (title['id'] for title in titles)
+        create_single_review(clients[0], single, 'Шедевр', 10)
+        for client, score in zip(clients, (10, 10, 10, 9)):
+            create_single_review(client, popular, 'Хорошо', score)
+            create_single_review(client, weak, 'Плохо', 2)
+        return single, popular, weak
+
+    def get_top(self, client, **params):
+        response = client.get(self.TOP_URL, params)
+        assert response.status_code == 200
+        return [title['id'] for title in response.json()]
+
+    def test_01_bayesian_order(self, client, admin_client, user_client,
+                               moderator_client, user_superuser_client):
+        single, popular, weak = self.create_data(admin_client, [
+            user_client, moderator_client, user_superuser_client,
+            admin_client
+        ])
+        assert self.get_top(client) == [single, popular, weak], (
+            'Проверьте, что до пересчета среднего произведения '
+            'упорядочены по средней оценке.'
+        )
+        call_command('refresh_leaderboards', stdout=StringIO())
+        top = client.get(self.TOP_URL).json()
+        assert [title['id'] for title in top] == [popular, single, weak], (
+            'Проверьте, что рейтинг лучших упорядочен по байесовскому '
+            'среднему: единственная десятка не обгоняет много высоких '
+            'оценок.'
+        )
+        assert top[0]['rating'] == 9 and 'score' in top[0]
+        assert self.get_top(client, limit=1) == [popular]
+
+        create_single_review(moderator_client, single, 'Скучно', 2)
+        assert self.get_top(client) == [popular, single, weak], (
+            'Проверьте, что новый отзыв сразу меняет место произведения '
+            'в рейтинге лучших.'
+        )
+
+    def test_02_genre_and_category(self, client, admin_client, user_client,
+                                   moderator_client, user_superuser_client):
+        single, popular, weak = self.create_data(admin_client, [
+            user_client, moderator_client, user_superuser_client,
+            admin_client
+        ])
+        assert self.get_top(client, genre='drama') == [popular, weak]
+        assert self.get_top(client, category='books') == [popular]
+        assert self.get_top(
+            client, genre='drama', category='films'
+        ) == [weak]
+        assert self.get_top(client, genre='unknown') == [], (
+            'Проверьте, что для несуществующего жанра возвращается '
+            'пустой список.'
+        )
+        admin_client.patch(
+            f'{self.TITLES_URL}{popular}/', data={'genre': ['horror']},
+            format='json'
+        )
+        assert self.get_top(client, genre='horror') == [single, popular], (
+            'Проверьте, что при изменении жанров произведения меняются '
+            'и рейтинги жанров.'
+        )
+        assert self.get_top(client, genre='drama') == [weak]
+        with CaptureQueriesContext(connection) as context:
+            self.get_top(client, genre='drama', category='films')
+        assert not any(
+            'reviews_review' in query['sql']
+            for query in context.captured_queries
+        ), (
+            'Проверьте, что рейтинг лучших читается из таблицы мест, '
+            'без агрегации отзывов.'
+        )
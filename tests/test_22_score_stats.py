@@ -0,0 +1,81 @@
+from http import HTTPStatus
+
+import pytest
+
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test22ScoreStats:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    def get_stats(self, client, title_id):
+        response = client.get(f'{self.TITLES_URL}{title_id}/stats/')
+        assert response.status_code == HTTPStatus.OK
+        return response.json()
+
+    def test_01_stats(self, client, admin_client, user_client,
+                      moderator_client, user_superuser_client,
+                      django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        reviews = {}
+        for api_client, score in (
+            (user_client, 10), (moderator_client, 9),
+            (user_superuser_client, 2), (admin_client, 8),
+        ):
+            reviews[score] = create_single_review(
+                api_client, title_id, 'Отзыв', score
+            ).json()['id']
+        with django_assert_num_queries(1):
+            stats = self.get_stats(client, title_id)
+        assert stats['histogram'] == {
+            '1': 0, '2': 1, '3': 0, '4': 0, '5': 0,
+            '6': 0, '7': 0, '8': 1, '9': 1, '10': 1,
+        }, (
+            'Проверьте, что эндпоинт статистики возвращает число отзывов '
+            'с каждой оценкой от 1 до 10.'
+        )
+        assert (stats['count'], stats['mean'], stats['median'],
+                stats['p90']) == (4, 7.25, 8.5, 10), (
+            'Проверьте расчет числа отзывов, среднего, медианы '
+            'и 90-го процентиля.'
+        )
+
+        reviews_url = f'{self.TITLES_URL}{title_id}/reviews/'
+        user_superuser_client.patch(
+            f'{reviews_url}{reviews[2]}/', data={'score': 5}
+        )
+        moderator_client.delete(f'{reviews_url}{reviews[9]}/')
+        stats = self.get_stats(client, title_id)
+        assert (stats['histogram']['2'], stats['histogram']['5'],
+                stats['histogram']['9']) == (0, 1, 0), (
+            'Проверьте, что счетчики оценок меняются при изменении '
+            'и удалении отзыва.'
+        )
+        assert (stats['count'], stats['median'], stats['p90']) == (
+            3, 8, 10
+        )
+
+    def test_02_no_reviews(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        stats = self.get_stats(client, titles[1]['id'])
+        assert stats['count'] == 0 and stats['median'] is None
+        assert set(stats['histogram'].values()) == {0}
+        for title_id in (999, 'abc'):
+            response = client.get(f'{self.TITLES_URL}{title_id}/stats/')
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                f'Проверьте, что статистика произведения `{title_id}` '
+                'возвращает 404.'
+            )
+
+    def test_03_delete_title(self, admin_client, user_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        create_single_review(user_client, title_id, 'Отзыв', 7)
+        response = admin_client.delete(f'{self.TITLES_URL}{title_id}/')
+        assert response.status_code == HTTPStatus.NO_CONTENT, (
+            'Проверьте, что произведение с отзывами удаляется вместе '
+            'с распределением оценок.'
+        )
@@ -0,0 +1,184 @@
+from datetime import datetime, timezone
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.activity import recount_activity
+from reviews.models import GenreDailyActivity, Review, TitleDailyActivity
+from tests.utils import (create_single_comment, create_single_review,
+                         create_titles)
+
+
+def get_activity():
+    """Ненулевые строки сводок произведений и жанров."""
+    return {
+        model.__name__: sorted(
+            row for row in model.objects.values_list(
+                key, 'date', 'review_count', 'score_sum', 'comment_count'
+            ) if any(row[2:])
+        )
+        for model, key in (
+            (TitleDailyActivity, 'title_id'), (GenreDailyActivity, 'genre_id')
+        )
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+class Test23DailyActivity:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    def get_timeseries(self, client, title_id, **params):
+        response = client.get(
+            f'{self.TITLES_URL}{title_id}/timeseries/', params
+        )
+        assert response.status_code == HTTPStatus.OK
+        return response.json()
+
+    def test_01_timeseries(self, client, admin_client, user_client,
+                           moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        review_id = create_single_review(
+            user_client, title_id, 'Сегодня', 10
+        ).json()['id']
+        create_single_comment(admin_client, title_id, review_id, 'Да')
+        old_review_id = create_single_review(
+            moderator_client, title_id, 'Давно', 4
+        ).json()['id']
+        Review.objects.filter(pk=old_review_id).update(
+            pub_date=datetime(2024, 1, 3, 12, tzinfo=timezone.utc)
+        )
+        call_command('backfill_activity', chunk_size=1, stdout=StringIO())
+
+        series = self.get_timeseries(client, title_id)
+        assert [point['date'] for point in series] == [
+            '2024-01-03', datetime.now(timezone.utc).date().isoformat()
+        ], (
+            'Проверьте, что временной ряд по дням упорядочен по дате '
+            'и содержит только дни с активностью.'
+        )
+        assert series[0] == {
+            'date': '2024-01-03', 'review_count': 1, 'score_sum': 4,
+            'comment_count': 0, 'mean_score': 4.0,
+        }
+        assert (series[1]['review_count'], series[1]['comment_count']) == (
+            1, 1
+        ), (
+            'Проверьте, что в ряду учтены отзывы и комментарии за день.'
+        )
+        assert self.get_timeseries(
+            client, title_id, **{'from': '2024-01-01', 'to': '2024-12-31'}
+        ) == series[:1], (
+            'Проверьте фильтрацию временного ряда параметрами from и to.'
+        )
+        assert self.get_timeseries(
+            client, title_id, bucket='week', to='2024-12-31'
+        )[0]['date'] == '2024-01-01', (
+            'Проверьте, что неделя начинается с понедельника.'
+        )
+        assert self.get_timeseries(
+            client, title_id, bucket='month', to='2024-12-31'
+        )[0]['date'] == '2024-01-01'
+
+    def test_02_updated_on_write(self, admin_client, user_client,
+                                 moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        reviews_url = f'{self.TITLES_URL}{title_id}/reviews/'
+        review_id = create_single_review(
+            user_client, title_id, 'Отзыв', 6
+        ).json()['id']
+        moderator_review_id = create_single_review(
+            moderator_client, title_id, 'Отзыв', 8
+        ).json()['id']
+        create_single_review(user_client, titles[1]['id'], 'Отзыв', 3)
+        create_single_comment(admin_client, title_id, review_id, 'Один')
+        create_single_comment(
+            admin_client, title_id, moderator_review_id, 'Два'
+        )
+        user_client.patch(f'{reviews_url}{review_id}/', data={'score': 9})
+        admin_client.patch(
+            f'{self.TITLES_URL}{title_id}/', data={'genre': ['drama']},
+            format='json'
+        )
+        moderator_client.delete(f'{reviews_url}{moderator_review_id}/')
+        activity = get_activity()
+        assert activity['TitleDailyActivity'][0][2:] == (1, 9, 1), (
+            'Проверьте, что изменение и удаление отзыва и комментариев '
+            'сразу меняют дневную сводку произведения.'
+        )
+        recount_activity()
+        assert activity == get_activity(), (
+            'Проверьте, что сводки, обновляемые при записи, совпадают '
+            'с пересчитанными по отзывам и комментариям.'
+        )
+        admin_client.delete(f'{self.TITLES_URL}{title_id}/')
+        activity = get_activity()
+        assert activity['GenreDailyActivity'][0][2:] == (1, 3, 0)
+        recount_activity()
+        assert activity == get_activity(), (
+            'Проверьте, что удаление произведения убирает его дни '
+            'из сводок жанров.'
+        )
+
+    def test_03_params(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        url = f'{self.TITLES_URL}{titles[0]["id"]}/timeseries/'
+        for params in (
+            {'bucket': 'year'}, {'from': '2024-13-01'}, {'to': 'вчера'}
+        ):
+            assert client.get(url, params).status_code == (
+                HTTPStatus.BAD_REQUEST
+            ), (
+                f'Проверьте, что для параметров {params} возвращается '
+                'ошибка 400.'
+            )
+        for title_id in (999, 'abc'):
+            assert client.get(
+                f'{self.TITLES_URL}{title_id}/timeseries/'
+            ).status_code == HTTPStatus.NOT_FOUND
+        with CaptureQueriesContext(connection) as context:
+            assert client.get(url).json() == []
+        assert not any(
+            'reviews_review' in query['sql']
+            for query in context.captured_queries
+        ), (
+            'Проверьте, что временной ряд читается из дневных сводок, '
+            'без сканирования отзывов.'
+        )
+
+    def test_04_review_delete_cascade(self, admin_client, user_client,
+                                      moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        reviews_url = f'{self.TITLES_URL}{title_id}/reviews/'
+        queries = []
+        for api_client, comments in ((user_client, 1), (moderator_client, 5)):
+            review_id = create_single_review(
+                api_client, title_id, 'Отзыв', 5
+            ).json()['id']
+            for index in range(comments):
+                create_single_comment(
+                    admin_client, title_id, review_id, f'Комментарий {index}'
+                )
+            with CaptureQueriesContext(connection) as context:
+                response = api_client.delete(f'{reviews_url}{review_id}/')
+            assert response.status_code == HTTPStatus.NO_CONTENT
+            # Строки полнотекстового индекса удаляются по одной.
+            queries.append(sum(
+                '_fts' not in query['sql']
+                for query in context.captured_queries
+            ))
+        assert queries[0] == queries[1], (
+            'Проверьте, что при удалении отзыва сводки комментариев '
+            'меняются одним набором запросов, а не на каждый комментарий.'
+        )
+        activity = get_activity()
+        assert activity['TitleDailyActivity'] == []
+        recount_activity()
+        assert activity == get_activity()
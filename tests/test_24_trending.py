@@ -0,0 +1,125 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from reviews.models import Review, Title
+from reviews.trending import iter_recount
+from tests.utils import create_single_review, create_titles
+
+
+@pytest.mark.django_db(transaction=True)
+class Test24Trending:
+
+    TITLES_URL = '/api/v1/titles/'
+    TRENDING_URL = '/api/v1/titles/trending/'
+
+    def create_data(self, admin_client, clients):
+        titles, _, _ = create_titles(admin_client)
+        response = admin_client.post(self.TITLES_URL, data={
+            'name': 'Старое', 'year': 2000, 'genre': ['drama'],
+            'category': 'films'
+        })
+        titles.append(response.json())
+        recent, single, old = (title['id'] for title in titles)
+        for client in clients[:2]:
+            create_single_review(client, recent, 'Свежий', 7)
+        create_single_review(clients[0], single, 'Свежий', 7)
+        for client in clients[:3]:
+            create_single_review(client, old, 'Давний', 7)
+        return recent, single, old
+
+    def get_trending(self, client, **params):
+        response = client.get(self.TRENDING_URL, params)
+        assert response.status_code == 200
+        return response.json()
+
+    def test_01_decay(self, client, admin_client, user_client,
+                      moderator_client, user_superuser_client):
+        recent, single, old = self.create_data(admin_client, [
+            user_client, moderator_client, user_superuser_client
+        ])
+        trending = self.get_trending(client)
+        assert [title['id'] for title in trending] == [old, recent, single], (
+            'Проверьте, что популярные произведения упорядочены по '
+            'затухающему числу отзывов.'
+        )
+        assert [round(title['trending']) for title in trending] == [3, 2, 1]
+
+        Review.objects.filter(title_id=old).update(
+            pub_date=timezone.now() - timedelta(days=10)
+        )
+        output = StringIO()
+        call_command('recompute_trending', dry_run=True, stdout=output)
+        assert 'с расхождениями: 1 (изменения не сохранены)' in (
+            output.getvalue()
+        ), (
+            'Проверьте, что recompute_trending --dry-run сообщает '
+            'о расхождении с датами отзывов.'
+        )
+        assert self.get_trending(client)[0]['id'] == old
+        call_command('recompute_trending', stdout=StringIO())
+        trending = self.get_trending(client)
+        assert [title['id'] for title in trending] == [recent, single, old], (
+            'Проверьте, что давние отзывы весят меньше свежих.'
+        )
+        assert 0 < trending[-1]['trending'] < 0.5
+        assert [
+            title['id'] for title in self.get_trending(client, limit=1)
+        ] == [recent]
+
+    def test_02_updated_on_write(self, client, admin_client, user_client,
+                                 moderator_client, user_superuser_client):
+        recent, single, old = self.create_data(admin_client, [
+            user_client, moderator_client, user_superuser_client
+        ])
+        for title_id in (single, old):
+            review = Review.objects.filter(title_id=title_id).first()
+            admin_client.delete(
+                f'{self.TITLES_URL}{title_id}/reviews/{review.id}/'
+            )
+        trending = self.get_trending(client)
+        assert {title['id'] for title in trending} == {recent, old}, (
+            'Проверьте, что удаление отзыва уменьшает популярность, '
+            'а произведение без отзывов из выдачи пропадает.'
+        )
+        assert all(round(title['trending'], 3) == 2 for title in trending)
+        assert not any(changed for _, changed in iter_recount()), (
+            'Проверьте, что популярность, обновляемая при записи, '
+            'совпадает с пересчитанной по датам отзывов.'
+        )
+
+    def test_03_genre(self, client, admin_client, user_client,
+                      moderator_client, user_superuser_client):
+        recent, single, old = self.create_data(admin_client, [
+            user_client, moderator_client, user_superuser_client
+        ])
+        assert [
+            title['id'] for title in self.get_trending(client, genre='drama')
+        ] == [old, single]
+        assert [
+            title['id'] for title in self.get_trending(client, genre='horror')
+        ] == [recent]
+        assert self.get_trending(client, genre='unknown') == [], (
+            'Проверьте, что для несуществующего жанра возвращается '
+            'пустой список.'
+        )
+
+    def test_04_title_save_keeps_score(self, client, admin_client,
+                                       user_client):
+        titles, _, _ = create_titles(admin_client)
+        title_id = titles[0]['id']
+        title = Title.objects.get(pk=title_id)
+        create_single_review(user_client, title_id, 'Свежий', 7)
+        title.save()
+        admin_client.patch(f'{self.TITLES_URL}{title_id}/', data={
+            'year': 1990
+        })
+        assert [
+            title['id'] for title in self.get_trending(client)
+        ] == [title_id], (
+            'Проверьте, что сохранение произведения не сбрасывает '
+            'его популярность.'
+        )
@@ -0,0 +1,142 @@
+import math
+import random
+from http import HTTPStatus
+from io import StringIO
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+
+from reviews.models import TitleNeighbors
+from reviews.similarity import RatingMatrix, iter_neighbors
+from tests.utils import create_single_review, create_titles
+
+
+def get_similarities(ratings):
+    """Скорректированный косинус напрямую по определению."""
+    by_author = {}
+    for author, title, score in ratings:
+        by_author.setdefault(author, {})[title] = score
+    vectors = {}
+    for author, scores in by_author.items():
+        mean = sum(scores.values()) / len(scores)
+        for title, score in scores.items():
+            vectors.setdefault(title, {})[author] = score - mean
+    result = {}
+    for title, vector in vectors.items():
+        for other, other_vector in vectors.items():
+            common = vector.keys() & other_vector.keys()
+            dot = sum(vector[author] * other_vector[author]
+                      for author in common)
+            if other == title or len(common) < 2 or dot <= 1e-9:
+                continue
+            result[title, other] = dot / math.sqrt(
+                sum(value ** 2 for value in vector.values())
+                * sum(value ** 2 for value in other_vector.values())
+            )
+    return result
+
+
+@pytest.mark.django_db(transaction=True)
+class Test25Similar:
+
+    TITLES_URL = '/api/v1/titles/'
+
+    def get_similar(self, client, title_id, **params):
+        response = client.get(f'{self.TITLES_URL}{title_id}/similar/', params)
+        assert response.status_code == HTTPStatus.OK
+        return response.json()
+
+    def test_01_similar(self, client, admin_client, user_client,
+                        moderator_client, user_superuser_client,
+                        django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        response = admin_client.post(self.TITLES_URL, data={
+            'name': 'Третье', 'year': 2000, 'genre': ['drama'],
+            'category': 'films'
+        })
+        first, second, third = (
+            *(title['id'] for title in titles), response.json()['id']
+        )
+        for api_client, scores in (
+            (user_client, (10, 9, 2)),
+            (moderator_client, (3, 2, 7)),
+            (user_superuser_client, (8, 9, 4)),
+        ):
+            for title_id, score in zip((first, second, third), scores):
+                create_single_review(api_client, title_id, 'Отзыв', score)
+        assert self.get_similar(client, first) == [], (
+            'Проверьте, что до расчета соседей возвращается пустой список.'
+        )
+        call_command('compute_similar_titles', workers=1, stdout=StringIO())
+
+        with django_assert_num_queries(3):
+            similar = self.get_similar(client, first)
+        assert [title['id'] for title in similar] == [second], (
+            'Проверьте, что похожими считаются произведения, которые '
+            'одни и те же авторы оценили выше или ниже своей средней '
+            'оценки.'
+        )
+        assert similar[0]['similarity'] == round(10 / math.sqrt(132), 3)
+        assert similar[0]['name'] == titles[1]['name']
+        assert self.get_similar(client, third) == [], (
+            'Проверьте, что произведения с отрицательным сходством '
+            'соседями не считаются.'
+        )
+        admin_client.delete(f'{self.TITLES_URL}{second}/')
+        assert self.get_similar(client, first) == [], (
+            'Проверьте, что удаленные после расчета соседи пропускаются.'
+        )
+        for title_id in (999, 'abc'):
+            assert client.get(
+                f'{self.TITLES_URL}{title_id}/similar/'
+            ).status_code == HTTPStatus.NOT_FOUND
+
+    def test_02_matrix(self):
+        generator = random.Random(0)
+        ratings = {
+            (generator.randrange(60), generator.randrange(40)):
+            generator.randint(1, 10)
+            for _ in range(600)
+        }
+        # Один автор оценил все произведения: его строка плотная.
+        ratings.update({(100, title): title % 10 + 1 for title in range(40)})
+        ratings = [
+            (author, title + 1000, score)
+            for (author, title), score in ratings.items()
+        ]
+        expected = get_similarities(ratings)
+        authors, titles, scores = (np.array(column) for column in zip(
+            *ratings
+        ))
+        results = [
+            dict(iter_neighbors(RatingMatrix(
+                authors, titles, scores, dense_ratio=dense_ratio
+            ), count=40, workers=workers, **block_size))
+            for dense_ratio, workers, block_size in (
+                (0, 1, {}),
+                (10, 1, {'pairs': 100, 'cells': 200}),
+                (1000, 2, {'cells': 1}),
+            )
+        ]
+        for packed in results:
+            neighbors = {
+                (title_id, other): similarity
+                for title_id, blob in packed.items()
+                for other, similarity in TitleNeighbors(
+                    neighbors=blob
+                ).items
+            }
+            assert neighbors.keys() == expected.keys(), (
+                'Проверьте, что блочный расчет находит тех же соседей, '
+                'что и расчет по определению.'
+            )
+            assert all(
+                math.isclose(similarity, expected[pair], rel_tol=1e-5)
+                for pair, similarity in neighbors.items()
+            )
+            for blob in packed.values():
+                values = [similarity for _, similarity in TitleNeighbors(
+                    neighbors=blob
+                ).items]
+                assert values == sorted(values, reverse=True)
@@ -0,0 +1,130 @@
+from http import HTTPStatus
+from io import StringIO
+
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from reviews.recommendations import Factorization, get_pointers, solve_rows
+from tests.utils import create_single_review, create_titles
+
+User = get_user_model()
+
+
+@pytest.mark.django_db(transaction=True)
+class Test26Recommendations:
+
+    TITLES_URL = '/api/v1/titles/'
+    URL = '/api/v1/users/me/recommendations/'
+
+    def get_recommendations(self, client, **params):
+        response = client.get(self.URL, params)
+        assert response.status_code == HTTPStatus.OK
+        return response.json()
+
+    def test_01_recommendations(self, client, admin_client, user_client,
+                                moderator_client, user_superuser_client,
+                                django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        for name in ('Третье', 'Без отзывов'):
+            response = admin_client.post(self.TITLES_URL, data={
+                'name': name, 'year': 2000, 'genre': ['drama'],
+                'category': 'films'
+            })
+            titles.append(response.json())
+        first, second, third, unrated = (title['id'] for title in titles)
+        for api_client, scores in (
+            (user_client, {first: 10}),
+            (moderator_client, {first: 10, second: 10, third: 2}),
+            (user_superuser_client, {first: 9, second: 9, third: 3}),
+            (admin_client, {first: 3, second: 2, third: 10}),
+        ):
+            for title_id, score in scores.items():
+                create_single_review(api_client, title_id, 'Отзыв', score)
+        assert client.get(self.URL).status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что рекомендации доступны только '
+            'аутентифицированному пользователю.'
+        )
+        assert self.get_recommendations(user_client) == [], (
+            'Проверьте, что до обучения возвращается пустой список.'
+        )
+        call_command(
+            'train_recommendations', factors=2, iterations=20,
+            stdout=StringIO()
+        )
+
+        recommended = self.get_recommendations(user_client)
+        assert [title['id'] for title in recommended] == [second, third], (
+            'Проверьте, что рекомендации упорядочены по прогнозной оценке, '
+            'без произведений, на которые пользователь уже написал отзыв.'
+        )
+        assert 1 <= recommended[1]['predicted_score'] < (
+            recommended[0]['predicted_score']
+        ) <= 10
+        assert recommended[0]['name'] == titles[1]['name']
+        # Пользователь из токена, его вектор, его отзывы, произведения
+        # и их жанры.
+        with django_assert_num_queries(5):
+            assert len(self.get_recommendations(user_client, limit=1)) == 1
+
+        newcomer = APIClient()
+        newcomer.force_authenticate(User.objects.create(
+            username='newcomer', email='newcomer@yamdb.fake'
+        ))
+        assert [
+            title['id'] for title in self.get_recommendations(newcomer)
+        ][-1] == third, (
+            'Проверьте, что пользователь без отзывов получает прогноз '
+            'по смещениям произведений.'
+        )
+        admin_client.delete(f'{self.TITLES_URL}{second}/')
+        assert [
+            title['id'] for title in self.get_recommendations(user_client)
+        ] == [third], (
+            'Проверьте, что удаленные после обучения произведения '
+            'пропускаются.'
+        )
+
+    def test_02_no_reviews(self, user_client):
+        output = StringIO()
+        call_command('train_recommendations', factors=2, stdout=output)
+        assert 'Авторов: 0' in output.getvalue(), (
+            'Проверьте, что обучение без отзывов завершается без ошибки.'
+        )
+        assert self.get_recommendations(user_client) == []
+
+    def test_03_factorization(self):
+        generator = np.random.default_rng(0)
+        features = generator.normal(size=(6, 3))
+        columns = generator.integers(0, 6, 20)
+        targets = generator.normal(size=20)
+        pointers = get_pointers(
+            np.sort(generator.integers(0, 8, 20)), 9
+        )
+        solution = solve_rows(pointers, columns, targets, features, 0.5)
+        for row in range(8):
+            rated = features[columns[pointers[row]:pointers[row + 1]]]
+            count = len(rated)
+            expected = np.zeros(3) if not count else np.linalg.solve(
+                rated.T @ rated + 0.5 * count * np.eye(3),
+                rated.T @ targets[pointers[row]:pointers[row + 1]]
+            )
+            assert np.allclose(solution[row], expected), (
+                'Проверьте, что пакетное решение совпадает с гребневой '
+                'регрессией каждой строки.'
+            )
+
+        users, items = np.divmod(np.arange(40 * 30), 30)
+        tastes = generator.normal(size=(40, 2)) @ generator.normal(
+            size=(2, 30)
+        )
+        scores = np.clip(np.round(5.5 + 2 * tastes.ravel()), 1, 10)
+        factorization = Factorization(users, items, scores).fit(
+            factors=2, iterations=15, regularization=0.01
+        )
+        assert factorization.get_rmse() < 0.5 * scores.std(), (
+            'Проверьте, что факторизация приближает оценки заметно '
+            'лучше средней.'
+        )